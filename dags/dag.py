@@ -5,6 +5,7 @@ import sys
 import logging
 from datetime import datetime, timedelta
 from airflow import DAG
+from airflow.models.param import Param
 from airflow.operators.python import PythonOperator
 
 logging.basicConfig(level=logging.INFO)
@@ -16,13 +17,22 @@ if BASE_DIR not in sys.path:
 
 from src.extraction.read_csv import read_csv_spotify
 from src.extraction.read_db import extract_grammy_database
-from src.extraction.extract_api import extract_musicbrainz_artists
+from src.extraction.extract_api import extract_musicbrainz_artists_targeted
 from src.transformation.spotify import transform_spotify_data
 from src.transformation.grammy import transform_grammy_data
 from src.transformation.api import transform_musicbrainz_data
 from src.merge.merge import merge_spotify_grammy_musicbrainz
+from src.merge.cdc import capture_merged_changes
 from src.loading.load import load_to_db
 from src.store.store import store_to_drive
+from src.ledger.ledger import track_stage
+from src.scratch.manager import cleanup_scratch
+
+# Ejecuciones simultáneas del DAG; el transform de Spotify reparte las CPUs entre las activas
+MAX_ACTIVE_RUNS = 8
+# MusicBrainz limita las peticiones por IP: una sola extracción a la vez entre todas las
+# ejecuciones. Crear el pool una vez con: airflow pools set musicbrainz_api 1 "MusicBrainz API"
+MUSICBRAINZ_POOL = "musicbrainz_api"
 
 default_args = {
     'owner': 'airflow',
@@ -39,58 +49,83 @@ with DAG(
     schedule=None,  # Reemplaza schedule_interval
     start_date=datetime.now() - timedelta(days=1),  # Fecha en el pasado
     catchup=False,
+    # Ejecuciones de particiones distintas (snapshot de Spotify / rango de años de Grammy)
+    # pueden correr en paralelo: sus salidas y sus filas en la tabla están aisladas
+    max_active_runs=MAX_ACTIVE_RUNS,
+    params={
+        "spotify_snapshot": Param(None, type=["null", "string"], description="Spotify snapshot (data/0_raw/spotify_dataset_<snapshot>.csv)"),
+        "grammy_year_from": Param(None, type=["null", "integer"], description="First Grammy year, inclusive"),
+        "grammy_year_to": Param(None, type=["null", "integer"], description="Last Grammy year, inclusive"),
+    },
 ) as dag:
 
     extract_api_task = PythonOperator(
         task_id="extract_api_artists",
-        python_callable=extract_musicbrainz_artists,
-        op_kwargs={"num_artists": 2000}
+        python_callable=track_stage("extract_api_artists", extract_musicbrainz_artists_targeted),
+        pool=MUSICBRAINZ_POOL,
     )
 
     transform_api_task = PythonOperator(
         task_id="transform_api",
-        python_callable=transform_musicbrainz_data,
+        python_callable=track_stage("transform_api", transform_musicbrainz_data),
         op_kwargs={"input_file": "{{ ti.xcom_pull(task_ids='extract_api_artists') }}"}
     )
 
     extract_spotify_task = PythonOperator(
         task_id='read_csv',
-        python_callable=read_csv_spotify,
+        python_callable=track_stage('read_csv', read_csv_spotify),
     )
 
     transform_spotify_task = PythonOperator(
         task_id='transform_spotify',
-        python_callable=transform_spotify_data,
+        python_callable=track_stage('transform_spotify', transform_spotify_data),
+        op_kwargs={"workers": 16}
     )
 
     extract_grammy_task = PythonOperator(
         task_id='read_grammy',
-        python_callable=extract_grammy_database,
+        python_callable=track_stage('read_grammy', extract_grammy_database),
     )
 
     transform_grammy_task = PythonOperator(
         task_id='transform_grammy',
-        python_callable=transform_grammy_data,
+        python_callable=track_stage('transform_grammy', transform_grammy_data),
     )
 
     merge_task = PythonOperator(
         task_id='merge_spotify_grammy',
-        python_callable=merge_spotify_grammy_musicbrainz,
+        python_callable=track_stage('merge_spotify_grammy', merge_spotify_grammy_musicbrainz),
+    )
+
+    cdc_task = PythonOperator(
+        task_id='capture_merged_changes',
+        python_callable=track_stage('capture_merged_changes', capture_merged_changes),
     )
 
     load_task = PythonOperator(
         task_id='load_to_db',
-        python_callable=load_to_db,
+        python_callable=track_stage('load_to_db', load_to_db),
     )
 
     store_to_drive_task = PythonOperator(
         task_id='store_to_drive',
-        python_callable=store_to_drive,
+        python_callable=track_stage('store_to_drive', store_to_drive),
     )
 
-    extract_api_task >> transform_api_task
+    # Limpia el espacio temporal de la ejecución tanto si terminó bien como si falló. Como
+    # teardown no cuenta para el estado de la ejecución: si falla una tarea, falla la ejecución.
+    # Las lecturas iniciales son sus setups, así que limpiar una tarea las vuelve a ejecutar y
+    # se regeneran los archivos temporales que el teardown borró
+    cleanup_scratch_task = PythonOperator(
+        task_id='cleanup_scratch',
+        python_callable=cleanup_scratch,
+    ).as_teardown(setups=[extract_spotify_task, extract_grammy_task])
+
     extract_spotify_task >> transform_spotify_task
     extract_grammy_task >> transform_grammy_task
+    [transform_spotify_task, transform_grammy_task] >> extract_api_task
+    extract_api_task >> transform_api_task
     [transform_spotify_task, transform_grammy_task, transform_api_task] >> merge_task
-    merge_task >> load_task
-    load_task >> store_to_drive_task
\ No newline at end of file
+    merge_task >> cdc_task >> load_task
+    load_task >> store_to_drive_task
+    store_to_drive_task >> cleanup_scratch_task
@@ -2,78 +2,423 @@
 import requests
 import pandas as pd
 import os
+import json
 import time
 import random
-from datetime import datetime
+import shutil
+from datetime import datetime, timedelta
+from src.transformation.normalize import normalize_text
+from src.scratch.manager import scratch_path, frame_size_hint
+from src.partitioning.partitions import exclusive_lock
 
 
-def extract_musicbrainz_artists(num_artists=2000, output_dir="data/1_interm", temp_dir="/tmp"):
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+MUSICBRAINZ_URL = "https://musicbrainz.org/ws/2/artist"
+HEADERS = {"User-Agent": "MiETLApp/1.0 (tucorreo@ejemplo.com)"}
+DETAIL_PARAMS = {"inc": "aliases+genres+release-groups+tags", "fmt": "json"}
+# Campos que la búsqueda no suele devolver; sin ellos hace falta la consulta de detalle
+DETAIL_ONLY_KEYS = ("genres", "release-groups")
+SEARCH_BATCH_SIZE = 20
+# Máximo de resultados por búsqueda que admite MusicBrainz
+SEARCH_LIMIT = 100
+SEARCH_MAX_QUERY_CHARS = 1500
+CHECKPOINT_DIR = os.path.join(BASE_DIR, "data", "1_interm", "musicbrainz_checkpoints")
+JOURNAL_CHUNK_SIZE = 1000
+# Caché negativa: nombres buscados sin coincidencia, junto al archivo acumulado
+UNRESOLVED_FILE = "musicbrainz_unresolved.json"
+UNRESOLVED_TTL_DAYS = 30
+
+
+def _parse_artist_detail(data):
+    """Build the output record from a MusicBrainz artist lookup response."""
+    return {
+        "artist_id": data.get("id", ""),
+        "name": data.get("name", ""),
+        "sort_name": data.get("sort-name", ""),
+        "type": data.get("type", ""),
+        "country": data.get("country", "N/A"),
+        "begin_area": data.get("begin-area", {}).get("name", "N/A") if data.get("begin-area") else "N/A",
+        "begin_date": data.get("life-span", {}).get("begin", "N/A"),
+        "end_date": data.get("life-span", {}).get("end", "N/A"),
+        "genres": ", ".join([g["name"] for g in data.get("genres", [])]),
+        "tags": ", ".join([t["name"] for t in data.get("tags", [])]),
+        "release_groups": ", ".join([rg["title"] for rg in data.get("release-groups", [])]),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def _append_journal(path, record):
+    """Durably append one record to a JSON Lines journal."""
+    with open(path, "a", encoding="utf-8") as journal:
+        journal.write(json.dumps(record, ensure_ascii=False) + "\n")
+        journal.flush()
+        os.fsync(journal.fileno())
+
+
+def _read_journal(path):
+    """Iterate over the records of a journal, skipping a line cut by a crash."""
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as journal:
+        for line in journal:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def _load_checkpoint(run_dir):
+    path = os.path.join(run_dir, "checkpoint.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as checkpoint:
+        return json.load(checkpoint)
+
+
+def _save_checkpoint(run_dir, state):
+    path = os.path.join(run_dir, "checkpoint.json")
+    with open(f"{path}.tmp", "w", encoding="utf-8") as checkpoint:
+        json.dump(state, checkpoint)
+    os.replace(f"{path}.tmp", path)
+
+
+def _fetch_details(artist_ids, records_path):
+    """
+    Fetch details for every artist not yet in the records journal.
+
+    Each record is appended to the journal as soon as it is fetched, so a
+    retried task skips the artists it already processed.
+    """
+    done_ids = {record["artist_id"] for record in _read_journal(records_path)}
+    pending_ids = [artist_id for artist_id in artist_ids if artist_id not in done_ids]
+    print(f"Detalles ya en el journal: {len(done_ids)}, pendientes: {len(pending_ids)}")
+
+    for i, artist_id in enumerate(pending_ids):
+        try:
+            response_detail = requests.get(f"{MUSICBRAINZ_URL}/{artist_id}", params=DETAIL_PARAMS, headers=HEADERS)
+            if response_detail.status_code == 200:
+                artist_data = _parse_artist_detail(response_detail.json())
+                _append_journal(records_path, artist_data)
+                print(f"Procesado artista {i + 1}/{len(pending_ids)}: {artist_data['name']}")
+        except requests.RequestException as e:
+            print(f"Excepción al obtener detalles de {artist_id}: {e}.")
+        time.sleep(1)
+    return len(pending_ids)
+
+
+def _journal_size(path):
+    """Size in bytes of a journal, 0 when it does not exist."""
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def _journal_to_csv(records_path, csv_paths, header_df=None, skip_ids=None):
+    """
+    Write the records journal to CSV files in chunks, keeping memory constant.
+
+    Args:
+        records_path (str): JSON Lines journal.
+        csv_paths (list): CSV files to write.
+        header_df (pd.DataFrame): Optional rows written before the journal.
+        skip_ids (set): Optional artist ids left out of the journal rows.
+    """
+    columns = list(_parse_artist_detail({}).keys())
+    first = (header_df if header_df is not None else pd.DataFrame()).reindex(columns=columns)
+    for csv_path in csv_paths:
+        first.to_csv(csv_path, index=False)
+
+    if os.path.exists(records_path) and os.path.getsize(records_path) > 0:
+        for chunk in pd.read_json(records_path, lines=True, chunksize=JOURNAL_CHUNK_SIZE, dtype=False):
+            if skip_ids:
+                chunk = chunk[~chunk["artist_id"].isin(skip_ids)]
+            for csv_path in csv_paths:
+                chunk.to_csv(csv_path, index=False, header=False, mode="a", columns=columns)
+
+
+def extract_musicbrainz_artists(num_artists=2000, output_dir="data/1_interm", run_id="manual",
+                                checkpoint_dir=CHECKPOINT_DIR):
+    """
+    Extract random MusicBrainz artists from a random search offset.
+
+    Search pages and artist details are appended to journals under
+    'checkpoint_dir/run_id' as they arrive. A retry of the same run reuses
+    the stored offset and skips completed pages and artists.
+
+    Args:
+        num_artists (int): Number of artists to extract.
+        output_dir (str): Directory of the output CSV file.
+        run_id (str): Identifier of the pipeline run owning the checkpoint and scratch space.
+        checkpoint_dir (str): Root directory of the run checkpoints.
+
+    Returns:
+        str: Path to the temporary CSV file with the extracted artists.
+    """
     limit_per_page = 100
     num_pages = (num_artists + limit_per_page - 1) // limit_per_page
-    initial_offset = random.randint(0, 10000)
-    url = "https://musicbrainz.org/ws/2/artist"
-    headers = {"User-Agent": "MiETLApp/1.0 (tucorreo@ejemplo.com)"}
+    url = MUSICBRAINZ_URL
+    headers = HEADERS
+
+    run_dir = os.path.join(checkpoint_dir, run_id)
+    os.makedirs(run_dir, exist_ok=True)
+    candidates_path = os.path.join(run_dir, "candidates.jsonl")
+    records_path = os.path.join(run_dir, "records.jsonl")
+
+    checkpoint = _load_checkpoint(run_dir)
+    if "initial_offset" not in checkpoint:
+        checkpoint = {"initial_offset": random.randint(0, 10000), "completed_pages": []}
+        _save_checkpoint(run_dir, checkpoint)
+    else:
+        print(f"Reanudando extracción desde checkpoint: {len(checkpoint['completed_pages'])} páginas completadas.")
+    initial_offset = checkpoint["initial_offset"]
 
-    all_artists = []
+    all_artists = [candidate["id"] for candidate in _read_journal(candidates_path)]
     for page in range(num_pages):
+        if len(all_artists) >= num_artists:
+            break
+        if page in checkpoint["completed_pages"]:
+            continue
         offset = initial_offset + (page * limit_per_page)
         params = {"query": "artist", "limit": limit_per_page, "offset": offset, "fmt": "json"}
         try:
             response = requests.get(url, params=params, headers=headers)
             if response.status_code == 200:
                 artists = response.json().get("artists", [])
-                all_artists.extend(artists)
+                for artist in artists:
+                    _append_journal(candidates_path, {"id": artist["id"], "name": artist.get("name", "")})
+                all_artists.extend(artist["id"] for artist in artists)
+                checkpoint["completed_pages"].append(page)
+                _save_checkpoint(run_dir, checkpoint)
                 print(f"Página {page + 1}/{num_pages}: {len(artists)} artistas obtenidos.")
             else:
                 print(f"Error en página {page + 1}: {response.status_code}.")
         except requests.RequestException as e:
             print(f"Excepción en página {page + 1}: {e}.")
         time.sleep(1)
-        if len(all_artists) >= num_artists:
-            break
 
-    all_artists = all_artists[:num_artists]
+    all_artists = list(dict.fromkeys(all_artists))[:num_artists]
     print(f"Total de artistas recolectados: {len(all_artists)}")
 
-    all_artists_data = []
-    for i, artist in enumerate(all_artists):
-        artist_url = f"https://musicbrainz.org/ws/2/artist/{artist['id']}"
-        params_detail = {"inc": "aliases+genres+release-groups+tags", "fmt": "json"}
+    _fetch_details(all_artists, records_path)
+
+    os.makedirs(output_dir, exist_ok=True)
+    # Cada registro del journal repite los nombres de campo: ocupa más que su fila CSV
+    temp_file = scratch_path(run_id, "extract_api_artists", ".csv", size_hint=_journal_size(records_path))
+    output_file = f"{output_dir}/musicbrainz_artists_random.csv"
+    _journal_to_csv(records_path, [temp_file, output_file])
+    print(f"Datos guardados temporalmente en: {temp_file}")
+    print(f"Datos guardados en: {output_file}")
+
+    # La extracción terminó: el checkpoint ya no es necesario
+    shutil.rmtree(run_dir, ignore_errors=True)
+    return temp_file
+
+
+def _load_unresolved(path, ttl_days=UNRESOLVED_TTL_DAYS):
+    """Names searched without a match less than ttl_days ago, with their search time."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as cache:
+        entries = json.load(cache)
+    cutoff = datetime.now() - timedelta(days=ttl_days)
+    return {name: searched_at for name, searched_at in entries.items()
+            if datetime.fromisoformat(searched_at) >= cutoff}
+
+
+def _save_unresolved(path, unresolved_names, resolved_names):
+    """
+    Record names searched without a match in the negative cache.
+
+    The cache is shared by all partitions, so it is re-read and rewritten
+    under a lock; expired entries and names resolved since are dropped.
+    """
+    with exclusive_lock(path):
+        entries = _load_unresolved(path)
+        searched_at = datetime.now().isoformat()
+        entries.update({name: searched_at for name in unresolved_names})
+        for name in resolved_names:
+            entries.pop(name, None)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as cache:
+            json.dump(entries, cache, ensure_ascii=False, indent=0, sort_keys=True)
+        os.replace(tmp_path, path)
+
+
+def _lucene_phrase(name):
+    """Quote a name as a Lucene phrase, escaping backslashes and quotes."""
+    return '"' + name.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _search_query(names):
+    """OR'ed 'artist:' Lucene query matching any of the names."""
+    return " OR ".join(f"artist:{_lucene_phrase(name)}" for name in names)
+
+
+def _batch_search_queries(names, batch_size=SEARCH_BATCH_SIZE, max_chars=SEARCH_MAX_QUERY_CHARS):
+    """Group names into OR'ed 'artist:' Lucene queries bounded in names and length."""
+    batch, query = [], ""
+    for name in names:
+        clause = f"artist:{_lucene_phrase(name)}"
+        candidate = f"{query} OR {clause}" if query else clause
+        if batch and (len(batch) >= batch_size or len(candidate) > max_chars):
+            yield batch, query
+            batch, candidate = [], clause
+        batch.append(name)
+        query = candidate
+    if batch:
+        yield batch, query
+
+
+def _read_artist_names(ti):
+    """Distinct normalized artist names from the transformed Spotify and Grammy data."""
+    spotify_file_path = ti.xcom_pull(task_ids='transform_spotify')
+    grammy_file_path = ti.xcom_pull(task_ids='transform_grammy')
+    if not spotify_file_path or not grammy_file_path:
+        raise ValueError("No file paths received from transform_spotify/transform_grammy tasks")
+
+    names = pd.concat([
+        pd.read_parquet(spotify_file_path, columns=["artists"])["artists"],
+        pd.read_parquet(grammy_file_path, columns=["artist"])["artist"],
+    ]).dropna()
+    # Los créditos con varios artistas ("a;b") nunca coinciden con un nombre de MusicBrainz
+    names = names[~names.str.contains(";", regex=False) & (names != "")]
+    return sorted(names.unique())
+
+
+def extract_musicbrainz_artists_targeted(ti, max_names=None, output_dir="data/1_interm", run_id="manual",
+                                         checkpoint_dir=CHECKPOINT_DIR):
+    """
+    Extract MusicBrainz artists that match the Spotify and Grammy artist names.
+
+    Names are batched into OR'ed Lucene search queries, so one request
+    resolves many names. Names searched without a match are kept in a
+    negative cache next to the output file and are not searched again for
+    UNRESOLVED_TTL_DAYS. A miss is only cached when the search returned all
+    its hits: when partial matches of other names filled the SEARCH_LIMIT
+    results, the names left unmatched are searched again one by one. Details are only fetched for resolved MBIDs that
+    are not already in the output file from previous runs, and only when
+    the search result lacks the detail fields. Resolved names and details
+    are journaled under 'checkpoint_dir/run_id', so a retry of the same
+    run resumes after the last completed batch and artist. The checkpoint
+    stores the names of every batch, since the pending names depend on files
+    shared with other runs that may change before the retry.
+
+    Args:
+        ti: Task instance to pull the transformed Spotify and Grammy paths from XCom.
+        max_names (int): Optional cap on the number of names searched.
+        output_dir (str): Directory of the accumulated artists file.
+        run_id (str): Identifier of the pipeline run owning the checkpoint and scratch space.
+        checkpoint_dir (str): Root directory of the run checkpoints.
+
+    Returns:
+        str: Path to the temporary CSV file with the matched artists.
+    """
+    names = _read_artist_names(ti)
+    output_file = f"{output_dir}/musicbrainz_artists.csv"
+    known_df = pd.read_csv(output_file) if os.path.exists(output_file) else pd.DataFrame()
+
+    unresolved_file = f"{output_dir}/{UNRESOLVED_FILE}"
+    run_dir = os.path.join(checkpoint_dir, run_id)
+    os.makedirs(run_dir, exist_ok=True)
+    resolved_path = os.path.join(run_dir, "resolved.jsonl")
+    records_path = os.path.join(run_dir, "records.jsonl")
+
+    checkpoint = _load_checkpoint(run_dir)
+    if "batches" not in checkpoint:
+        unresolved_names = _load_unresolved(unresolved_file)
+        known_names = set()
+        if not known_df.empty:
+            known_names = set(normalize_text(known_df["name"]).to_pylist())
+        pending_names = [name for name in names if name not in known_names and name not in unresolved_names]
+        if max_names:
+            pending_names = pending_names[:max_names]
+        print(
+            f"Nombres de artistas: {len(names)}, sin coincidencia en caché: {len(unresolved_names)}, "
+            f"pendientes de búsqueda: {len(pending_names)}"
+        )
+        # El plan de lotes se fija aquí: al reanudar no se recalcula desde los archivos compartidos
+        checkpoint = {
+            "batches": [batch for batch, _ in _batch_search_queries(pending_names)],
+            "completed_batches": [],
+            "unresolved": [],
+        }
+        _save_checkpoint(run_dir, checkpoint)
+    else:
+        print(
+            f"Reanudando búsqueda desde checkpoint: {len(checkpoint['completed_batches'])} "
+            f"de {len(checkpoint['batches'])} lotes completados."
+        )
+    batches = checkpoint["batches"]
+    completed_batches = set(checkpoint["completed_batches"])
+
+    resolved_ids = {entry["name"]: entry["id"] for entry in _read_journal(resolved_path)}
+    num_requests = 0
+    # Las búsquedas individuales de repaso se añaden al final de 'batches' durante el recorrido
+    for batch_number, batch in enumerate(batches):
+        if batch_number in completed_batches:
+            continue
+        params = {"query": _search_query(batch), "limit": SEARCH_LIMIT, "fmt": "json"}
         try:
-            response_detail = requests.get(artist_url, params=params_detail, headers=headers)
-            if response_detail.status_code == 200:
-                data = response_detail.json()
-                artist_data = {
-                    "artist_id": data.get("id", ""),
-                    "name": data.get("name", ""),
-                    "sort_name": data.get("sort-name", ""),
-                    "type": data.get("type", ""),
-                    "country": data.get("country", "N/A"),
-                    "begin_area": data.get("begin-area", {}).get("name", "N/A") if data.get("begin-area") else "N/A",
-                    "begin_date": data.get("life-span", {}).get("begin", "N/A"),
-                    "end_date": data.get("life-span", {}).get("end", "N/A"),
-                    "genres": ", ".join([g["name"] for g in data.get("genres", [])]),
-                    "tags": ", ".join([t["name"] for t in data.get("tags", [])]),
-                    "release_groups": ", ".join([rg["title"] for rg in data.get("release-groups", [])]),
-                    "timestamp": datetime.now().isoformat()
-                }
-                all_artists_data.append(artist_data)
-                print(f"Procesado artista {i + 1}/{len(all_artists)}: {artist['name']}")
+            response = requests.get(MUSICBRAINZ_URL, params=params, headers=HEADERS)
+            num_requests += 1
+            if response.status_code == 200:
+                payload = response.json()
+                artists = payload.get("artists", [])
+                result_names = normalize_text(pd.Series([a.get("name", "") for a in artists])).to_pylist()
+                wanted = set(batch)
+                # Los resultados vienen ordenados por puntuación; se conserva el mejor por nombre
+                for artist, result_name in zip(artists, result_names):
+                    if result_name in wanted and result_name not in resolved_ids:
+                        resolved_ids[result_name] = artist["id"]
+                        _append_journal(resolved_path, {"name": result_name, "id": artist["id"]})
+                        if all(key in artist for key in DETAIL_ONLY_KEYS):
+                            # La búsqueda ya trae todos los campos: no hace falta la consulta de detalle
+                            _append_journal(records_path, _parse_artist_detail(artist))
+                missed = [name for name in batch if name not in resolved_ids]
+                if payload.get("count", len(artists)) <= SEARCH_LIMIT:
+                    # Búsqueda completa: los nombres sin coincidencia no existen en MusicBrainz
+                    checkpoint["unresolved"].extend(missed)
+                elif len(batch) > 1:
+                    # Resultados truncados: las coincidencias exactas pudieron quedar fuera
+                    checkpoint["batches"].extend([name] for name in missed)
+                elif missed:
+                    print(f"Búsqueda de '{batch[0]}' truncada sin coincidencia exacta; no se guarda en caché.")
+                checkpoint["completed_batches"].append(batch_number)
+                _save_checkpoint(run_dir, checkpoint)
+            else:
+                print(f"Error en búsqueda de {len(batch)} nombres: {response.status_code}.")
         except requests.RequestException as e:
-            print(f"Excepción al obtener detalles de {artist['name']}: {e}.")
+            print(f"Excepción en búsqueda de {len(batch)} nombres: {e}.")
         time.sleep(1)
 
-    df = pd.DataFrame(all_artists_data)
     os.makedirs(output_dir, exist_ok=True)
-    os.makedirs(temp_dir, exist_ok=True)
+    _save_unresolved(
+        unresolved_file, [name for name in checkpoint["unresolved"] if name not in resolved_ids], resolved_ids
+    )
 
-    temp_file = f"{temp_dir}/musicbrainz_temp_random.csv"
-    df.to_csv(temp_file, index=False)
-    print(f"Datos guardados temporalmente en: {temp_file}")
+    known_ids = set(known_df["artist_id"]) if not known_df.empty else set()
+    new_ids = sorted(set(resolved_ids.values()) - known_ids)
+    print(f"Artistas resueltos: {len(resolved_ids)}, nuevos por detallar: {len(new_ids)}")
 
-    output_file = f"{output_dir}/musicbrainz_artists_random.csv"
-    df.to_csv(output_file, index=False)
+    num_requests += _fetch_details(new_ids, records_path)
+    print(f"Total de solicitudes a MusicBrainz: {num_requests}")
+
+    temp_file = scratch_path(
+        run_id, "extract_api_artists", ".csv",
+        size_hint=_journal_size(records_path) + frame_size_hint(known_df)
+    )
+    # Un reintento puede traer en el journal artistas que otra ejecución ya añadió al archivo
+    _journal_to_csv(records_path, [temp_file], header_df=known_df, skip_ids=known_ids)
+
+    # El archivo acumulado es compartido por todas las particiones: otra ejecución
+    # pudo ampliarlo mientras tanto, así que se relee y actualiza bajo un lock
+    with exclusive_lock(output_file):
+        latest_df = pd.read_csv(output_file) if os.path.exists(output_file) else known_df
+        latest_ids = set(latest_df["artist_id"]) if not latest_df.empty else set()
+        tmp_output_file = f"{output_file}.{os.getpid()}.tmp"
+        _journal_to_csv(records_path, [tmp_output_file], header_df=latest_df, skip_ids=latest_ids)
+        os.replace(tmp_output_file, output_file)
+    print(f"Datos guardados temporalmente en: {temp_file}")
     print(f"Datos guardados en: {output_file}")
 
+    # La extracción terminó: el checkpoint ya no es necesario
+    shutil.rmtree(run_dir, ignore_errors=True)
     return temp_file
-
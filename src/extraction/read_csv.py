@@ -2,8 +2,9 @@
 
 import os
 import logging
-import tempfile
 import pandas as pd
+from src.scratch.manager import scratch_path
+from src.partitioning.partitions import resolve_partition
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -17,11 +18,17 @@ if not logger.hasHandlers():
     logger.addHandler(handler)
 
 
-def read_csv_spotify():
+def read_csv_spotify(run_id="manual", params=None):
     """
     Reads the Spotify dataset from a CSV file
-    and saves it to a temporary CSV file.
+    and saves it to a temporary CSV file in the run's scratch space.
 
+    When the run params name a 'spotify_snapshot', the snapshot file
+    'spotify_dataset_<snapshot>.csv' is read instead of the latest dataset.
+
+    Args:
+        run_id (str): Pipeline run identifier owning the scratch space.
+        params (dict): DAG run params.
     Returns:
         str: Path to the temporary file where the DataFrame is saved as CSV.
     Raises:
@@ -33,17 +40,18 @@ def read_csv_spotify():
         BASE_DIR = os.path.abspath(
             os.path.join(os.path.dirname(__file__), "../..")
         )
+        snapshot = resolve_partition(params)["spotify_snapshot"]
+        file_name = f"spotify_dataset_{snapshot}.csv" if snapshot else "spotify_dataset.csv"
         CSV_PATH = os.path.join(
-            BASE_DIR, "data", "0_raw", "spotify_dataset.csv"
+            BASE_DIR, "data", "0_raw", file_name
         )
         logger.info(f"Intentando leer el archivo desde: {CSV_PATH}")
         df_spotify = pd.read_csv(CSV_PATH)  # Leer como DataFrame en memoria
         logger.info("Archivo CSV leído exitosamente.")
 
         # Guardar el DataFrame en un archivo temporal CSV
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as tmp_file:
-            df_spotify.to_csv(tmp_file.name, index=False)  # Guardar como CSV
-            tmp_file_path = tmp_file.name
+        tmp_file_path = scratch_path(run_id, "read_csv", ".csv", size_hint=os.path.getsize(CSV_PATH))
+        df_spotify.to_csv(tmp_file_path, index=False)  # Guardar como CSV
         logger.info(f"DataFrame guardado en archivo temporal: {tmp_file_path}")
         return tmp_file_path
 
@@ -3,10 +3,12 @@
 import os
 import sys
 import logging
-import tempfile
 import pandas as pd
+from sqlalchemy import text
 
 from src.db.db_conection import connect_db
+from src.scratch.manager import scratch_path, frame_size_hint
+from src.partitioning.partitions import resolve_partition
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -15,14 +17,29 @@ BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if BASE_DIR not in sys.path:
     sys.path.append(BASE_DIR)
 
-def extract_grammy_database():
+def extract_grammy_database(run_id="manual", params=None):
+    partition = resolve_partition(params)
+    query = 'SELECT * FROM "grammyAwards"'
+    conditions, query_params = [], {}
+    if partition["grammy_year_from"] is not None:
+        conditions.append('"year" >= :year_from')
+        query_params["year_from"] = partition["grammy_year_from"]
+    if partition["grammy_year_to"] is not None:
+        conditions.append('"year" <= :year_to')
+        query_params["year_to"] = partition["grammy_year_to"]
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+
     engine = connect_db()
     try:
-        df_grammy = pd.read_sql_query('SELECT * FROM "grammyAwards"', engine)
-        logger.info("Datos de Grammy extraídos exitosamente de la base de datos.")
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as tmp_file:
-            df_grammy.to_csv(tmp_file.name, index=False)
-            tmp_file_path = tmp_file.name
+        df_grammy = pd.read_sql_query(
+            text(query),
+            engine,
+            params=query_params
+        )
+        logger.info(f"Datos de Grammy extraídos exitosamente de la base de datos (partición {partition['key']}).")
+        tmp_file_path = scratch_path(run_id, "read_grammy", ".csv", size_hint=frame_size_hint(df_grammy))
+        df_grammy.to_csv(tmp_file_path, index=False)
         logger.info(f"DataFrame guardado en archivo temporal: {tmp_file_path}")
         return tmp_file_path
     except pd.io.sql.DatabaseError as e:
@@ -0,0 +1,347 @@
+"""Run ledger with per-stage lineage, sizes and timings.
+
+Every pipeline stage wrapped with track_stage records, per run, the
+fingerprints of its inputs (the outputs of its upstream stages), its output
+path, row count, byte size, duration and the peak memory sampled while the
+stage ran in a SQLite database.
+
+Usage:
+    python -m src.ledger.ledger runs
+    python -m src.ledger.ledger history transform_spotify
+    python -m src.ledger.ledger compare <base_run_id> <run_id> --threshold 0.2
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import inspect
+import logging
+import argparse
+import functools
+import threading
+from datetime import datetime
+import psutil
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+LEDGER_PATH = os.path.join(BASE_DIR, "data", "run_ledger.sqlite")
+FINGERPRINT_CHUNK_BYTES = 1024 * 1024
+RSS_SAMPLE_SECONDS = 0.05
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stage_runs (
+    run_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    duration_s REAL,
+    max_rss_mb REAL,
+    status TEXT NOT NULL,
+    input_fingerprints TEXT,
+    output_path TEXT,
+    output_fingerprint TEXT,
+    output_rows INTEGER,
+    output_bytes INTEGER,
+    error TEXT,
+    PRIMARY KEY (run_id, stage)
+)
+"""
+
+
+def connect_ledger(ledger_path=LEDGER_PATH):
+    """Open the ledger database, creating it if needed."""
+    os.makedirs(os.path.dirname(os.path.abspath(ledger_path)), exist_ok=True)
+    connection = sqlite3.connect(ledger_path, timeout=30)
+    connection.row_factory = sqlite3.Row
+    connection.execute(SCHEMA)
+    return connection
+
+
+def _output_files(path):
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(root, name)
+            for root, _, names in os.walk(path)
+            for name in names
+        )
+    return [path]
+
+
+def describe_output(path):
+    """
+    Describe a stage output (file or directory).
+
+    The fingerprint is a SHA-256 of the relative path and the full content
+    of every file, read sequentially in chunks. It only depends on the
+    content, so an output rewritten with the same bytes keeps its
+    fingerprint and any changed byte changes it.
+
+    Returns:
+        dict: 'fingerprint', 'bytes' and 'rows' (None when unknown).
+    """
+    digest = hashlib.sha256()
+    total_bytes = 0
+    rows = None
+    for file_path in _output_files(path):
+        total_bytes += os.path.getsize(file_path)
+        digest.update(f"{os.path.relpath(file_path, path)}\0".encode())
+        with open(file_path, "rb") as data:
+            for chunk in iter(lambda: data.read(FINGERPRINT_CHUNK_BYTES), b""):
+                digest.update(chunk)
+
+    if os.path.isdir(path) and os.path.exists(os.path.join(path, "_manifest.json")):
+        with open(os.path.join(path, "_manifest.json")) as manifest:
+            rows = json.load(manifest).get("num_rows")
+    elif path.endswith(".parquet"):
+        rows = pq.ParquetFile(path).metadata.num_rows
+    elif path.endswith(".csv"):
+        with open(path, "rb") as data:
+            rows = max(sum(1 for _ in data) - 1, 0)
+
+    return {"fingerprint": digest.hexdigest(), "bytes": total_bytes, "rows": rows}
+
+
+class _PeakMemory:
+    """
+    Peak resident memory of a stage, sampled in a background thread.
+
+    Every RSS_SAMPLE_SECONDS the RSS of this process and of its live
+    children (e.g. a process pool) is added up, so the peak belongs to the
+    stage and not to the lifetime of the worker process. Spikes shorter than
+    the sampling interval can be missed; shared pages count once per process.
+    """
+
+    def __init__(self, interval=RSS_SAMPLE_SECONDS):
+        self._interval = interval
+        self._process = psutil.Process()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample_until_stopped, daemon=True)
+        self.peak_bytes = 0
+
+    def _sample(self):
+        total = self._process.memory_info().rss
+        for child in self._process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                # El hijo terminó entre la lista y la lectura
+                continue
+        self.peak_bytes = max(self.peak_bytes, total)
+
+    def _sample_until_stopped(self):
+        while not self._stop.wait(self._interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return False
+
+    @property
+    def peak_mb(self):
+        return self.peak_bytes / (1024 * 1024)
+
+
+def record_stage(connection, run_id, stage, **values):
+    """Insert or replace the ledger entry of a stage in a run."""
+    values.update({"run_id": run_id, "stage": stage})
+    columns = ", ".join(values)
+    placeholders = ", ".join(f":{column}" for column in values)
+    with connection:
+        connection.execute(
+            f"INSERT OR REPLACE INTO stage_runs ({columns}) VALUES ({placeholders})",
+            values
+        )
+
+
+def _upstream_fingerprints(connection, run_id, upstream_stages):
+    if not upstream_stages:
+        return {}
+    placeholders = ", ".join("?" for _ in upstream_stages)
+    rows = connection.execute(
+        f"SELECT stage, output_fingerprint FROM stage_runs "
+        f"WHERE run_id = ? AND stage IN ({placeholders})",
+        [run_id, *upstream_stages]
+    ).fetchall()
+    return {row["stage"]: row["output_fingerprint"] for row in rows}
+
+
+def _call_with_supported_kwargs(func, kwargs):
+    """Call func with the keyword arguments its signature accepts, as PythonOperator does."""
+    parameters = inspect.signature(func).parameters
+    if any(p.kind is inspect.Parameter.VAR_KEYWORD for p in parameters.values()):
+        return func(**kwargs)
+    return func(**{name: value for name, value in kwargs.items() if name in parameters})
+
+
+def track_stage(stage, func, ledger_path=LEDGER_PATH):
+    """
+    Wrap a task callable so every execution is recorded in the ledger.
+
+    Args:
+        stage (str): Stage name, usually the Airflow task id.
+        func (callable): Task callable returning an output path (or None).
+        ledger_path (str): SQLite ledger file.
+
+    Returns:
+        callable: Wrapper accepting the whole Airflow context as keyword
+        arguments; only those func accepts are passed on to it.
+    """
+    @functools.wraps(func)
+    def wrapper(**kwargs):
+        ti = kwargs.get("ti")
+        run_id = kwargs.get("run_id") or getattr(ti, "run_id", None) or "manual"
+        upstream_stages = sorted(getattr(getattr(ti, "task", None), "upstream_task_ids", []) or [])
+        started_at = datetime.now().isoformat()
+        start = time.perf_counter()
+
+        connection = connect_ledger(ledger_path)
+        input_fingerprints = json.dumps(_upstream_fingerprints(connection, run_id, upstream_stages))
+        peak_memory = _PeakMemory()
+        try:
+            with peak_memory:
+                result = _call_with_supported_kwargs(func, kwargs)
+        except Exception as e:
+            record_stage(
+                connection, run_id, stage,
+                started_at=started_at,
+                duration_s=time.perf_counter() - start,
+                max_rss_mb=peak_memory.peak_mb,
+                status="failed",
+                input_fingerprints=input_fingerprints,
+                error=repr(e),
+            )
+            connection.close()
+            raise
+
+        output = {"fingerprint": None, "bytes": None, "rows": None}
+        if isinstance(result, str) and os.path.exists(result):
+            output = describe_output(result)
+        record_stage(
+            connection, run_id, stage,
+            started_at=started_at,
+            duration_s=time.perf_counter() - start,
+            max_rss_mb=peak_memory.peak_mb,
+            status="success",
+            input_fingerprints=input_fingerprints,
+            output_path=result if isinstance(result, str) else None,
+            output_fingerprint=output["fingerprint"],
+            output_rows=output["rows"],
+            output_bytes=output["bytes"],
+        )
+        connection.close()
+        logger.info(f"Etapa '{stage}' registrada en el ledger para la ejecución {run_id}")
+        return result
+
+    # Airflow decide qué variables del contexto pasar según la firma; sin esto seguiría
+    # __wrapped__ y no pasaría 'ti' ni 'run_id' a los callables que no los declaran
+    wrapper.__signature__ = inspect.Signature(
+        [inspect.Parameter("context", inspect.Parameter.VAR_KEYWORD)]
+    )
+    return wrapper
+
+
+def compare_runs(connection, base_run_id, run_id, threshold=0.2):
+    """
+    Compare the stages of two runs.
+
+    Returns:
+        list: One dict per stage with both runs' metrics, their relative
+        changes and a 'regressed' flag when duration or peak memory grew by
+        more than 'threshold'.
+    """
+    query = "SELECT * FROM stage_runs WHERE run_id = ?"
+    base = {row["stage"]: row for row in connection.execute(query, [base_run_id])}
+    current = {row["stage"]: row for row in connection.execute(query, [run_id])}
+
+    comparison = []
+    for stage in sorted(set(base) | set(current)):
+        entry = {"stage": stage}
+        regressed = False
+        for metric in ["duration_s", "max_rss_mb", "output_rows", "output_bytes"]:
+            before = base[stage][metric] if stage in base else None
+            after = current[stage][metric] if stage in current else None
+            change = (after - before) / before if before and after is not None else None
+            entry[metric] = (before, after, change)
+            if metric in ["duration_s", "max_rss_mb"] and change is not None and change > threshold:
+                regressed = True
+        entry["input_changed"] = (
+            stage in base and stage in current
+            and base[stage]["input_fingerprints"] != current[stage]["input_fingerprints"]
+        )
+        entry["regressed"] = regressed
+        comparison.append(entry)
+    return comparison
+
+
+def _format_metric(values):
+    before, after, change = values
+    fmt = lambda value: "-" if value is None else f"{value:.2f}" if isinstance(value, float) else str(value)
+    change_text = "" if change is None else f" ({change:+.0%})"
+    return f"{fmt(before)} -> {fmt(after)}{change_text}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and compare pipeline runs.")
+    parser.add_argument("--ledger", default=LEDGER_PATH)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("runs", help="List recorded runs")
+    history = subparsers.add_parser("history", help="Show the history of a stage")
+    history.add_argument("stage")
+    compare = subparsers.add_parser("compare", help="Compare two runs")
+    compare.add_argument("base_run_id")
+    compare.add_argument("run_id")
+    compare.add_argument("--threshold", type=float, default=0.2,
+                         help="Relative growth of duration or memory flagged as regression")
+    args = parser.parse_args(argv)
+
+    connection = connect_ledger(args.ledger)
+    if args.command == "runs":
+        for row in connection.execute(
+            "SELECT run_id, MIN(started_at) AS started_at, COUNT(*) AS stages, "
+            "SUM(duration_s) AS duration_s, SUM(status = 'failed') AS failed "
+            "FROM stage_runs GROUP BY run_id ORDER BY started_at"
+        ):
+            print(f"{row['run_id']}\t{row['started_at']}\t{row['stages']} etapas\t"
+                  f"{row['duration_s']:.1f}s\t{row['failed']} fallidas")
+    elif args.command == "history":
+        for row in connection.execute(
+            "SELECT * FROM stage_runs WHERE stage = ? ORDER BY started_at", [args.stage]
+        ):
+            print(f"{row['run_id']}\t{row['status']}\t{row['duration_s']:.2f}s\t"
+                  f"{row['max_rss_mb']:.0f}MB\t{row['output_rows']} filas\t{row['output_bytes']} bytes")
+    else:
+        regressions = 0
+        for entry in compare_runs(connection, args.base_run_id, args.run_id, args.threshold):
+            flag = "REGRESIÓN" if entry["regressed"] else "ok"
+            regressions += entry["regressed"]
+            print(f"[{flag}] {entry['stage']}: duración {_format_metric(entry['duration_s'])}, "
+                  f"memoria MB {_format_metric(entry['max_rss_mb'])}, "
+                  f"filas {_format_metric(entry['output_rows'])}, "
+                  f"bytes {_format_metric(entry['output_bytes'])}"
+                  f"{', entradas distintas' if entry['input_changed'] else ''}")
+        sys.exit(1 if regressions else 0)
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
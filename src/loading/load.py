@@ -3,10 +3,18 @@
 import logging
 import pandas as pd
 import os
-import tempfile
+import psycopg2
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import inspect, text
 from sqlalchemy.exc import SQLAlchemyError
 from src.db.db_conection import connect_db_load
 from src.db.database_create import create_database_load
+from src.loading.dataset import DATASET_DIR, write_partitioned_dataset
+from src.loading.pgcopy import copy_table
+from src.scratch.manager import release
+from src.merge.cdc import CDC_DIR, KEY_COLUMN, index_fingerprint, delta_base_fingerprint, commit_hash_index
+from src.partitioning.partitions import DEFAULT_PARTITION, PARTITION_COLUMN, resolve_partition, partition_dir
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -20,36 +28,202 @@ if not logger.hasHandlers():
     logger.addHandler(handler)
 
 
-def load_to_db(ti):
+TABLE_NAME = "spotify_grammy_merged"
+# Tipos de PostgreSQL por tipo de dato de pandas (dtype.kind); el resto se guarda como TEXT
+SQL_TYPES = {"i": "BIGINT", "u": "BIGINT", "f": "DOUBLE PRECISION", "b": "BOOLEAN", "M": "TIMESTAMP"}
+
+
+def prepare_table(engine, table_name, df):
+    """
+    Create the load table, or add the columns of df it is missing.
+
+    Partitions can drop different sparse columns in the merge, so the table
+    holds the union of their columns; rows of a partition without a column
+    get NULL. Schema changes of concurrent runs are serialized with a
+    transaction-level advisory lock on the table.
+
+    Args:
+        engine: SQLAlchemy engine of the load database.
+        table_name (str): Table to prepare.
+        df (pd.DataFrame): Rows about to be loaded, including the partition column.
+    """
+    with engine.begin() as connection:
+        connection.execute(text("SELECT pg_advisory_xact_lock(hashtext(:table_name))"), {"table_name": table_name})
+        inspector = inspect(connection)
+        if not inspector.has_table(table_name):
+            df.head(0).to_sql(table_name, connection, index=False)
+            logger.info(f"Tabla '{table_name}' creada.")
+        else:
+            table_columns = {col["name"] for col in inspector.get_columns(table_name)}
+            for column in df.columns:
+                if column in table_columns:
+                    continue
+                # Las filas cargadas antes de particionar pertenecen a la partición 'all'
+                default = f" DEFAULT '{DEFAULT_PARTITION}'" if column == PARTITION_COLUMN else ""
+                connection.execute(text(
+                    f'ALTER TABLE "{table_name}" ADD COLUMN IF NOT EXISTS "{column}" '
+                    f'{SQL_TYPES.get(df[column].dtype.kind, "TEXT")}{default}'
+                ))
+                logger.info(f"Columna '{column}' agregada a la tabla '{table_name}'.")
+        connection.execute(text(
+            f'CREATE INDEX IF NOT EXISTS "{table_name}_{PARTITION_COLUMN}_idx" '
+            f'ON "{table_name}" ("{PARTITION_COLUMN}", "{KEY_COLUMN}")'
+        ))
+
+
+def with_partition(table, partition_key):
+    """Return an Arrow table with the partition column set to partition_key."""
+    return table.append_column(PARTITION_COLUMN, pa.repeat(partition_key, table.num_rows))
+
+
+def append_rows(connection, table_name, table):
+    """
+    Append the rows of an Arrow table with a binary COPY.
+
+    Tables with a column the COPY encoder does not support are appended
+    with to_sql instead.
+    """
+    try:
+        copy_table(connection, table_name, table)
+    except TypeError as e:
+        logger.warning(f"COPY binario no disponible para '{table_name}' ({e}); se usa to_sql")
+        table.to_pandas().to_sql(table_name, connection, if_exists='append', index=False)
+
+
+def replace_partition(connection, table_name, partition_key, table):
+    """Replace every row of a partition with the rows of an Arrow table."""
+    connection.execute(
+        text(f'DELETE FROM "{table_name}" WHERE "{PARTITION_COLUMN}" = :partition_key'),
+        {"partition_key": partition_key},
+    )
+    append_rows(connection, table_name, table)
+    logger.info(f"Partición '{partition_key}' reemplazada en '{table_name}' con {table.num_rows} filas")
+
+
+def apply_delta(connection, table_name, delta_dir, partition_key):
+    """
+    Apply a change-data-capture delta to the rows of a partition.
+
+    Rows of every track in the delta (inserted, updated or deleted) are
+    removed and the rows of inserted and updated tracks are appended, inside
+    the caller's transaction. Applying the same delta twice leaves the table
+    as after the first time: a retry after the database commit, or two runs
+    of a partition that diffed against the same committed index, do not
+    duplicate the inserted tracks.
+
+    Args:
+        connection: SQLAlchemy connection with an open transaction.
+        table_name (str): Table to update.
+        delta_dir (str): Directory with insert/update/delete Parquet files.
+        partition_key (str): Partition the delta belongs to.
+    """
+    inserts = pq.read_table(os.path.join(delta_dir, "insert.parquet"))
+    updates = pq.read_table(os.path.join(delta_dir, "update.parquet"))
+    deletes = pq.read_table(os.path.join(delta_dir, "delete.parquet"), columns=[KEY_COLUMN])
+
+    stale_keys = list(dict.fromkeys(
+        inserts.column(KEY_COLUMN).to_pylist()
+        + updates.column(KEY_COLUMN).to_pylist()
+        + deletes.column(KEY_COLUMN).to_pylist()
+    ))
+    if stale_keys:
+        connection.execute(
+            text(
+                f'DELETE FROM "{table_name}" '
+                f'WHERE "{PARTITION_COLUMN}" = :partition_key AND "{KEY_COLUMN}" = ANY(:keys)'
+            ),
+            {"partition_key": partition_key, "keys": stale_keys},
+        )
+    # Cada archivo se copia por separado: sus columnas pueden tener tipos distintos
+    for changed in (inserts, updates):
+        if changed.num_rows:
+            append_rows(connection, table_name, with_partition(changed, partition_key))
+    logger.info(
+        f"Delta aplicado a '{table_name}' (partición {partition_key}): {len(stale_keys)} tracks "
+        f"reemplazados o eliminados, {inserts.num_rows + updates.num_rows} filas insertadas"
+    )
+
+
+def load_partition(engine, table_name, partition_key, table, delta_dir=None, cdc_dir=None, table_existed=True):
+    """
+    Load the rows of a partition and commit its change-data-capture index.
+
+    Two runs of the same partition load one after the other: a session-level
+    advisory lock on (table, partition) is held from the check of the
+    committed index until the new index is committed. The delta is applied
+    only if the committed index is still the one it was computed against;
+    otherwise (first load, table recreated, or another run committed in
+    between) the whole partition is replaced with 'table'.
+
+    Args:
+        engine: SQLAlchemy engine of the load database.
+        table_name (str): Table to load.
+        partition_key (str): Partition of the rows.
+        table (pa.Table): Every row of the partition, without the partition column.
+        delta_dir (str): Directory returned by capture_merged_changes, or None.
+        cdc_dir (str): Directory of the partition's committed hash index.
+        table_existed (bool): Whether the table existed before this load.
+    """
+    lock_params = {"table_name": table_name, "partition_key": partition_key}
+    with engine.connect() as connection:
+        try:
+            with connection.begin():
+                connection.execute(
+                    text("SELECT pg_advisory_lock(hashtext(:table_name), hashtext(:partition_key))"), lock_params
+                )
+                base_fingerprint = delta_base_fingerprint(delta_dir) if delta_dir else None
+                if table_existed and base_fingerprint is not None and base_fingerprint == index_fingerprint(cdc_dir):
+                    apply_delta(connection, table_name, delta_dir, partition_key)
+                else:
+                    if delta_dir and base_fingerprint is not None:
+                        logger.info(
+                            f"El índice confirmado de la partición '{partition_key}' cambió desde que se "
+                            "calculó el delta; se reemplaza la partición completa"
+                        )
+                    logger.info(f"Saving partition '{partition_key}' to table '{table_name}'...")
+                    replace_partition(connection, table_name, partition_key, with_partition(table, partition_key))
+            # Confirmar el índice antes de soltar el bloqueo: la siguiente carga lo compara con su delta
+            if delta_dir:
+                commit_hash_index(delta_dir, cdc_dir)
+        finally:
+            connection.execute(
+                text("SELECT pg_advisory_unlock(hashtext(:table_name), hashtext(:partition_key))"), lock_params
+            )
+
+
+def load_to_db(ti, params=None):
     """
     Load the merged Spotify-Grammy dataset into a SQL database
     and save a copy for EDA.
 
+    Only the rows of the run's partition are replaced, so runs of different
+    partitions can load concurrently. When a change-data-capture delta is
+    available and was computed against the committed index of the
+    partition, only the delta is applied (see load_partition).
+
+    The CSV is converted to Arrow once; that table feeds both the Parquet
+    dataset and the binary COPY into the database.
+
     Args:
         ti: Task instance to pull the file path from XCom.
+        params (dict): DAG run params selecting the partition.
     Returns:
-        str: Path to the saved file for EDA
+        str: Path to the partitioned dataset saved for EDA
     """
     merged_file_path = ti.xcom_pull(task_ids='merge_spotify_grammy')
     if not merged_file_path:
         raise ValueError("No file path received "
         "from merge_spotify_grammy task")
+    partition = resolve_partition(params)
  
     # Read the combined CSV file
     logger.info(f"Reading combined data from: {merged_file_path}")
     merged_df = pd.read_csv(merged_file_path)
+    merged_table = pa.Table.from_pandas(merged_df, preserve_index=False)
   
-    # Save a copy for EDA in the project directory
-    eda_file_path = os.path.expanduser(
-        "~/workshop_2_etl_process_using_airflow/data/2_final/spotify_grammy_merged.csv"
-        )
- 
-    # Ensure the directory exists
-    os.makedirs(os.path.dirname(eda_file_path), exist_ok=True)
-    
-    # Save the file for EDA
-    merged_df.to_csv(eda_file_path, index=False)
-    logger.info(f"Data saved for EDA at: {eda_file_path}")
+    # Save a partitioned copy for EDA in the project directory
+    eda_dataset_dir = write_partitioned_dataset(merged_table, partition_dir(DATASET_DIR, partition))
+    logger.info(f"Data saved for EDA at: {eda_dataset_dir}")
     
     create_database_load()
     # Connect to the database
@@ -57,32 +231,18 @@ def load_to_db(ti):
     if engine is None:
         raise ConnectionError("Could not connect to the database")
     
+    delta_dir = ti.xcom_pull(task_ids='capture_merged_changes')
     try:
-        # Save the DataFrame to the database
-        table_name = "spotify_grammy_merged"
-        logger.info(f"Saving data to table '{table_name}'...")
-        merged_df.to_sql(
-            table_name, 
-            engine, 
-            if_exists='replace',  # Replace the table if it already exists
-            index=False
+        table_existed = inspect(engine).has_table(TABLE_NAME)
+        prepare_table(engine, TABLE_NAME, merged_df.head(0).assign(**{PARTITION_COLUMN: partition["key"]}))
+        load_partition(
+            engine, TABLE_NAME, partition["key"], merged_table,
+            delta_dir=delta_dir, cdc_dir=partition_dir(CDC_DIR, partition), table_existed=table_existed
         )
-        logger.info(f"Data successfully saved to table '{table_name}' with {len(merged_df)} rows")
-    except SQLAlchemyError as e:
+    except (SQLAlchemyError, psycopg2.Error) as e:
         logger.error(f"Error saving data to the database: {e}")
         raise
-    # Guardar el resultado en un archivo temporal (como CSV)
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as tmp_file:
-        merged_df.to_csv(tmp_file.name, index=False)
-        merged_file_load_path = tmp_file.name
-    logger.info(f"DataFrame combinado guardado en: {merged_file_load_path} con {len(merged_df)} filas")
-
     # Limpiar archivos temporales
-    for file_path in [merged_file_path]:
-        try:
-            os.remove(file_path)
-            logger.info(f"Archivo temporal eliminado: {file_path}")
-        except Exception as e:
-            logger.warning(f"No se pudo eliminar el archivo temporal {file_path}: {e}")
+    release(merged_file_path)
 
-    return merged_file_load_path
\ No newline at end of file
+    return eda_dataset_dir
\ No newline at end of file
@@ -0,0 +1,219 @@
+"""Change-data-capture between runs of the merged Spotify-Grammy dataset.
+
+Each merged row is hashed and the row hashes are combined per 'track_id'.
+The resulting hash index is compared with the one from the previous run to
+produce insert, update and delete sets. Both the hash index and the delta
+are stored as zstd-compressed Parquet files.
+
+Each run partition keeps its own committed hash index, and the delta and
+pending index of a run live in the run's scratch space until the load
+commits them. The delta also records the fingerprint of the committed index
+it was computed against, so the load only applies it while that index is
+still the committed one.
+"""
+
+import io
+import os
+import shutil
+import hashlib
+import logging
+import pandas as pd
+
+from src.scratch.manager import scratch_path, frame_size_hint
+from src.partitioning.partitions import resolve_partition, partition_dir
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+CDC_DIR = os.path.join(BASE_DIR, "data", "2_final", "_cdc")
+HASH_INDEX_FILE = "hash_index.parquet"
+PENDING_HASH_INDEX_FILE = "hash_index.pending.parquet"
+BASE_INDEX_FILE = "base_index.sha256"
+KEY_COLUMN = "track_id"
+
+
+def hash_merged_rows(df, key=KEY_COLUMN):
+    """
+    Compute one content hash per key.
+
+    Every row is hashed over all of its columns and the row hashes of a key
+    are added together (with int64 wrap-around), so the result does not
+    depend on row order and changes whenever any row of the key changes.
+
+    Args:
+        df (pd.DataFrame): Merged dataset.
+        key (str): Column identifying a track.
+
+    Returns:
+        pd.DataFrame: Columns [key, 'row_hash'] with one row per key.
+    """
+    row_hashes = pd.util.hash_pandas_object(df, index=False).values.view("int64")
+    hashes = pd.DataFrame({key: df[key].values, "row_hash": row_hashes})
+    return hashes.groupby(key, sort=True)["row_hash"].sum().reset_index()
+
+
+def compute_delta(df, current_index, previous_index, key=KEY_COLUMN):
+    """
+    Compare two hash indexes and split the merged dataset into change sets.
+
+    Args:
+        df (pd.DataFrame): Merged dataset of the current run.
+        current_index (pd.DataFrame): Hash index of the current run.
+        previous_index (pd.DataFrame): Hash index of the previous run.
+        key (str): Column identifying a track.
+
+    Returns:
+        dict: 'insert' and 'update' hold the full merged rows of the affected
+        keys, 'delete' holds only the keys that disappeared.
+    """
+    compared = current_index.merge(
+        previous_index,
+        on=key,
+        how="outer",
+        suffixes=("", "_previous"),
+        indicator=True
+    )
+    inserted = compared.loc[compared["_merge"] == "left_only", key]
+    deleted = compared.loc[compared["_merge"] == "right_only", key]
+    both = compared[compared["_merge"] == "both"]
+    updated = both.loc[both["row_hash"] != both["row_hash_previous"], key]
+
+    return {
+        "insert": df[df[key].isin(inserted)],
+        "update": df[df[key].isin(updated)],
+        "delete": pd.DataFrame({key: deleted.values}),
+    }
+
+
+def _read_hash_index(cdc_dir):
+    """Return the committed hash index and the SHA-256 of its file, or (None, None)."""
+    index_path = os.path.join(cdc_dir, HASH_INDEX_FILE)
+    if not os.path.exists(index_path):
+        return None, None
+    # Una sola lectura: el índice y su huella corresponden siempre al mismo archivo
+    with open(index_path, "rb") as index_file:
+        data = index_file.read()
+    return pd.read_parquet(io.BytesIO(data)), hashlib.sha256(data).hexdigest()
+
+
+def load_hash_index(cdc_dir=CDC_DIR):
+    """Return the committed hash index, or None on the first run."""
+    return _read_hash_index(cdc_dir)[0]
+
+
+def index_fingerprint(cdc_dir=CDC_DIR):
+    """Return the SHA-256 of the committed hash index file, or None on the first run."""
+    index_path = os.path.join(cdc_dir, HASH_INDEX_FILE)
+    if not os.path.exists(index_path):
+        return None
+    digest = hashlib.sha256()
+    with open(index_path, "rb") as index_file:
+        for chunk in iter(lambda: index_file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def delta_base_fingerprint(delta_dir):
+    """
+    Return the fingerprint of the committed index a delta was computed against.
+
+    Returns None when the delta was computed without a committed index, or
+    does not record it, so it can only be loaded by replacing the partition.
+    """
+    base_path = os.path.join(delta_dir, BASE_INDEX_FILE)
+    if not os.path.exists(base_path):
+        return None
+    with open(base_path) as base_file:
+        return base_file.read().strip() or None
+
+
+def commit_hash_index(delta_dir, cdc_dir=CDC_DIR):
+    """
+    Promote the pending hash index written by capture_merged_changes.
+
+    Called once the delta has been applied, so a failed load is captured
+    again on the next run instead of being lost. The caller holds the load
+    lock of the partition, so no other run checks or applies a delta in
+    between.
+
+    Args:
+        delta_dir (str): Delta directory returned by capture_merged_changes.
+        cdc_dir (str): Directory of the partition's committed hash index.
+    """
+    pending_path = os.path.join(delta_dir, PENDING_HASH_INDEX_FILE)
+    if not os.path.exists(pending_path):
+        logger.warning(f"No hay índice pendiente en: {pending_path}")
+        return
+    # El delta puede estar en otro sistema de archivos: copiar y luego reemplazar
+    os.makedirs(cdc_dir, exist_ok=True)
+    index_path = os.path.join(cdc_dir, HASH_INDEX_FILE)
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    shutil.copyfile(pending_path, tmp_path)
+    os.replace(tmp_path, index_path)
+    logger.info(f"Índice de hashes confirmado en: {index_path}")
+
+
+def capture_merged_changes(ti, params=None, cdc_dir=CDC_DIR):
+    """
+    Compute the delta of the merged dataset against the previous run of the same partition.
+
+    Args:
+        ti: Task instance to pull the merged file path from XCom.
+        params (dict): DAG run params selecting the partition.
+        cdc_dir (str): Directory holding the hash index of the 'all' partition.
+
+    Returns:
+        str: Directory with insert/update/delete Parquet files, the pending
+        hash index and the fingerprint of the committed index the delta was
+        computed against. On the first run of a partition there is no
+        previous index, so every track is an insert.
+    """
+    merged_file_path = ti.xcom_pull(task_ids='merge_spotify_grammy')
+    if not merged_file_path:
+        raise ValueError("No file path received from merge_spotify_grammy task")
+
+    logger.info(f"Leyendo datos combinados desde: {merged_file_path}")
+    merged_df = pd.read_csv(merged_file_path)
+
+    current_index = hash_merged_rows(merged_df)
+    partition = resolve_partition(params)
+    previous_index, base_fingerprint = _read_hash_index(partition_dir(cdc_dir, partition))
+    if previous_index is None:
+        logger.info("No existe un índice previo; todas las filas son inserciones.")
+        previous_index = current_index.iloc[0:0]
+
+    delta = compute_delta(merged_df, current_index, previous_index)
+
+    delta_dir = scratch_path(
+        ti.run_id, "capture_merged_changes", "", size_hint=frame_size_hint(current_index, *delta.values())
+    )
+    os.makedirs(delta_dir, exist_ok=True)
+    for operation, frame in delta.items():
+        frame.to_parquet(
+            os.path.join(delta_dir, f"{operation}.parquet"),
+            compression="zstd",
+            index=False
+        )
+    current_index.to_parquet(
+        os.path.join(delta_dir, PENDING_HASH_INDEX_FILE),
+        compression="zstd",
+        index=False
+    )
+    with open(os.path.join(delta_dir, BASE_INDEX_FILE), "w") as base_file:
+        base_file.write(base_fingerprint or "")
+
+    logger.info(
+        f"Delta calculado para la partición {partition['key']}: {delta['insert'][KEY_COLUMN].nunique()} inserciones, "
+        f"{delta['update'][KEY_COLUMN].nunique()} actualizaciones, "
+        f"{len(delta['delete'])} eliminaciones"
+    )
+    return delta_dir
@@ -1,9 +1,14 @@
 """Module to merge Spotify, Grammy Awards, and MusicBrainz datasets."""
 
 import logging
+import numpy as np
 import pandas as pd
-import os
-import tempfile
+from src.query.catalog import save_intermediate
+from src.transformation.normalize import normalize_columns
+from src.transformation.dictionary import NULL_CODE, encode, to_categorical
+from src.scratch.manager import scratch_path, release, frame_size_hint
+from src.merge.planner import plan_merge
+from src.partitioning.partitions import resolve_partition
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -17,113 +22,92 @@ if not logger.hasHandlers():
     logger.addHandler(handler)
 
 
-def merge_spotify_grammy_musicbrainz(ti):
+def merge_frames(spotify_df, spotify_keys, grammy_df, grammy_artist_keys, grammy_nominee_keys,
+                 musicbrainz_df, musicbrainz_keys):
     """
-    Merge transformed Spotify, Grammy, and MusicBrainz datasets.
-    Performs two merges with Grammy: first by 'artist', then by 'nominee'.
-    Drops columns with 85% or more null values.
+    Join the encoded Spotify, Grammy and MusicBrainz frames.
+
+    The merge is planned first, so columns with 85% or more null values
+    (except 'country' and 'type') are removed from the inputs and never built.
 
     Args:
-        ti: Task instance to pull file paths from XCom.
+        spotify_df (pd.DataFrame): Transformed Spotify data.
+        spotify_keys (np.ndarray): Artist codes of the Spotify 'artists' column.
+        grammy_df (pd.DataFrame): Transformed Grammy data.
+        grammy_artist_keys (np.ndarray): Artist codes of the Grammy 'artist' column.
+        grammy_nominee_keys (np.ndarray): Artist codes of the Grammy 'nominee' column.
+        musicbrainz_df (pd.DataFrame): Transformed MusicBrainz data.
+        musicbrainz_keys (np.ndarray): Artist codes of the MusicBrainz 'name' column.
 
     Returns:
-        str: Path to the temporary file where the merged DataFrame is saved (CSV).
+        pd.DataFrame: Merged dataset.
     """
-    # Obtener las rutas de los archivos desde XCom
-    spotify_file_path = ti.xcom_pull(task_ids='transform_spotify')
-    grammy_file_path = ti.xcom_pull(task_ids='transform_grammy')
-    musicbrainz_file_path = ti.xcom_pull(task_ids='transform_api')
-
-    # Verificar que todos los archivos estén presentes
-    if not all([spotify_file_path, grammy_file_path, musicbrainz_file_path]):
-        missing = [f for f, p in [("Spotify", spotify_file_path), ("Grammy", grammy_file_path), ("MusicBrainz", musicbrainz_file_path)] if not p]
-        raise ValueError(f"Faltan rutas de archivo para: {', '.join(missing)}")
-
-    # Leer los DataFrames transformados (como CSV)
-    logger.info(f"Leyendo Spotify desde: {spotify_file_path}")
-    spotify_df = pd.read_csv(spotify_file_path)
-    logger.info(f"Leyendo Grammy desde: {grammy_file_path}")
-    grammy_df = pd.read_csv(grammy_file_path)
-    logger.info(f"Leyendo MusicBrainz desde: {musicbrainz_file_path}")
-    musicbrainz_df = pd.read_csv(musicbrainz_file_path)
-
-    # Limpiar columnas para el merge
-    spotify_df['artists'] = spotify_df['artists'].str.lower().str.strip()
-    grammy_df['artist'] = grammy_df['artist'].str.lower().str.strip()
-    grammy_df['nominee'] = grammy_df['nominee'].str.lower().str.strip()
-    musicbrainz_df['name'] = musicbrainz_df['name'].str.lower().str.strip()
+    # Planificar el merge: las columnas con 85% o más de valores nulos (excepto 'country'
+    # y 'type') se detectan con estadísticas por clave y no se llegan a construir
+    plan = plan_merge(
+        spotify_df, spotify_keys,
+        grammy_df, grammy_artist_keys, grammy_nominee_keys,
+        musicbrainz_df, musicbrainz_keys
+    )
+    logger.info(f"Merge planificado: {plan['num_rows']} filas")
+    if plan['dropped']:
+        logger.info(f"Eliminando columnas con 85% o más de valores nulos: {plan['dropped']}")
+    spotify_df = spotify_df[plan['spotify_columns']].assign(_artist_key=spotify_keys)
 
     # Primer merge: Spotify con Grammy por 'artists' y 'artist'
     merge_by_artist = pd.merge(
         spotify_df,
-        grammy_df,
+        grammy_df[plan['grammy_columns']].assign(_key=grammy_artist_keys),
         how='left',
-        left_on=['artists'],
-        right_on=['artist'],
-        suffixes=('', '_artist')
+        left_on=['_artist_key'],
+        right_on=['_key']
     )
     logger.info(f"Primer merge (por artist): {len(merge_by_artist)} filas")
-
-    # Eliminar columna redundante 'artist' de Grammy
-    merge_by_artist = merge_by_artist.drop(columns=['artist'], errors='ignore')
+    merge_by_artist = merge_by_artist.drop(columns=['_key'])
 
     # Segundo merge: Resultado anterior con Grammy por 'artists' y 'nominee'
+    # (las columnas de Grammy llegan como '<col>_nominee', salvo 'artist')
+    nominee_columns = [
+        col for col in grammy_df.columns
+        if col in plan['grammy_columns'] or col in plan['grammy_nominee_columns']
+    ]
     merge_by_nominee = pd.merge(
         merge_by_artist,
-        grammy_df,
+        grammy_df[nominee_columns]
+        .rename(columns={col: f"{col}_nominee" for col in nominee_columns if col != 'artist'})
+        .assign(_key=grammy_nominee_keys),
         how='left',
-        left_on=['artists'],
-        right_on=['nominee'],
-        suffixes=('', '_nominee')
+        left_on=['_artist_key'],
+        right_on=['_key']
     )
     logger.info(f"Segundo merge (por nominee): {len(merge_by_nominee)} filas")
-
-    # Eliminar columna redundante 'nominee' de Grammy
-    merge_by_nominee = merge_by_nominee.drop(columns=['nominee'], errors='ignore')
+    merge_by_nominee = merge_by_nominee.drop(columns=['_key'])
 
     # Combinar columnas duplicadas, asegurando que 'nominated' se preserve
-    for col in grammy_df.columns:
-        if col in ['artist', 'nominee']:
-            continue
+    for col in plan['grammy_columns']:
         col_nominee = f"{col}_nominee"
-        if col_nominee in merge_by_nominee.columns:
-            if col not in merge_by_nominee.columns:
-                merge_by_nominee[col] = merge_by_nominee[col_nominee]  # Crear si no existe
-            else:
-                merge_by_nominee[col] = merge_by_nominee[col].fillna(merge_by_nominee[col_nominee])
-            merge_by_nominee = merge_by_nominee.drop(columns=[col_nominee])
+        merge_by_nominee[col] = merge_by_nominee[col].fillna(merge_by_nominee[col_nominee])
+        merge_by_nominee = merge_by_nominee.drop(columns=[col_nominee])
 
     # Tercer merge: Resultado con MusicBrainz por 'artists' y 'name'
     final_merged_df = pd.merge(
         merge_by_nominee,
-        musicbrainz_df,
+        musicbrainz_df[plan['musicbrainz_columns']].assign(_key=musicbrainz_keys),
         how='left',
-        left_on=['artists'],
-        right_on=['name']
+        left_on=['_artist_key'],
+        right_on=['_key']
     )
     logger.info(f"Tercer merge (con MusicBrainz): {len(final_merged_df)} filas")
 
-    # Eliminar columna redundante 'name' de MusicBrainz
-    final_merged_df = final_merged_df.drop(columns=['name'], errors='ignore')
+    # Eliminar las claves enteras
+    final_merged_df = final_merged_df.drop(columns=['_key', '_artist_key'])
 
-    # Rellenar valores NaN en 'winner' y 'nominated', creando 'nominated' si no existe
+    # Rellenar valores NaN en 'winner', creándola si no existe
     if 'winner' not in final_merged_df.columns:
         final_merged_df['winner'] = False
     else:
         final_merged_df['winner'] = final_merged_df['winner'].fillna(False)
 
-    # Eliminar columnas con 85% o más de valores nulos, excluyendo 'country' y 'type'
-    threshold = 0.85
-    total_rows = len(final_merged_df)
-    null_counts = final_merged_df.isnull().sum()
-    columns_to_drop = [col for col in final_merged_df.columns 
-                       if null_counts[col] / total_rows >= threshold 
-                       and col not in ['country', 'type']]
-    
-    if columns_to_drop:
-        logger.info(f"Eliminando columnas con 85% o más de valores nulos: {columns_to_drop}")
-        final_merged_df = final_merged_df.drop(columns=columns_to_drop)
-
     # Asegurar que 'country' y 'type' estén presentes, rellenando NaN si es necesario
     if 'country' not in final_merged_df.columns:
         logger.warning("'country' no está en el DataFrame final. Creándola con 'N/A'.")
@@ -137,18 +121,108 @@ def merge_spotify_grammy_musicbrainz(ti):
     else:
         final_merged_df['type'] = final_merged_df['type'].fillna('N/A')
 
+    return final_merged_df
+
+
+def restrict_to_nominated(spotify_df, spotify_keys, grammy_artist_keys, grammy_nominee_keys):
+    """
+    Keep the Spotify rows whose artist is an artist or nominee of the Grammy rows.
+
+    Used for partitions with a Grammy year window: the Grammy rows are
+    already limited to the window, so the partition holds only the tracks
+    nominated in those years, and the windows of a backfill do not each
+    repeat every Spotify track.
+
+    Returns:
+        tuple: Filtered Spotify DataFrame and its artist codes.
+    """
+    grammy_keys = np.union1d(grammy_artist_keys, grammy_nominee_keys)
+    mask = np.isin(spotify_keys, grammy_keys[grammy_keys != NULL_CODE])
+    return spotify_df[mask].reset_index(drop=True), spotify_keys[mask]
+
+
+def merge_spotify_grammy_musicbrainz(ti, params=None):
+    """
+    Merge transformed Spotify, Grammy, and MusicBrainz datasets (Parquet).
+    Performs two merges with Grammy: first by 'artist', then by 'nominee'.
+    Drops columns with 85% or more null values; they are predicted by the
+    merge planner from per-key statistics and never built. In a partition
+    with a Grammy year window only the tracks nominated in the window are
+    kept (see restrict_to_nominated).
+
+    Args:
+        ti: Task instance to pull file paths from XCom.
+        params (dict): DAG run params; the query views are saved for the run's partition.
+
+    Returns:
+        str: Path to the temporary file where the merged DataFrame is saved (CSV).
+    """
+    # Obtener las rutas de los archivos desde XCom
+    spotify_file_path = ti.xcom_pull(task_ids='transform_spotify')
+    grammy_file_path = ti.xcom_pull(task_ids='transform_grammy')
+    musicbrainz_file_path = ti.xcom_pull(task_ids='transform_api')
+
+    # Verificar que todos los archivos estén presentes
+    if not all([spotify_file_path, grammy_file_path, musicbrainz_file_path]):
+        missing = [f for f, p in [("Spotify", spotify_file_path), ("Grammy", grammy_file_path), ("MusicBrainz", musicbrainz_file_path)] if not p]
+        raise ValueError(f"Faltan rutas de archivo para: {', '.join(missing)}")
+
+    # Leer los DataFrames transformados (como Parquet)
+    logger.info(f"Leyendo Spotify desde: {spotify_file_path}")
+    spotify_df = pd.read_parquet(spotify_file_path)
+    logger.info(f"Leyendo Grammy desde: {grammy_file_path}")
+    grammy_df = pd.read_parquet(grammy_file_path)
+    logger.info(f"Leyendo MusicBrainz desde: {musicbrainz_file_path}")
+    musicbrainz_df = pd.read_parquet(musicbrainz_file_path)
+
+    # Persistir las salidas transformadas para el motor de consultas
+    partition = resolve_partition(params)
+    save_intermediate(spotify_df, "spotify", partition)
+    save_intermediate(grammy_df, "grammy", partition)
+    save_intermediate(musicbrainz_df, "musicbrainz", partition)
+
+    # Normalizar columnas para el merge (se omiten si ya vienen normalizadas)
+    spotify_df = normalize_columns(spotify_df, ['artists'])
+    grammy_df = normalize_columns(grammy_df, ['artist', 'nominee'])
+    musicbrainz_df = normalize_columns(musicbrainz_df, ['name'])
+
+    # Codificar artistas con un diccionario compartido para unir por claves enteras
+    (spotify_keys, grammy_artist_keys, grammy_nominee_keys, musicbrainz_keys), _ = encode(
+        "artist",
+        spotify_df['artists'],
+        grammy_df['artist'],
+        grammy_df['nominee'],
+        musicbrainz_df['name']
+    )
+
+    # Codificar géneros, categorías y etiquetas repetidas como categóricas
+    spotify_df['track_genre'] = to_categorical("genre", spotify_df['track_genre'])
+    grammy_df['category'] = to_categorical("category", grammy_df['category'])
+    for col in ['genres', 'tags']:
+        if col in musicbrainz_df.columns:
+            musicbrainz_df[col] = to_categorical(f"musicbrainz_{col}", musicbrainz_df[col])
+
+    if partition["grammy_year_from"] is not None or partition["grammy_year_to"] is not None:
+        spotify_df, spotify_keys = restrict_to_nominated(
+            spotify_df, spotify_keys, grammy_artist_keys, grammy_nominee_keys
+        )
+        logger.info(f"{len(spotify_df)} filas de Spotify con nominaciones en la partición {partition['key']}")
+
+    final_merged_df = merge_frames(
+        spotify_df, spotify_keys,
+        grammy_df, grammy_artist_keys, grammy_nominee_keys,
+        musicbrainz_df, musicbrainz_keys
+    )
+
     # Guardar el resultado en un archivo temporal (como CSV)
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as tmp_file:
-        final_merged_df.to_csv(tmp_file.name, index=False)
-        merged_file_path = tmp_file.name
+    merged_file_path = scratch_path(
+        ti.run_id, "merge_spotify_grammy", ".csv", size_hint=frame_size_hint(final_merged_df)
+    )
+    final_merged_df.to_csv(merged_file_path, index=False)
     logger.info(f"DataFrame combinado guardado en: {merged_file_path} con {len(final_merged_df)} filas")
 
     # Limpiar archivos temporales
     for file_path in [spotify_file_path, grammy_file_path, musicbrainz_file_path]:
-        try:
-            os.remove(file_path)
-            logger.info(f"Archivo temporal eliminado: {file_path}")
-        except Exception as e:
-            logger.warning(f"No se pudo eliminar el archivo temporal {file_path}: {e}")
+        release(file_path)
 
     return merged_file_path
\ No newline at end of file
@@ -0,0 +1,131 @@
+"""Merge planner: predict the null fraction of every merged column before joining.
+
+The merge left-joins Spotify with Grammy by artist, then by nominee, then
+with MusicBrainz, all on integer artist keys from the shared dictionary.
+The number of output rows of a Spotify row, and how many of them are null
+in a right-side column, only depend on per-key statistics of the right
+frames: how many rows share the key and how many of those are null in the
+column. Those statistics are key-indexed count arrays (np.bincount over
+the dictionary codes), so the exact null count of every output column is
+known without building the joined frame, and the columns that would be
+dropped for crossing the null threshold are never materialized.
+"""
+
+import numpy as np
+
+NULL_THRESHOLD = 0.85
+# Columnas que se conservan aunque superen el umbral
+ALWAYS_KEEP = ["country", "type"]
+# Columnas de Grammy que solo llegan desde el merge por 'nominee' (nombre final)
+GRAMMY_NOMINEE_ONLY = {"nominee": "nominee_nominee", "artist": "artist"}
+# Columnas que el merge rellena después de unir
+FILLED_COLUMNS = ["winner"]
+
+
+def _key_stats(codes, frame, columns, size):
+    """
+    Count the rows and the nulls per column of a right-side frame per key.
+
+    Returns:
+        tuple: (rows per key, {column: nulls per key}), indexed by code + 1
+        so the null code (-1) is slot 0.
+    """
+    slots = np.asarray(codes, dtype="int64") + 1
+    counts = np.bincount(slots, minlength=size)
+    nulls = {
+        col: np.bincount(slots, weights=frame[col].isna().to_numpy(), minlength=size).astype("int64")
+        for col in columns
+    }
+    return counts, nulls
+
+
+def _nulls_per_row(counts, nulls, slots):
+    """Null rows contributed per left row: an unmatched left row gets one all-null row."""
+    matched = counts[slots] > 0
+    return np.where(matched, nulls[slots], 1)
+
+
+def plan_merge(spotify_df, spotify_keys, grammy_df, grammy_artist_keys, grammy_nominee_keys,
+               musicbrainz_df, musicbrainz_keys, threshold=NULL_THRESHOLD):
+    """
+    Predict the output of the Spotify-Grammy-MusicBrainz merge.
+
+    Args:
+        spotify_df (pd.DataFrame): Left frame of the merge.
+        spotify_keys (np.ndarray): Artist codes of the Spotify rows.
+        grammy_df (pd.DataFrame): Grammy frame joined twice.
+        grammy_artist_keys (np.ndarray): Artist codes of the Grammy 'artist' column.
+        grammy_nominee_keys (np.ndarray): Artist codes of the Grammy 'nominee' column.
+        musicbrainz_df (pd.DataFrame): MusicBrainz frame.
+        musicbrainz_keys (np.ndarray): Artist codes of the MusicBrainz 'name' column.
+        threshold (float): Null fraction at or above which a column is dropped.
+
+    Returns:
+        dict: 'num_rows' of the merge, 'null_counts' per output column and
+        the columns to keep from each side: 'spotify_columns',
+        'grammy_columns' (filled from both Grammy merges),
+        'grammy_nominee_columns' (nominee merge only) and
+        'musicbrainz_columns'.
+    """
+    size = 2 + max(
+        int(np.max(keys, initial=-1))
+        for keys in [spotify_keys, grammy_artist_keys, grammy_nominee_keys, musicbrainz_keys]
+    )
+    slots = np.asarray(spotify_keys, dtype="int64") + 1
+
+    grammy_columns = [col for col in grammy_df.columns if col not in GRAMMY_NOMINEE_ONLY]
+    grammy_nominee_columns = [col for col in grammy_df.columns if col in GRAMMY_NOMINEE_ONLY]
+    musicbrainz_columns = [col for col in musicbrainz_df.columns if col != "name"]
+
+    artist_counts, artist_nulls = _key_stats(grammy_artist_keys, grammy_df, grammy_columns, size)
+    nominee_counts, nominee_nulls = _key_stats(grammy_nominee_keys, grammy_df, grammy_df.columns, size)
+    musicbrainz_counts, musicbrainz_nulls = _key_stats(musicbrainz_keys, musicbrainz_df, musicbrainz_columns, size)
+
+    # Filas de salida por fila de Spotify en cada merge (un left join sin coincidencias deja una fila)
+    artist_rows = np.maximum(artist_counts[slots], 1)
+    nominee_rows = np.maximum(nominee_counts[slots], 1)
+    musicbrainz_rows = np.maximum(musicbrainz_counts[slots], 1)
+    output_rows = artist_rows * nominee_rows * musicbrainz_rows
+
+    null_counts = {}
+    for col in spotify_df.columns:
+        null_counts[col] = int((spotify_df[col].isna().to_numpy() * output_rows).sum())
+    for col in grammy_columns:
+        # La columna final toma el valor del merge por artist y, si es nulo, el del merge por nominee
+        null_counts[col] = int((
+            _nulls_per_row(artist_counts, artist_nulls[col], slots)
+            * _nulls_per_row(nominee_counts, nominee_nulls[col], slots)
+            * musicbrainz_rows
+        ).sum())
+    for col in grammy_nominee_columns:
+        null_counts[GRAMMY_NOMINEE_ONLY[col]] = int((
+            artist_rows
+            * _nulls_per_row(nominee_counts, nominee_nulls[col], slots)
+            * musicbrainz_rows
+        ).sum())
+    for col in musicbrainz_columns:
+        null_counts[col] = int((
+            artist_rows
+            * nominee_rows
+            * _nulls_per_row(musicbrainz_counts, musicbrainz_nulls[col], slots)
+        ).sum())
+    for col in FILLED_COLUMNS:
+        if col in null_counts:
+            null_counts[col] = 0
+
+    num_rows = int(output_rows.sum())
+    dropped = {
+        col for col, nulls in null_counts.items()
+        if num_rows and nulls / num_rows >= threshold and col not in ALWAYS_KEEP
+    }
+    return {
+        "num_rows": num_rows,
+        "null_counts": null_counts,
+        "dropped": [col for col in null_counts if col in dropped],
+        "spotify_columns": [col for col in spotify_df.columns if col not in dropped],
+        "grammy_columns": [col for col in grammy_columns if col not in dropped],
+        "grammy_nominee_columns": [
+            col for col in grammy_nominee_columns if GRAMMY_NOMINEE_ONLY[col] not in dropped
+        ],
+        "musicbrainz_columns": [col for col in musicbrainz_columns if col not in dropped],
+    }
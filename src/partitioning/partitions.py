@@ -0,0 +1,138 @@
+"""Run partitions of the pipeline.
+
+A DAG run can be restricted to a Spotify snapshot and/or a range of Grammy
+years through its params. The params resolve to a partition key, and every
+persistent output of the run (EDA dataset, CDC index, Grammy index, query
+views, rows of the load table) is scoped to that key, so runs of different
+partitions can execute concurrently. A run without params is the 'all'
+partition, which keeps the original output locations.
+
+Rows of the load table carry their partition key, and every partition is
+a complete, independent result of its params:
+
+- Without a Grammy year window, a partition holds every Spotify track of
+  its snapshot, joined to the Grammy nominations when there are any.
+- With a Grammy year window, it holds only the tracks nominated in those
+  years, joined to the nominations of those years. Disjoint windows of the
+  same snapshot, as planned by the backfill, never share a row.
+
+Partitions with and without a window of the same snapshot overlap, so a
+query should select one partition key, or only keys of disjoint windows.
+"""
+
+import os
+import re
+import fcntl
+import shutil
+from contextlib import contextmanager
+
+PARTITIONS_DIR_NAME = "partitions"
+DEFAULT_PARTITION = "all"
+PARTITION_COLUMN = "partition_key"
+PARAM_DEFAULTS = {
+    "spotify_snapshot": None,
+    "grammy_year_from": None,
+    "grammy_year_to": None,
+}
+
+
+def _optional_year(value, name):
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Param '{name}' must be a year, got {value!r}")
+
+
+def resolve_partition(params=None):
+    """
+    Resolve the params of a DAG run into a partition.
+
+    Args:
+        params (dict): Run params; missing or empty values mean 'no restriction'.
+
+    Returns:
+        dict: 'spotify_snapshot' (str or None), 'grammy_year_from' and
+        'grammy_year_to' (int or None), and the partition 'key'.
+
+    Raises:
+        ValueError: If a param is malformed or the year range is empty.
+    """
+    params = {**PARAM_DEFAULTS, **(params or {})}
+    snapshot = params["spotify_snapshot"] or None
+    if snapshot is not None and not re.fullmatch(r"[A-Za-z0-9._-]+", str(snapshot)):
+        raise ValueError(f"Param 'spotify_snapshot' has invalid characters: {snapshot!r}")
+    year_from = _optional_year(params["grammy_year_from"], "grammy_year_from")
+    year_to = _optional_year(params["grammy_year_to"], "grammy_year_to")
+    if year_from is not None and year_to is not None and year_from > year_to:
+        raise ValueError(f"Empty Grammy year range: {year_from} > {year_to}")
+
+    key = DEFAULT_PARTITION
+    if snapshot is not None or year_from is not None or year_to is not None:
+        years = f"{year_from if year_from is not None else 'min'}-{year_to if year_to is not None else 'max'}"
+        key = f"spotify={snapshot or 'latest'}__grammy={years}"
+
+    return {
+        "spotify_snapshot": snapshot,
+        "grammy_year_from": year_from,
+        "grammy_year_to": year_to,
+        "key": key,
+    }
+
+
+def partition_dir(base_dir, partition):
+    """
+    Return the location of a persistent output for a partition.
+
+    The 'all' partition uses base_dir itself; other partitions live in
+    'partitions/<key>/' next to it, e.g. 'data/2_final/partitions/<key>/_cdc'.
+
+    Args:
+        base_dir (str): Output location of the 'all' partition.
+        partition (dict or str): Partition from resolve_partition, or its key.
+    """
+    key = partition["key"] if isinstance(partition, dict) else partition
+    if key == DEFAULT_PARTITION:
+        return base_dir
+    parent, name = os.path.split(os.path.normpath(base_dir))
+    return os.path.join(parent, PARTITIONS_DIR_NAME, key, name)
+
+
+@contextmanager
+def exclusive_lock(path):
+    """
+    Hold an exclusive advisory lock on 'path.lock' across processes.
+
+    Used around read-modify-write of files shared by every partition, such
+    as the persisted dictionaries and the accumulated MusicBrainz artists.
+    """
+    lock_path = f"{path}.lock"
+    os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+    with open(lock_path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def replace_directory(staging_dir, target_dir):
+    """
+    Swap a fully written staging directory in place of target_dir.
+
+    The previous tree is moved aside with os.replace before the new one is
+    moved in, and removed only afterwards, so readers (DuckDB views,
+    notebooks) never find the directory deleted while it is being rebuilt.
+    Two runs of the same partition can finish at the same time; the swap
+    holds the lock of target_dir, so one run never moves away the tree the
+    other has just moved in.
+    """
+    backup_dir = f"{target_dir}.previous"
+    with exclusive_lock(target_dir):
+        # Restos de un intercambio interrumpido
+        shutil.rmtree(backup_dir, ignore_errors=True)
+        if os.path.exists(target_dir):
+            os.replace(target_dir, backup_dir)
+        os.replace(staging_dir, target_dir)
+        shutil.rmtree(backup_dir, ignore_errors=True)
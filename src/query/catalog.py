@@ -0,0 +1,69 @@
+"""Catalog of the pipeline outputs exposed to the query engine.
+
+The transformed Spotify, Grammy and MusicBrainz frames only live in temporary
+files between tasks, so the merge step persists them here as Parquet files.
+Partitioned runs persist them under the partition directory instead.
+"""
+
+import os
+import logging
+
+from src.partitioning.partitions import DEFAULT_PARTITION, partition_dir
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+INTERM_DIR = os.path.join(BASE_DIR, "data", "1_interm")
+FINAL_DIR = os.path.join(BASE_DIR, "data", "2_final")
+
+# Nombre de la vista -> (ruta o patrón, formato)
+VIEW_SOURCES = {
+    "spotify": (os.path.join(INTERM_DIR, "spotify_transformed.parquet"), "parquet"),
+    "grammy": (os.path.join(INTERM_DIR, "grammy_transformed.parquet"), "parquet"),
+    "musicbrainz": (os.path.join(INTERM_DIR, "musicbrainz_transformed.parquet"), "parquet"),
+    "musicbrainz_raw": (os.path.join(INTERM_DIR, "musicbrainz_artists.csv"), "csv"),
+    "merged": (os.path.join(FINAL_DIR, "spotify_grammy_merged"), "dataset"),
+}
+# Vistas compartidas por todas las particiones
+SHARED_VIEWS = {"musicbrainz_raw"}
+
+
+def view_sources(partition=DEFAULT_PARTITION):
+    """Return VIEW_SOURCES with the paths of a run partition."""
+    return {
+        view_name: (path if view_name in SHARED_VIEWS else partition_dir(path, partition), source_format)
+        for view_name, (path, source_format) in VIEW_SOURCES.items()
+    }
+
+
+def save_intermediate(df, view_name, partition=DEFAULT_PARTITION):
+    """
+    Persist a transformed DataFrame as the Parquet source of a query view.
+
+    Args:
+        df (pd.DataFrame): Transformed data.
+        view_name (str): Key of VIEW_SOURCES with a 'parquet' source.
+        partition (dict or str): Run partition owning the file.
+
+    Returns:
+        str: Path of the written Parquet file.
+    """
+    path, source_format = view_sources(partition)[view_name]
+    if source_format != "parquet":
+        raise ValueError(f"View '{view_name}' is not backed by a Parquet file")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp_path, compression="zstd", index=False)
+    os.replace(tmp_path, path)
+    logger.info(f"Vista '{view_name}' guardada en: {path} con {len(df)} filas")
+    return path
@@ -0,0 +1,125 @@
+"""Embedded SQL query engine over the pipeline outputs.
+
+Registers the intermediate and final outputs as DuckDB views. DuckDB scans
+the Parquet files lazily, pushing filters and column selection down to the
+row groups, so queries never load the full tables into memory.
+
+Usage:
+    python -m src.query.engine "SELECT track_genre, COUNT(*) FROM merged GROUP BY 1"
+    python -m src.query.engine --partition "spotify=latest__grammy=1990-1999" "SELECT COUNT(*) FROM merged"
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import duckdb
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
+from src.query.catalog import VIEW_SOURCES, view_sources
+from src.partitioning.partitions import DEFAULT_PARTITION
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+
+def _source_sql(path, source_format):
+    """Return the DuckDB table function that scans a view source."""
+    escaped = path.replace("'", "''")
+    if source_format == "parquet":
+        return f"read_parquet('{escaped}')"
+    if source_format == "csv":
+        return f"read_csv_auto('{escaped}', header=true)"
+    if source_format == "dataset":
+        return f"read_parquet('{escaped}/**/*.parquet', hive_partitioning=true)"
+    raise ValueError(f"Unknown source format: {source_format}")
+
+
+def connect(database=":memory:", sources=None):
+    """
+    Open a DuckDB connection with one view per available pipeline output.
+
+    Args:
+        database (str): DuckDB database file, in memory by default.
+        sources (dict): View name -> (path, format). Defaults to VIEW_SOURCES.
+
+    Returns:
+        duckdb.DuckDBPyConnection: Connection with the views registered.
+    """
+    sources = sources or VIEW_SOURCES
+    con = duckdb.connect(database)
+    for view_name, (path, source_format) in sources.items():
+        if not os.path.exists(path):
+            logger.debug(f"Vista '{view_name}' omitida, no existe: {path}")
+            continue
+        con.execute(
+            f'CREATE OR REPLACE VIEW "{view_name}" AS '
+            f"SELECT * FROM {_source_sql(path, source_format)}"
+        )
+    return con
+
+
+def list_views(con):
+    """Return the names of the registered views."""
+    rows = con.execute(
+        "SELECT view_name FROM duckdb_views() WHERE NOT internal ORDER BY view_name"
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def query(sql, params=None, con=None):
+    """
+    Run a SQL query over the pipeline outputs.
+
+    Args:
+        sql (str): Query referencing the registered views.
+        params (list): Optional positional parameters for '?' placeholders.
+        con: Connection from connect(); a new one is opened if omitted.
+
+    Returns:
+        pd.DataFrame: Query result.
+    """
+    con = con or connect()
+    start = time.perf_counter()
+    result = con.execute(sql, params or []).df()
+    logger.debug(f"Consulta ejecutada en {time.perf_counter() - start:.3f}s ({len(result)} filas)")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the ETL pipeline outputs with SQL.")
+    parser.add_argument("sql", nargs="?", help="SQL query to run")
+    parser.add_argument("--views", action="store_true", help="List the registered views")
+    parser.add_argument("--explain", action="store_true", help="Show the query plan")
+    parser.add_argument("--csv", action="store_true", help="Print the result as CSV")
+    parser.add_argument("--partition", default=DEFAULT_PARTITION, help="Run partition key to query")
+    args = parser.parse_args(argv)
+
+    con = connect(sources=view_sources(args.partition))
+    if args.views or not args.sql:
+        print("\n".join(list_views(con)))
+        return
+
+    if args.explain:
+        for _, plan in con.execute(f"EXPLAIN {args.sql}").fetchall():
+            print(plan)
+        return
+
+    result = query(args.sql, con=con)
+    print(result.to_csv(index=False) if args.csv else result.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
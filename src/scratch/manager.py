@@ -0,0 +1,161 @@
+"""Run-scoped scratch space for the intermediate files passed between tasks.
+
+Every DAG run gets its own scratch directory, so concurrent runs never
+share a file name. Small intermediates can be placed on a RAM disk
+(/dev/shm) when there is room, a per-run quota bounds the disk usage, and
+cleanup_scratch removes the run's directories whether the run succeeded or
+failed (plus any directories leaked by crashed runs).
+"""
+
+import os
+import re
+import time
+import errno
+import shutil
+import logging
+import tempfile
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+SCRATCH_ROOT = os.getenv("ETL_SCRATCH_DIR", os.path.join(tempfile.gettempdir(), "etl_scratch"))
+RAM_DISK_ROOT = os.getenv("ETL_RAM_SCRATCH_DIR", "/dev/shm/etl_scratch")
+SCRATCH_QUOTA_BYTES = int(os.getenv("ETL_SCRATCH_QUOTA_MB", "4096")) * 1024 * 1024
+RAM_DISK_MAX_BYTES = int(os.getenv("ETL_RAM_SCRATCH_MAX_MB", "64")) * 1024 * 1024
+STALE_AFTER_SECONDS = 24 * 60 * 60
+# Longitud máxima del texto de un float64 en un CSV
+NUMERIC_TEXT_BYTES = 24
+
+
+def _safe_run_id(run_id):
+    """Make a run id usable as a directory name."""
+    return re.sub(r"[^A-Za-z0-9._-]", "_", run_id or "manual")
+
+
+def _run_dirs(run_id):
+    safe_run_id = _safe_run_id(run_id)
+    roots = [SCRATCH_ROOT]
+    if os.path.isdir(os.path.dirname(RAM_DISK_ROOT)):
+        roots.append(RAM_DISK_ROOT)
+    return [os.path.join(root, safe_run_id) for root in roots]
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+    return total
+
+
+def run_usage(run_id):
+    """Bytes currently used by a run across its scratch directories."""
+    return sum(_dir_size(path) for path in _run_dirs(run_id) if os.path.isdir(path))
+
+
+def _use_ram_disk(size_hint):
+    if size_hint is None or size_hint > RAM_DISK_MAX_BYTES:
+        return False
+    ram_parent = os.path.dirname(RAM_DISK_ROOT)
+    if not os.path.isdir(ram_parent):
+        return False
+    # Dejar margen: la RAM libre del tmpfs debe cubrir el doble del archivo
+    return shutil.disk_usage(ram_parent).free >= 2 * size_hint
+
+
+def frame_size_hint(*frames):
+    """
+    Upper estimate, in bytes, of DataFrames once written to a scratch file.
+
+    Text columns count their in-memory size, which exceeds their encoded
+    bytes; every other value counts NUMERIC_TEXT_BYTES. Used as the
+    size_hint of scratch_path, so small outputs can go to the RAM disk.
+    """
+    total = 0
+    for df in frames:
+        text = df.select_dtypes(include=["object", "string"])
+        total += int(text.memory_usage(deep=True, index=False).sum())
+        total += (df.shape[1] - text.shape[1]) * len(df) * NUMERIC_TEXT_BYTES
+    return total
+
+
+def scratch_path(run_id, stage, suffix, size_hint=None):
+    """
+    Return the scratch file path of a stage output in a run.
+
+    Args:
+        run_id (str): Pipeline run identifier.
+        stage (str): Stage (task) name, unique within the run.
+        suffix (str): File extension, e.g. '.parquet'.
+        size_hint (int): Expected size in bytes. Outputs up to
+            RAM_DISK_MAX_BYTES go to the RAM disk when it has room.
+
+    Returns:
+        str: Path inside the run's scratch directory.
+
+    Raises:
+        OSError: If the run would exceed its scratch quota.
+    """
+    usage = run_usage(run_id)
+    if usage + (size_hint or 0) > SCRATCH_QUOTA_BYTES:
+        raise OSError(
+            errno.EDQUOT,
+            f"Scratch quota exceeded for run {run_id}: {usage} bytes used, "
+            f"{size_hint or 0} requested, quota {SCRATCH_QUOTA_BYTES}"
+        )
+
+    root = RAM_DISK_ROOT if _use_ram_disk(size_hint) else SCRATCH_ROOT
+    directory = os.path.join(root, _safe_run_id(run_id))
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{stage}{suffix}")
+
+
+def release(path):
+    """Delete a scratch file once its consumer is done with it."""
+    if not path:
+        return
+    try:
+        os.remove(path)
+        logger.info(f"Archivo temporal eliminado: {path}")
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"No se pudo eliminar el archivo temporal {path}: {e}")
+
+
+def cleanup_run(run_id):
+    """Remove every scratch directory of a run."""
+    for path in _run_dirs(run_id):
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+            logger.info(f"Directorio temporal eliminado: {path}")
+
+
+def cleanup_stale(max_age_seconds=STALE_AFTER_SECONDS):
+    """Remove run directories not modified for max_age_seconds (leaked by crashed runs)."""
+    now = time.time()
+    for root in [SCRATCH_ROOT, RAM_DISK_ROOT]:
+        if not os.path.isdir(root):
+            continue
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if os.path.isdir(path) and now - os.path.getmtime(path) > max_age_seconds:
+                shutil.rmtree(path, ignore_errors=True)
+                logger.info(f"Directorio temporal abandonado eliminado: {path}")
+
+
+def cleanup_scratch(run_id="manual"):
+    """Airflow callable: clean the run's scratch space and any stale directories."""
+    cleanup_run(run_id)
+    cleanup_stale()
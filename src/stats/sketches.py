@@ -0,0 +1,226 @@
+"""Mergeable summary sketches computed with vectorized group operations.
+
+Three sketch types are kept per group, each as a long-format DataFrame so
+that thousands of groups are built and merged with a handful of pandas
+group-bys instead of Python loops:
+
+- moments: count, mean, M2 (sum of squared deviations), min and max, the
+  state of Welford's algorithm. Partial moments are combined exactly with
+  the parallel form of the algorithm (Chan et al.).
+- digest: t-digest centroids (mean, weight) for quantiles. Centroids are
+  clustered by the k1 scale function, which keeps small clusters at the
+  tails, so merged digests stay bounded by the compression.
+- hll: HyperLogLog registers (register, rank) for distinct counts, stored
+  sparsely; merging is the register-wise maximum.
+
+Every function takes and returns frames keyed by the 'keys' columns, so the
+same code serves any grouping.
+"""
+
+import numpy as np
+import pandas as pd
+
+TDIGEST_COMPRESSION = 200
+HLL_PRECISION = 12
+
+
+# --- Welford moments ---------------------------------------------------------
+
+def moments_from_values(values, keys):
+    """
+    Compute the moments of the 'value' column per group.
+
+    Args:
+        values (pd.DataFrame): Long frame with the key columns and 'value'.
+        keys (list): Group columns.
+
+    Returns:
+        pd.DataFrame: keys + ['count', 'mean', 'm2', 'min', 'max'].
+    """
+    values = values.dropna(subset=["value"])
+    moments = values.groupby(keys, sort=False, observed=True)["value"].agg(
+        ["count", "mean", "var", "min", "max"]
+    ).reset_index()
+    # groupby.var ya usa el algoritmo de Welford; M2 = var * (n - 1)
+    moments["m2"] = (moments["var"] * (moments["count"] - 1)).fillna(0.0)
+    return moments[keys + ["count", "mean", "m2", "min", "max"]]
+
+
+def merge_moments(frames, keys):
+    """Combine partial moments of the same groups without the raw values."""
+    moments = pd.concat(frames, ignore_index=True)
+    grouped = moments.groupby(keys, sort=False, observed=True)
+    total = grouped["count"].transform("sum")
+    mean = (moments["count"] * moments["mean"]).groupby(
+        [moments[key] for key in keys], sort=False, observed=True
+    ).transform("sum") / total
+    moments = moments.assign(
+        weighted_mean=moments["count"] * moments["mean"],
+        m2=moments["m2"] + moments["count"] * (moments["mean"] - mean) ** 2,
+    )
+    merged = moments.groupby(keys, sort=False, observed=True).agg(
+        count=("count", "sum"),
+        weighted_mean=("weighted_mean", "sum"),
+        m2=("m2", "sum"),
+        min=("min", "min"),
+        max=("max", "max"),
+    ).reset_index()
+    merged["mean"] = merged["weighted_mean"] / merged["count"]
+    return merged[keys + ["count", "mean", "m2", "min", "max"]]
+
+
+# --- t-digest ----------------------------------------------------------------
+
+def compress_digest(centroids, keys, compression=TDIGEST_COMPRESSION):
+    """
+    Cluster t-digest centroids with the k1 scale function.
+
+    Centroids are sorted per group and assigned to the integer bucket of
+    k(q) = compression / (2 * pi) * asin(2q - 1) at the middle of their
+    cumulative weight q. k grows fastest near q = 0 and q = 1, so tail
+    clusters hold few points and central ones many.
+
+    Args:
+        centroids (pd.DataFrame): keys + ['mean', 'weight'].
+        keys (list): Group columns.
+        compression (int): Compression parameter; about compression / 2
+            centroids are kept per group.
+
+    Returns:
+        pd.DataFrame: Compressed centroids, sorted by keys and mean.
+    """
+    centroids = centroids.sort_values(keys + ["mean"], kind="stable", ignore_index=True)
+    grouped_weight = centroids.groupby(keys, sort=False, observed=True)["weight"]
+    cumulative = grouped_weight.cumsum()
+    total = grouped_weight.transform("sum")
+    q = ((cumulative - centroids["weight"] / 2) / total).clip(0.0, 1.0)
+    bucket = np.floor(compression / (2 * np.pi) * np.arcsin(2 * q.to_numpy() - 1)).astype("int64")
+
+    compressed = centroids.assign(
+        bucket=bucket,
+        weighted_mean=centroids["mean"] * centroids["weight"],
+    ).groupby(keys + ["bucket"], sort=False, observed=True).agg(
+        weighted_mean=("weighted_mean", "sum"),
+        weight=("weight", "sum"),
+    ).reset_index()
+    compressed["mean"] = compressed["weighted_mean"] / compressed["weight"]
+    compressed = compressed[keys + ["mean", "weight"]]
+    return compressed.sort_values(keys + ["mean"], kind="stable", ignore_index=True)
+
+
+def digest_from_values(values, keys, compression=TDIGEST_COMPRESSION):
+    """Build a t-digest of the 'value' column per group."""
+    values = values.dropna(subset=["value"])
+    # Los valores repetidos (p. ej. la popularidad entera) se agrupan antes de comprimir
+    centroids = values.groupby(keys + ["value"], sort=False, observed=True).size().reset_index(name="weight")
+    centroids = centroids.rename(columns={"value": "mean"})
+    centroids["weight"] = centroids["weight"].astype("float64")
+    return compress_digest(centroids, keys, compression)
+
+
+def merge_digests(frames, keys, compression=TDIGEST_COMPRESSION):
+    """Merge t-digests of the same groups by re-clustering their centroids."""
+    return compress_digest(pd.concat(frames, ignore_index=True), keys, compression)
+
+
+def digest_quantiles(digest, keys, quantiles):
+    """
+    Estimate quantiles per group from t-digest centroids.
+
+    The centroid means are placed at the middle of their cumulative weight
+    and quantiles are interpolated linearly between neighbouring centroids.
+    All groups are solved at once with one binary search over a global,
+    group-offset cumulative weight array.
+
+    Args:
+        digest (pd.DataFrame): Centroids from compress_digest.
+        keys (list): Group columns.
+        quantiles (list): Quantiles in [0, 1].
+
+    Returns:
+        pd.DataFrame: keys + one column per quantile, e.g. 'p50'.
+    """
+    digest = digest.sort_values(keys + ["mean"], kind="stable", ignore_index=True)
+    weight = digest["weight"].to_numpy()
+    means = digest["mean"].to_numpy()
+    group_ids = digest.groupby(keys, sort=False, observed=True).ngroup().to_numpy()
+
+    starts = np.flatnonzero(np.r_[True, group_ids[1:] != group_ids[:-1]])
+    ends = np.r_[starts[1:], len(digest)] - 1
+    totals = np.add.reduceat(weight, starts)
+    offsets = np.r_[0.0, np.cumsum(totals)[:-1]]
+    midpoints = np.cumsum(weight) - weight / 2
+
+    result = digest.iloc[starts][keys].reset_index(drop=True)
+    for quantile in quantiles:
+        targets = offsets + quantile * totals
+        index = np.clip(np.searchsorted(midpoints, targets, side="right") - 1, starts, ends)
+        following = np.minimum(index + 1, ends)
+        span = midpoints[following] - midpoints[index]
+        fraction = np.clip(
+            np.divide(targets - midpoints[index], span, out=np.zeros_like(span), where=span > 0),
+            0.0, 1.0
+        )
+        result[f"p{round(quantile * 100):g}"] = means[index] + fraction * (means[following] - means[index])
+    return result
+
+
+# --- HyperLogLog -------------------------------------------------------------
+
+def _bit_length(values):
+    """Exact bit length of an uint64 array (0 for 0)."""
+    values = values.copy()
+    length = np.zeros(len(values), dtype="int64")
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = values >= np.uint64(1 << shift)
+        length += shift * high
+        values = np.where(high, values >> np.uint64(shift), values)
+    return length + (values > 0)
+
+
+def hll_from_values(values, keys, precision=HLL_PRECISION):
+    """
+    Build sparse HyperLogLog registers of the 'value' column per group.
+
+    The first 'precision' bits of the 64-bit hash select the register and
+    the position of the first set bit in the rest is its rank.
+    """
+    values = values.dropna(subset=["value"])
+    hashes = pd.util.hash_array(values["value"].astype(str).to_numpy(dtype=object))
+    suffix_bits = 64 - precision
+    remainder = hashes & np.uint64((1 << suffix_bits) - 1)
+
+    registers = values[keys].assign(
+        register=(hashes >> np.uint64(suffix_bits)).astype("int32"),
+        rank=(suffix_bits - _bit_length(remainder) + 1).astype("int8"),
+    )
+    return merge_hll([registers], keys)
+
+
+def merge_hll(frames, keys):
+    """Merge HyperLogLog registers of the same groups (register-wise maximum)."""
+    registers = pd.concat(frames, ignore_index=True)
+    return registers.groupby(keys + ["register"], sort=False, observed=True)["rank"].max().reset_index()
+
+
+def hll_estimate(registers, keys, precision=HLL_PRECISION):
+    """
+    Estimate distinct counts per group from HyperLogLog registers.
+
+    Uses the harmonic mean estimator with linear counting for small
+    cardinalities; registers missing from the sparse frame are zero.
+
+    Returns:
+        pd.DataFrame: keys + ['distinct'].
+    """
+    m = 1 << precision
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = registers.assign(inverse=np.exp2(-registers["rank"].astype("float64"))).groupby(
+        keys, sort=False, observed=True
+    ).agg(inverse=("inverse", "sum"), present=("register", "size")).reset_index()
+
+    zeros = m - estimate["present"]
+    raw = alpha * m * m / (estimate["inverse"] + zeros)
+    linear = m * np.log(m / zeros.clip(lower=1))
+    estimate["distinct"] = np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw).round().astype("int64")
+    return estimate[keys + ["distinct"]]
@@ -0,0 +1,359 @@
+"""Popularity and audio-feature summary statistics of the Spotify data.
+
+The Spotify data is split into chunks by a hash of 'track_id', and every
+chunk is cleaned and reduced to mergeable sketches per genre and per artist
+(see src/stats/sketches.py): Welford moments and t-digest quantiles of
+popularity and the audio features, and HyperLogLog distinct counts of
+tracks, albums and artists/genres. Only one chunk is expanded at a time, and
+chunk sketches are merged as a tree of MERGE_FAN_IN sketch sets per merge,
+so every sketch is re-merged a logarithmic number of times.
+
+The Spotify transform sketches the raw rows inside its 'track_id' shards,
+in parallel with the transform (build_spotify_summary per shard), and
+merge_shard_summaries combines the shard sketches once. The sketches are
+persisted per run partition as Parquet files. Sketch sets of different runs
+or partitions are combined with merge_summaries without rescanning the raw
+data.
+
+Usage:
+    python -m src.stats.summary report --dimension genre --metric popularity
+    python -m src.stats.summary merge data/2_final/statistics_all <sketch_dir> <sketch_dir> ...
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+from datetime import datetime
+import pandas as pd
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
+from src.stats.sketches import (
+    TDIGEST_COMPRESSION, HLL_PRECISION,
+    moments_from_values, merge_moments,
+    digest_from_values, merge_digests, digest_quantiles,
+    hll_from_values, merge_hll, hll_estimate,
+)
+from src.transformation.normalize import normalize_text
+from src.transformation.parallel import shard_ids
+from src.partitioning.partitions import replace_directory
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+SUMMARY_DIR = os.path.join(BASE_DIR, "data", "2_final", "statistics")
+CHUNK_ROWS = 50_000
+MERGE_FAN_IN = 8
+METRICS = [
+    "popularity", "danceability", "energy", "speechiness", "acousticness",
+    "instrumentalness", "liveness", "valence", "loudness", "tempo",
+]
+# Dimensión -> columnas cuyos valores distintos se cuentan con HyperLogLog
+DISTINCT_COLUMNS = {
+    "genre": ["track_id", "artist", "album_name"],
+    "artist": ["track_id", "album_name", "genre"],
+}
+SKETCH_FILES = {"moments": "moments.parquet", "digest": "digest.parquet", "hll": "hll.parquet"}
+VALUE_KEYS = ["dimension", "group", "metric"]
+DISTINCT_KEYS = ["dimension", "group", "column"]
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+
+def _empty_sketches():
+    return {
+        "moments": pd.DataFrame(columns=VALUE_KEYS + ["count", "mean", "m2", "min", "max"]),
+        "digest": pd.DataFrame(columns=VALUE_KEYS + ["mean", "weight"]),
+        "hll": pd.DataFrame(columns=DISTINCT_KEYS + ["register", "rank"]),
+    }
+
+
+def _prepare_rows(df_spotify):
+    """
+    Clean the raw rows the same way the transform does and split the credits.
+
+    Returns:
+        pd.DataFrame: One row per (track, genre, credited artist) with the
+        normalized 'genre' and 'artist' columns and the metrics.
+    """
+    columns = ["track_id", "artists", "album_name", "track_genre"] + METRICS
+    rows = df_spotify[columns].dropna().drop_duplicates()
+    rows = rows.assign(
+        genre=normalize_text(rows["track_genre"]).to_numpy(zero_copy_only=False),
+        artist=normalize_text(rows["artists"]).to_numpy(zero_copy_only=False),
+        album_name=normalize_text(rows["album_name"]).to_numpy(zero_copy_only=False),
+    )
+    # Los créditos con varios artistas ("a;b") cuentan para cada artista
+    rows["artist"] = rows["artist"].str.split(";")
+    rows = rows.explode("artist")
+    rows["artist"] = rows["artist"].str.strip()
+    return rows[rows["artist"] != ""].drop(columns=["artists", "track_genre"])
+
+
+def _dimension_rows(rows):
+    """
+    Yield (dimension, metric rows) with one row per unit of each dimension.
+
+    A genre counts a track once, and an artist counts each of its tracks
+    once, with the metrics averaged over the duplicated rows of the track
+    (the per-track popularity mean).
+    """
+    for dimension in ["genre", "artist"]:
+        per_track = rows.groupby([dimension, "track_id"], sort=False)[METRICS].mean().reset_index()
+        yield dimension, per_track
+
+
+def sketch_rows(rows):
+    """Reduce prepared rows to sketches per genre and per artist."""
+    moments, digests, registers = [], [], []
+    for dimension, per_track in _dimension_rows(rows):
+        values = per_track.melt(id_vars=[dimension], value_vars=METRICS, var_name="metric", value_name="value")
+        values = values.rename(columns={dimension: "group"}).assign(dimension=dimension)
+        moments.append(moments_from_values(values, VALUE_KEYS))
+        digests.append(digest_from_values(values, VALUE_KEYS))
+
+        distinct = rows.melt(
+            id_vars=[dimension], value_vars=DISTINCT_COLUMNS[dimension], var_name="column", value_name="value"
+        )
+        distinct = distinct.rename(columns={dimension: "group"}).assign(dimension=dimension)
+        registers.append(hll_from_values(distinct, DISTINCT_KEYS))
+
+    return {
+        "moments": pd.concat(moments, ignore_index=True),
+        "digest": pd.concat(digests, ignore_index=True),
+        "hll": pd.concat(registers, ignore_index=True),
+    }
+
+
+def merge_sketches(sketch_sets):
+    """Merge sketch sets (dicts of frames) into one, without the raw data."""
+    sketch_sets = [sketches for sketches in sketch_sets if len(sketches["moments"])]
+    if not sketch_sets:
+        return _empty_sketches()
+    return {
+        "moments": merge_moments([s["moments"] for s in sketch_sets], VALUE_KEYS),
+        "digest": merge_digests([s["digest"] for s in sketch_sets], VALUE_KEYS),
+        "hll": merge_hll([s["hll"] for s in sketch_sets], DISTINCT_KEYS),
+    }
+
+
+def merge_sketch_tree(sketch_sets, fan_in=MERGE_FAN_IN):
+    """
+    Merge an iterable of sketch sets as a tree.
+
+    Sketch sets are merged fan_in at a time and the result moves up one
+    level, like the carry of a counter, so only O(fan_in * log(n)) sketch
+    sets are held at once and each is re-merged O(log(n)) times, instead of
+    re-merging the whole running state for every new set.
+    """
+    levels = []
+    for sketches in sketch_sets:
+        level = 0
+        while True:
+            if level == len(levels):
+                levels.append([])
+            levels[level].append(sketches)
+            if len(levels[level]) < fan_in:
+                break
+            sketches = merge_sketches(levels[level])
+            levels[level] = []
+            level += 1
+    return merge_sketches([sketches for level in levels for sketches in level])
+
+
+def summarize_spotify(df_spotify, chunk_rows=CHUNK_ROWS):
+    """
+    Compute the sketches of the Spotify data chunk by chunk.
+
+    Chunks are hash shards of 'track_id', so the rows of a track are always
+    cleaned and averaged together, and only the rows of one chunk are
+    expanded (normalized, one row per credited artist) at a time.
+
+    Args:
+        df_spotify (pd.DataFrame): Raw Spotify data.
+        chunk_rows (int): Approximate raw rows per chunk.
+
+    Returns:
+        dict: 'moments', 'digest' and 'hll' frames.
+    """
+    num_chunks = max(1, -(-len(df_spotify) // chunk_rows))
+    chunk_ids = shard_ids(df_spotify["track_id"].astype(str), num_chunks, normalize_keys=False)
+    chunks = df_spotify.groupby(chunk_ids, sort=True)
+    return merge_sketch_tree(sketch_rows(_prepare_rows(chunk)) for _, chunk in chunks)
+
+
+def save_summary(sketches, summary_dir=SUMMARY_DIR, metadata=None):
+    """
+    Persist a sketch set as zstd Parquet files plus 'meta.json'.
+
+    Returns:
+        str: Path to the sketch directory.
+    """
+    staging_dir = f"{summary_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+    for name, file_name in SKETCH_FILES.items():
+        sketches[name].to_parquet(os.path.join(staging_dir, file_name), compression="zstd", index=False)
+    meta = {
+        "created_at": datetime.now().isoformat(),
+        "metrics": METRICS,
+        "distinct_columns": DISTINCT_COLUMNS,
+        "tdigest_compression": TDIGEST_COMPRESSION,
+        "hll_precision": HLL_PRECISION,
+        **(metadata or {}),
+    }
+    with open(os.path.join(staging_dir, "meta.json"), "w") as meta_file:
+        json.dump(meta, meta_file, indent=2)
+
+    replace_directory(staging_dir, summary_dir)
+    return summary_dir
+
+
+def load_summary(summary_dir=SUMMARY_DIR):
+    """Load a sketch set saved by save_summary."""
+    with open(os.path.join(summary_dir, "meta.json")) as meta_file:
+        meta = json.load(meta_file)
+    if meta["tdigest_compression"] != TDIGEST_COMPRESSION or meta["hll_precision"] != HLL_PRECISION:
+        raise ValueError(f"Sketches in {summary_dir} were built with different parameters: {meta}")
+    sketches = {
+        name: pd.read_parquet(os.path.join(summary_dir, file_name))
+        for name, file_name in SKETCH_FILES.items()
+    }
+    return sketches, meta
+
+
+def build_spotify_summary(df_spotify, summary_dir=SUMMARY_DIR, partition_key=None):
+    """Sketch the raw Spotify data and persist the result; returns the sketch directory."""
+    start = time.perf_counter()
+    sketches = summarize_spotify(df_spotify)
+    save_summary(sketches, summary_dir, {"rows_scanned": len(df_spotify), "partitions": [partition_key]})
+    logger.info(
+        f"Estadísticas de Spotify guardadas en: {summary_dir} "
+        f"({sketches['moments']['group'].nunique()} grupos, {time.perf_counter() - start:.2f}s)"
+    )
+    return summary_dir
+
+
+def merge_shard_summaries(shard_root, summary_dir=SUMMARY_DIR, partition_key=None):
+    """
+    Merge the sketch sets saved by the shards of one run and persist the result.
+
+    Shards hold disjoint tracks, so their sketches merge exactly like the
+    chunks of summarize_spotify. shard_root is removed afterwards.
+
+    Args:
+        shard_root (str): Directory with one sketch directory per shard.
+        summary_dir (str): Sketch directory of the run's partition.
+        partition_key (str): Partition recorded in the metadata.
+
+    Returns:
+        str: Path to the merged sketch directory.
+    """
+    shard_dirs = sorted(
+        os.path.join(shard_root, name) for name in os.listdir(shard_root)
+        if os.path.exists(os.path.join(shard_root, name, "meta.json"))
+    )
+    rows_scanned = 0
+
+    def shard_sketches():
+        nonlocal rows_scanned
+        for shard_dir in shard_dirs:
+            sketches, meta = load_summary(shard_dir)
+            rows_scanned += meta.get("rows_scanned", 0)
+            yield sketches
+
+    merged = merge_sketch_tree(shard_sketches())
+    save_summary(merged, summary_dir, {"rows_scanned": rows_scanned, "partitions": [partition_key]})
+    shutil.rmtree(shard_root, ignore_errors=True)
+    logger.info(
+        f"Estadísticas de {len(shard_dirs)} shards guardadas en: {summary_dir} "
+        f"({merged['moments']['group'].nunique()} grupos)"
+    )
+    return summary_dir
+
+
+def merge_summaries(summary_dirs, output_dir):
+    """
+    Combine persisted sketch sets of several runs or partitions.
+
+    Partitions must hold disjoint data (e.g. different Spotify snapshots);
+    merging a partition with itself counts its rows twice in the moments
+    and digests, while the distinct counts are unaffected.
+
+    Returns:
+        str: Path to the merged sketch directory.
+    """
+    loaded = [load_summary(summary_dir) for summary_dir in summary_dirs]
+    merged = merge_sketches([sketches for sketches, _ in loaded])
+    partitions = [key for _, meta in loaded for key in meta.get("partitions", [])]
+    rows_scanned = sum(meta.get("rows_scanned", 0) for _, meta in loaded)
+    save_summary(merged, output_dir, {"rows_scanned": rows_scanned, "partitions": partitions})
+    logger.info(f"{len(summary_dirs)} conjuntos de estadísticas combinados en: {output_dir}")
+    return output_dir
+
+
+def summary_table(sketches, dimension, metric=None):
+    """
+    Turn sketches into a readable table.
+
+    Returns:
+        pd.DataFrame: One row per group and metric with count, mean, std,
+        min, max and quantiles, plus one 'distinct_<column>' per counted column.
+    """
+    moments = sketches["moments"]
+    moments = moments[moments["dimension"] == dimension]
+    digest = sketches["digest"]
+    digest = digest[digest["dimension"] == dimension]
+    if metric is not None:
+        moments = moments[moments["metric"] == metric]
+        digest = digest[digest["metric"] == metric]
+
+    table = moments.assign(
+        std=(moments["m2"] / (moments["count"] - 1).where(moments["count"] > 1)) ** 0.5
+    )[VALUE_KEYS + ["count", "mean", "std", "min", "max"]]
+    table = table.merge(digest_quantiles(digest, VALUE_KEYS, QUANTILES), on=VALUE_KEYS, how="left")
+
+    registers = sketches["hll"]
+    distinct = hll_estimate(registers[registers["dimension"] == dimension], DISTINCT_KEYS)
+    distinct = distinct.pivot(index="group", columns="column", values="distinct").add_prefix("distinct_")
+    table = table.merge(distinct.reset_index(), on="group", how="left")
+    return table.drop(columns=["dimension"]).sort_values(["group", "metric"], ignore_index=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and combine Spotify summary sketches.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    report = subparsers.add_parser("report", help="Print the summary of a sketch directory")
+    report.add_argument("--dir", default=SUMMARY_DIR)
+    report.add_argument("--dimension", choices=sorted(DISTINCT_COLUMNS), default="genre")
+    report.add_argument("--metric", choices=METRICS)
+    report.add_argument("--csv", action="store_true", help="Print the result as CSV")
+    merge = subparsers.add_parser("merge", help="Combine sketch directories")
+    merge.add_argument("output_dir")
+    merge.add_argument("summary_dirs", nargs="+")
+    args = parser.parse_args(argv)
+
+    if args.command == "merge":
+        merge_summaries(args.summary_dirs, args.output_dir)
+        return
+
+    sketches, _ = load_summary(args.dir)
+    table = summary_table(sketches, args.dimension, args.metric)
+    print(table.to_csv(index=False) if args.csv else table.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,13 @@
 """Module to store data in Google Drive."""
 
 import logging
-import pandas as pd
 import os
 from pydrive2.auth import GoogleAuth
 from pydrive2.drive import GoogleDrive
 from dotenv import load_dotenv
 from pathlib import Path
+from src.loading.dataset import MANIFEST_FILE, read_manifest
+from src.partitioning.partitions import DEFAULT_PARTITION, resolve_partition
 
 # Configuración de logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
@@ -30,6 +31,8 @@ if not all([client_secrets_file, settings_file, credentials_file, folder_id]):
 logger.info(f"Using folder_id: {folder_id}")
 logger.info(f"Using settings_file: {settings_file}")
 
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+
 
 # Función para autenticar Google Drive
 def auth_drive():
@@ -66,46 +69,124 @@ def auth_drive():
         raise
 
 
-# Función para subir el DataFrame a Google Drive
-def store_to_drive(ti):
+# Función para obtener o crear una carpeta en Google Drive
+def get_or_create_folder(drive, title, parent_id):
+    """Return the id of the Drive folder 'title' under 'parent_id', creating it if needed."""
+    query = (
+        f"title = '{title}' and '{parent_id}' in parents and "
+        f"mimeType = '{FOLDER_MIME_TYPE}' and trashed = false"
+    )
+    existing = drive.ListFile({"q": query}).GetList()
+    if existing:
+        return existing[0]["id"]
+
+    folder = drive.CreateFile({
+        "title": title,
+        "parents": [{"kind": "drive#fileLink", "id": parent_id}],
+        "mimeType": FOLDER_MIME_TYPE
+    })
+    folder.Upload()
+    return folder["id"]
+
+
+# Función para subir un archivo, reemplazando el existente con el mismo nombre
+def upload_file(drive, local_path, title, parent_id, mime_type):
+    query = f"title = '{title}' and '{parent_id}' in parents and trashed = false"
+    existing = drive.ListFile({"q": query}).GetList()
+    if existing:
+        file = existing[0]
+    else:
+        file = drive.CreateFile({
+            "title": title,
+            "parents": [{"kind": "drive#fileLink", "id": parent_id}],
+            "mimeType": mime_type
+        })
+    file.SetContentFile(local_path)
+    file.Upload()
+    return file["id"]
+
+
+# Función para borrar del Drive lo que ya no está en el manifiesto
+def prune_folder(drive, parent_id, keep_ids):
+    """
+    Delete every file and folder under 'parent_id' whose id is not in keep_ids.
+
+    Kept folders are pruned recursively, so partitions and data files that
+    are no longer in the manifest (or duplicates of the same title) do not
+    stay on Drive next to the current dataset.
+
+    Returns:
+        int: Number of deleted entries.
+    """
+    deleted = 0
+    query = f"'{parent_id}' in parents and trashed = false"
+    for item in drive.ListFile({"q": query}).GetList():
+        if item["id"] not in keep_ids:
+            logger.info(f"Deleting stale Drive entry: {item['title']}")
+            item.Delete()
+            deleted += 1
+        elif item["mimeType"] == FOLDER_MIME_TYPE:
+            deleted += prune_folder(drive, item["id"], keep_ids)
+    return deleted
+
+
+# Función para subir el dataset particionado a Google Drive
+def store_to_drive(ti, params=None):
     """
-    Store the merged dataset in Google Drive.
+    Store the partitioned merged dataset in Google Drive.
+
+    The Hive partition directories are mirrored as Drive folders and every
+    data file listed in the manifest is uploaded, followed by the manifest.
+    Remote folders and files that are not in the manifest are then deleted.
 
     Args:
-        ti: Task instance to pull file path from XCom.
+        ti: Task instance to pull the dataset path from XCom.
+        params (dict): DAG run params; each partition gets its own Drive folder.
     """
-    merged_file_load_path = ti.xcom_pull(task_ids='load_to_db')
-    if not merged_file_load_path:
-        raise ValueError("No file path received from load_to_db task")
+    dataset_dir = ti.xcom_pull(task_ids='load_to_db')
+    if not dataset_dir:
+        raise ValueError("No dataset path received from load_to_db task")
 
-    # Verificar que el archivo exista
-    if not os.path.exists(merged_file_load_path):
-        raise FileNotFoundError(f"Merged file not found: {merged_file_load_path}")
+    # Verificar que el dataset exista
+    if not os.path.exists(os.path.join(dataset_dir, MANIFEST_FILE)):
+        raise FileNotFoundError(f"Dataset manifest not found in: {dataset_dir}")
 
-    # Leer el DataFrame combinado (como CSV)
-    logger.info(f"Leyendo DataFrame combinado desde: {merged_file_load_path}")
-    df = pd.read_csv(merged_file_load_path)
+    manifest = read_manifest(dataset_dir)
 
     # Subir a Google Drive
     drive = auth_drive()
-    title = "spotify_grammy_merged.csv"
-    logger.info(f"Storing {title} on Google Drive.")
-    
-    csv_file = df.to_csv(index=False)
-    
-    file = drive.CreateFile({
-        "title": title,
-        "parents": [{"kind": "drive#fileLink", "id": folder_id}],
-        "mimeType": "text/csv"
-    })
-    
-    file.SetContentString(csv_file)
-    file.Upload()
-    logger.info(f"File {title} uploaded successfully to Google Drive.")
+    partition_key = resolve_partition(params)["key"]
+    title = os.path.basename(dataset_dir)
+    if partition_key != DEFAULT_PARTITION:
+        title = f"{title}__{partition_key}"
+    logger.info(f"Storing {title} ({len(manifest['files'])} files) on Google Drive.")
+    dataset_folder_id = get_or_create_folder(drive, title, folder_id)
 
-    # Limpiar el archivo temporal
-    try:
-        os.remove(merged_file_load_path)
-        logger.info(f"Archivo temporal eliminado: {merged_file_load_path}")
-    except Exception as e:
-        logger.warning(f"No se pudo eliminar el archivo temporal {merged_file_load_path}: {e}")
\ No newline at end of file
+    folder_ids = {"": dataset_folder_id}
+    uploaded_ids = set()
+    for entry in manifest["files"]:
+        partition_dir = os.path.dirname(entry["path"])
+        if partition_dir not in folder_ids:
+            parent_id = dataset_folder_id
+            for part in partition_dir.split(os.sep):
+                parent_id = get_or_create_folder(drive, part, parent_id)
+            folder_ids[partition_dir] = parent_id
+        uploaded_ids.add(upload_file(
+            drive,
+            os.path.join(dataset_dir, entry["path"]),
+            os.path.basename(entry["path"]),
+            folder_ids[partition_dir],
+            "application/vnd.apache.parquet"
+        ))
+
+    uploaded_ids.add(upload_file(
+        drive,
+        os.path.join(dataset_dir, MANIFEST_FILE),
+        MANIFEST_FILE,
+        dataset_folder_id,
+        "application/json"
+    ))
+    deleted = prune_folder(drive, dataset_folder_id, uploaded_ids | set(folder_ids.values()))
+    if deleted:
+        logger.info(f"Deleted {deleted} stale entries from {title} on Google Drive.")
+    logger.info(f"Dataset {title} uploaded successfully to Google Drive.")
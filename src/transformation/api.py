@@ -1,17 +1,19 @@
 import pandas as pd
 import os
 from datetime import datetime
+from src.transformation.normalize import normalize_columns
+from src.scratch.manager import scratch_path, release, frame_size_hint
 
-def transform_musicbrainz_data(input_file="/tmp/musicbrainz_temp_random.csv", output_temp_dir="/tmp"):
+def transform_musicbrainz_data(input_file, run_id="manual"):
     """
-    Transforma los datos extraídos de MusicBrainz: elimina nulos, duplicados, convierte fechas y pasa texto a minúsculas.
+    Transforma los datos extraídos de MusicBrainz: elimina nulos, duplicados, convierte fechas y normaliza el texto.
     
     Args:
         input_file (str): Ruta del archivo CSV temporal de entrada.
-        output_temp_dir (str): Directorio donde se guardará el archivo CSV temporal transformado.
+        run_id (str): Identificador de la ejecución dueña del espacio temporal.
     
     Returns:
-        str: Ruta del archivo CSV transformado.
+        str: Ruta del archivo Parquet transformado.
     """
     # Verificar si el archivo de entrada existe
     if not os.path.exists(input_file):
@@ -27,16 +29,13 @@ def transform_musicbrainz_data(input_file="/tmp/musicbrainz_temp_random.csv", ou
     # 2. Eliminar duplicados basados en "artist_id" (clave única)
     df = df.drop_duplicates(subset=["artist_id"], keep="first")
 
-    # 3. Convertir columnas de texto a minúsculas
-    # Identificar columnas de tipo string (object)
-    text_columns = df.select_dtypes(include=['object']).columns
-    for col in text_columns:
-        df[col] = df[col].str.lower()
+    # 3. Normalizar columnas de texto (minúsculas, espacios, acentos) y reemplazar "n/a" por vacío
+    df = normalize_columns(df, na_value="")
 
     # 4. Convertir columnas de fechas a tipo datetime
     # Manejar "N/A" y formatos variados
     def parse_date(date_str):
-        if pd.isna(date_str) or date_str == "n/a":  # Actualizado para minúsculas
+        if pd.isna(date_str) or date_str == "":  # "n/a" ya mapeado a vacío en el paso 3
             return pd.NaT  # Not a Time (valor nulo para fechas)
         try:
             # Intentar parsear como fecha completa o solo año
@@ -49,14 +48,12 @@ def transform_musicbrainz_data(input_file="/tmp/musicbrainz_temp_random.csv", ou
     df["end_date"] = df["end_date"].apply(parse_date)
     df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
 
-    # 5. Reemplazar "n/a" en otras columnas por valores vacíos (ya en minúsculas por el paso 3)
-    df = df.replace("n/a", "")
-
-    # 6. Guardar el resultado en un archivo temporal
-    output_temp_dir = "/tmp"
-    os.makedirs(output_temp_dir, exist_ok=True)
-    output_file = f"{output_temp_dir}/musicbrainz_transformed_temp.csv"
-    df.to_csv(output_file, index=False)
+    # 5. Guardar el resultado en el espacio temporal de la ejecución
+    output_file = scratch_path(run_id, "transform_api", ".parquet", size_hint=frame_size_hint(df))
+    df.to_parquet(output_file, index=False)
     print(f"Datos transformados guardados en: {output_file}")
 
+    # Eliminar el archivo temporal de entrada
+    release(input_file)
+
     return output_file
\ No newline at end of file
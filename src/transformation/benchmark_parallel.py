@@ -0,0 +1,70 @@
+"""Scaling benchmark for the partition-parallel Spotify transform.
+
+Runs transform_spotify_frame over the same input with an increasing number of
+worker processes and reports wall time, speedup and parallel efficiency.
+
+Usage:
+    python -m src.transformation.benchmark_parallel data/0_raw/spotify_dataset.csv --workers 1 2 4 8 16
+"""
+
+import os
+import sys
+import time
+import argparse
+import logging
+import pandas as pd
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
+from src.transformation.spotify import transform_spotify_frame
+from src.transformation.parallel import run_sharded
+
+
+def benchmark(df, workers_list, repeats=3):
+    """
+    Time the sharded transform for each number of workers.
+
+    A single-worker run is always timed first and used as the baseline.
+
+    Returns:
+        pd.DataFrame: Best wall time of 'repeats' runs, speedup and efficiency
+        relative to the measured single-worker time.
+    """
+    rows = []
+    for workers in [1] + [workers for workers in workers_list if workers != 1]:
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            run_sharded(df, transform_spotify_frame, "track_id", workers)
+            timings.append(time.perf_counter() - start)
+        rows.append({
+            "workers": workers,
+            # run_sharded no usa más procesos que CPUs disponibles
+            "effective_workers": min(workers, os.cpu_count() or 1),
+            "seconds": min(timings),
+        })
+
+    results = pd.DataFrame(rows)
+    baseline = results["seconds"].iloc[0]
+    results["speedup"] = baseline / results["seconds"]
+    results["efficiency"] = results["speedup"] / results["effective_workers"]
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the parallel Spotify transform.")
+    parser.add_argument("csv_path", help="Raw Spotify CSV file")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    df = pd.read_csv(args.csv_path)
+    print(f"{len(df)} filas, {os.cpu_count()} CPUs disponibles")
+    print(benchmark(df, args.workers, args.repeats).to_string(index=False, float_format="%.3f"))
+
+
+if __name__ == "__main__":
+    main()
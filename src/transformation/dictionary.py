@@ -0,0 +1,104 @@
+"""Persistent dictionary encoding for repeated text values.
+
+Artist names, genres and Grammy categories repeat heavily across rows. Each
+dictionary assigns a stable integer ID to every distinct value and is stored
+as a Parquet file in 'data/1_interm/dictionaries/'. New values are appended,
+so IDs never change between runs. Runs of different partitions share the
+dictionaries, so updates happen under a file lock.
+"""
+
+import os
+import logging
+import numpy as np
+import pandas as pd
+
+from src.partitioning.partitions import exclusive_lock
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+DICTIONARY_DIR = os.path.join(BASE_DIR, "data", "1_interm", "dictionaries")
+NULL_CODE = -1
+
+
+def load_dictionary(name, dictionary_dir=DICTIONARY_DIR):
+    """
+    Load a persisted dictionary.
+
+    Returns:
+        pd.Index: Distinct values, where the position of a value is its ID.
+    """
+    path = os.path.join(dictionary_dir, f"{name}.parquet")
+    if not os.path.exists(path):
+        return pd.Index([], dtype=object)
+    dictionary = pd.read_parquet(path).sort_values("id")
+    return pd.Index(dictionary["value"].astype(object))
+
+
+def save_dictionary(name, values, dictionary_dir=DICTIONARY_DIR):
+    """Persist a dictionary as a Parquet file of (id, value) pairs."""
+    os.makedirs(dictionary_dir, exist_ok=True)
+    path = os.path.join(dictionary_dir, f"{name}.parquet")
+    tmp_path = f"{path}.tmp"
+    pd.DataFrame({
+        "id": np.arange(len(values), dtype="int32"),
+        "value": pd.array(values, dtype="string[pyarrow]"),
+    }).to_parquet(tmp_path, compression="zstd", index=False)
+    os.replace(tmp_path, path)
+
+
+def encode(name, *columns, dictionary_dir=DICTIONARY_DIR):
+    """
+    Encode one or more columns against a shared persisted dictionary.
+
+    Values missing from the dictionary are appended to it and the dictionary
+    is saved once for all columns.
+
+    Args:
+        name (str): Dictionary name, e.g. 'artist'.
+        *columns (pd.Series): Columns holding values of the same domain.
+        dictionary_dir (str): Directory of the persisted dictionaries.
+
+    Returns:
+        tuple: (list of int32 code arrays, one per column, pd.Index dictionary).
+        Nulls are encoded as NULL_CODE.
+    """
+    with exclusive_lock(os.path.join(dictionary_dir, f"{name}.parquet")):
+        dictionary = load_dictionary(name, dictionary_dir)
+
+        unseen = []
+        for column in columns:
+            values = pd.unique(column.dropna())
+            unseen.append(values[dictionary.get_indexer(values) == -1])
+        new_values = pd.unique(np.concatenate(unseen)) if unseen else []
+        if len(new_values):
+            dictionary = dictionary.append(pd.Index(new_values, dtype=object))
+            save_dictionary(name, dictionary, dictionary_dir)
+            logger.info(f"Diccionario '{name}': {len(new_values)} valores nuevos, {len(dictionary)} en total")
+
+    codes = [dictionary.get_indexer(column).astype("int32") for column in columns]
+    return codes, dictionary
+
+
+def to_categorical(name, column, dictionary_dir=DICTIONARY_DIR):
+    """
+    Dictionary-encode a column as a pandas Categorical backed by a persisted dictionary.
+
+    The values of the column are unchanged; only the in-memory representation
+    becomes integer codes plus one shared copy of each distinct string.
+    """
+    (codes,), dictionary = encode(name, column, dictionary_dir=dictionary_dir)
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories=dictionary),
+        index=column.index,
+        name=column.name
+    )
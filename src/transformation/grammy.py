@@ -1,13 +1,15 @@
 """Transformation module for Grammy Awards data.
 This module contains functions to transform the Grammy Awards data
-by cleaning, converting text to lowercase, selecting relevant columns, 
-and saving to a temporary CSV file.
+by cleaning, normalizing text, selecting relevant columns, 
+and saving to a temporary Parquet file.
 """
 
 import pandas as pd
-import tempfile
-import os
 import logging
+from src.transformation.normalize import normalize_columns, mark_normalized, normalized_columns
+from src.transformation.grammy_index import build_grammy_index, GRAMMY_INDEX_DIR
+from src.scratch.manager import scratch_path, release, frame_size_hint
+from src.partitioning.partitions import resolve_partition, partition_dir
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -20,19 +22,21 @@ if not logger.hasHandlers():
     handler.setFormatter(formatter)
     logger.addHandler(handler)
 
-def transform_grammy_data(ti):
+def transform_grammy_data(ti, params=None):
     """
     Transforms the Grammy Awards data by:
     - Dropping rows with any null values.
-    - Converting all text columns to lowercase.
+    - Normalizing all text columns (case, whitespace, diacritics).
     - Keeping only selected relevant columns.
-    - Saving the transformed data to a temporary CSV file.
+    - Building the memory-mapped lookup index by artist, nominee and year.
+    - Saving the transformed data to a temporary Parquet file.
 
     Args:
         ti: Task instance to pull the file path from XCom (e.g., from a 'read_grammy' task).
+        params (dict): DAG run params; the lookup index is written for the run's partition.
 
     Returns:
-        str: Path to the temporary file where the transformed DataFrame is saved in CSV format.
+        str: Path to the temporary file where the transformed DataFrame is saved in Parquet format.
     """
     # Obtener la ruta del archivo crudo desde una tarea anterior (e.g., 'read_grammy')
     grammy_file_path = ti.xcom_pull(task_ids='read_grammy')
@@ -49,26 +53,24 @@ def transform_grammy_data(ti):
     # 1. Eliminar filas con valores nulos
     df_grammy = df_grammy.dropna()
 
-    # 2. Convertir todas las columnas de texto a minúsculas
-    text_columns = df_grammy.select_dtypes(include=['object']).columns
-    for col in text_columns:
-        df_grammy[col] = df_grammy[col].str.lower()
+    # 2. Normalizar todas las columnas de texto (minúsculas, espacios, acentos)
+    df_grammy = normalize_columns(df_grammy)
 
     # 3. Seleccionar columnas relevantes
     selected_columns = ["year", "title", "category", "nominee", "artist", "winner"]
-    df_grammy = df_grammy[selected_columns]
+    df_grammy = mark_normalized(df_grammy[selected_columns].copy(), normalized_columns(df_grammy))
 
-    # Guardar el DataFrame transformado en un archivo temporal CSV
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as tmp_file:
-        df_grammy.to_csv(tmp_file.name, index=False)  # Guardar como CSV
-        transformed_tmp_file_path = tmp_file.name
-        logger.info(f"DataFrame transformado guardado en: {transformed_tmp_file_path} con {len(df_grammy)} filas")
+    # 4. Construir el índice de consulta por artista/nominado y año
+    build_grammy_index(df_grammy, partition_dir(GRAMMY_INDEX_DIR, resolve_partition(params)))
+
+    # Guardar el DataFrame transformado en un archivo temporal Parquet
+    transformed_tmp_file_path = scratch_path(
+        ti.run_id, "transform_grammy", ".parquet", size_hint=frame_size_hint(df_grammy)
+    )
+    df_grammy.to_parquet(transformed_tmp_file_path, index=False)  # Guardar como Parquet
+    logger.info(f"DataFrame transformado guardado en: {transformed_tmp_file_path} con {len(df_grammy)} filas")
 
     # Eliminar el archivo temporal original
-    try:
-        os.remove(grammy_file_path)
-        logger.info(f"Archivo temporal original eliminado: {grammy_file_path}")
-    except Exception as e:
-        logger.warning(f"No se pudo eliminar el archivo temporal {grammy_file_path}: {e}")
+    release(grammy_file_path)
 
     return transformed_tmp_file_path
\ No newline at end of file
@@ -0,0 +1,217 @@
+"""Memory-mapped lookup index over the transformed Grammy Awards data.
+
+The index is a directory of NumPy arrays that can be memory-mapped:
+
+- one column array per field (year, winner, and the category, artist and
+  nominee codes);
+- the sorted distinct categories, artists and nominees, each stored once as
+  a UTF-8 byte blob plus int64 offsets (the Arrow string layout), so text
+  takes the size of its encoded bytes instead of a fixed-width UCS-4 slot;
+- for each key ('artist' and 'nominee'): the offsets of every key in a
+  permutation of the rows, and that permutation, ordered by (key, year).
+
+A point lookup is a binary search over the sorted keys (O(log n)), and the
+rows of a key are contiguous and sorted by year, so year range scans are a
+second binary search inside the key's slice. Only the touched pages are read.
+"""
+
+import os
+import json
+import shutil
+import logging
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src.transformation.normalize import normalize_text
+from src.partitioning.partitions import replace_directory
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+GRAMMY_INDEX_DIR = os.path.join(BASE_DIR, "data", "1_interm", "grammy_index")
+INDEX_KEYS = ["artist", "nominee"]
+
+
+def _text_codes(values):
+    """Sorted distinct values of a text column and the code of every row."""
+    values = values.fillna("").astype(str).to_numpy(dtype=object)
+    # np.unique ordena por punto de código, el mismo orden que los bytes UTF-8
+    keys, codes = np.unique(values, return_inverse=True)
+    return keys, codes.astype("int32")
+
+
+def _text_buffers(values):
+    """UTF-8 bytes and int64 offsets of a list of strings."""
+    array = pa.array(values, type=pa.large_string())
+    _, offsets, data = array.buffers()
+    offsets = np.frombuffer(offsets, dtype="int64")[:len(array) + 1].copy()
+    data = np.frombuffer(data, dtype="uint8")[:offsets[-1]].copy() if data is not None else np.empty(0, "uint8")
+    return offsets, data
+
+
+class _TextColumn:
+    """Memory-mapped sorted strings stored as UTF-8 bytes plus offsets."""
+
+    def __init__(self, offsets, data):
+        self._offsets = offsets
+        self._data = data
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def _bytes(self, position):
+        return self._data[self._offsets[position]:self._offsets[position + 1]].tobytes()
+
+    def __getitem__(self, position):
+        return self._bytes(position).decode("utf-8")
+
+    def find(self, value):
+        """Position of value in the sorted strings (binary search), or -1."""
+        target = value.encode("utf-8")
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self._bytes(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < len(self) and self._bytes(low) == target else -1
+
+
+def build_grammy_index(df_grammy, index_dir=GRAMMY_INDEX_DIR):
+    """
+    Build the lookup index from the transformed Grammy data.
+
+    Args:
+        df_grammy (pd.DataFrame): Transformed Grammy data with normalized
+            'artist' and 'nominee' columns.
+        index_dir (str): Directory where the index is written.
+
+    Returns:
+        str: Path to the index directory.
+    """
+    df_grammy = df_grammy.reset_index(drop=True)
+    texts = {}
+    texts["categories"], category_codes = _text_codes(df_grammy["category"])
+
+    arrays = {
+        "year": df_grammy["year"].to_numpy(dtype="int32"),
+        "winner": df_grammy["winner"].astype(bool).to_numpy(),
+        "category_code": category_codes,
+    }
+    for key in INDEX_KEYS:
+        texts[f"{key}_keys"], codes = _text_codes(df_grammy[key])
+        arrays[f"{key}_code"] = codes
+        # Ordenar filas por (clave, año) para que cada clave sea un rango contiguo;
+        # los códigos siguen el orden de las claves
+        rows = np.lexsort((arrays["year"], codes)).astype("int32")
+        starts = np.searchsorted(codes[rows], np.arange(len(texts[f"{key}_keys"])), side="left")
+        arrays[f"{key}_offsets"] = np.append(starts, len(rows)).astype("int64")
+        arrays[f"{key}_rows"] = rows
+    for name, values in texts.items():
+        arrays[f"{name}.offsets"], arrays[f"{name}.utf8"] = _text_buffers(values)
+
+    staging_dir = f"{index_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+    for name, values in arrays.items():
+        np.save(os.path.join(staging_dir, f"{name}.npy"), values)
+    with open(os.path.join(staging_dir, "meta.json"), "w") as meta_file:
+        json.dump(
+            {"num_rows": len(df_grammy), "keys": INDEX_KEYS, "arrays": sorted(arrays), "texts": sorted(texts)},
+            meta_file
+        )
+
+    replace_directory(staging_dir, index_dir)
+    logger.info(f"Índice de Grammy guardado en: {index_dir} con {len(df_grammy)} filas")
+    return index_dir
+
+
+class GrammyIndex:
+    """Read-only, memory-mapped view of an index built by build_grammy_index."""
+
+    def __init__(self, index_dir=GRAMMY_INDEX_DIR):
+        with open(os.path.join(index_dir, "meta.json")) as meta_file:
+            self.meta = json.load(meta_file)
+        self._arrays = {
+            name: np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r")
+            for name in self.meta["arrays"]
+        }
+        self._texts = {
+            name: _TextColumn(self._arrays[f"{name}.offsets"], self._arrays[f"{name}.utf8"])
+            for name in self.meta["texts"]
+        }
+
+    def _rows(self, name, by, year_from=None, year_to=None):
+        """Row ids of a key, optionally limited to an inclusive year range."""
+        if by not in INDEX_KEYS:
+            raise ValueError(f"Unknown key '{by}', expected one of {INDEX_KEYS}")
+        name = normalize_text(pd.Series([name]))[0].as_py() or ""
+        position = self._texts[f"{by}_keys"].find(name)
+        if position < 0:
+            return np.empty(0, dtype="int32")
+
+        offsets = self._arrays[f"{by}_offsets"]
+        rows = self._arrays[f"{by}_rows"][offsets[position]:offsets[position + 1]]
+        if year_from is None and year_to is None:
+            return rows
+
+        years = self._arrays["year"][rows]
+        start = 0 if year_from is None else np.searchsorted(years, year_from, side="left")
+        end = len(rows) if year_to is None else np.searchsorted(years, year_to, side="right")
+        return rows[start:end]
+
+    def _records(self, rows):
+        return [
+            {
+                "year": int(self._arrays["year"][row]),
+                "category": self._texts["categories"][self._arrays["category_code"][row]],
+                "nominee": self._texts["nominee_keys"][self._arrays["nominee_code"][row]],
+                "artist": self._texts["artist_keys"][self._arrays["artist_code"][row]],
+                "winner": bool(self._arrays["winner"][row]),
+            }
+            for row in rows
+        ]
+
+    def nominations(self, name, year_from=None, year_to=None, by="artist"):
+        """
+        Return the nominations of an artist (or nominee) ordered by year.
+
+        Args:
+            name (str): Artist or nominee name; it is normalized before lookup.
+            year_from (int): First year of the range, inclusive.
+            year_to (int): Last year of the range, inclusive.
+            by (str): 'artist' or 'nominee'.
+
+        Returns:
+            list: One dict per nomination.
+        """
+        return self._records(self._rows(name, by, year_from, year_to))
+
+    def nominations_by_year(self, name, by="artist"):
+        """Return {year: number of nominations} for an artist or nominee."""
+        years, counts = np.unique(self._arrays["year"][self._rows(name, by)], return_counts=True)
+        return dict(zip(years.tolist(), counts.tolist()))
+
+    def won(self, name, category=None, by="artist"):
+        """Return whether an artist (or nominee) won, optionally in a given category."""
+        rows = self._rows(name, by)
+        winners = rows[self._arrays["winner"][rows]]
+        if category is None:
+            return len(winners) > 0
+
+        category = normalize_text(pd.Series([category]))[0].as_py() or ""
+        code = self._texts["categories"].find(category)
+        if code < 0:
+            return False
+        return bool((self._arrays["category_code"][winners] == code).any())
@@ -0,0 +1,111 @@
+"""Shared text normalization for the Spotify, Grammy and MusicBrainz transforms.
+
+Every text column goes through one chain of Arrow compute kernels: Unicode
+NFKD decomposition, lowercasing, diacritic stripping, whitespace collapsing,
+NFC recomposition and optional mapping of the 'n/a' sentinel. The kernels run in
+native code over the Arrow buffers, and the result is handed back to pandas
+as a zero-copy Arrow-backed string column.
+
+Normalized columns are recorded in ``df.attrs``, which pandas keeps in the
+Parquet files exchanged between tasks, so later stages skip them.
+"""
+
+import unicodedata
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+NORMALIZED_ATTR = "normalized_columns"
+NA_SENTINEL = "n/a"
+# Marcas combinantes sobre letras latinas, griegas o cirílicas ('é' -> 'e'). En otras
+# escrituras las marcas forman parte de la letra ('が', 'हि') y no se quitan
+DIACRITICS_PATTERN = r"([\p{Latin}\p{Greek}\p{Cyrillic}])\p{Mn}+"
+# Valores que siguen descompuestos tras quitar las marcas: otras escrituras y jamo de Hangul
+DECOMPOSED_PATTERN = r"[\p{M}\p{Hangul}]"
+
+
+def _compose(values):
+    """
+    Recompose to NFC the values that NFKD left decomposed.
+
+    pc.utf8_normalize returns decomposed text for every form in the pinned
+    pyarrow, so the values that still hold combining marks or Hangul jamo
+    are composed with unicodedata. Latin, Greek and Cyrillic text has no
+    marks left at this point and stays on the Arrow kernels.
+    """
+    decomposed = pc.fill_null(pc.match_substring_regex(values, DECOMPOSED_PATTERN), False)
+    if not pc.any(decomposed).as_py():
+        return values
+    composed = [unicodedata.normalize("NFC", value) for value in pc.filter(values, decomposed).to_pylist()]
+    return pc.replace_with_mask(values, decomposed, pa.array(composed, type=values.type))
+
+
+def normalize_text(values, na_value=None):
+    """
+    Normalize a text array in a single pass of Arrow kernels.
+
+    Diacritics are stripped only from Latin, Greek and Cyrillic letters, and
+    the result is recomposed to NFC, so text in other scripts (kana, Devanagari,
+    Hangul) keeps its meaning and its composed form.
+
+    Args:
+        values: pandas Series or pyarrow array of strings.
+        na_value (str): Replacement for the 'n/a' sentinel. None keeps it.
+
+    Returns:
+        pa.Array: Normalized strings, with nulls preserved.
+    """
+    if isinstance(values, pd.Series):
+        values = pa.array(values, type=pa.string(), from_pandas=True)
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    values = pc.utf8_normalize(values, form="NFKD")
+    # Minúsculas antes de quitar marcas: 'İ' pasa a 'i' + punto combinante
+    values = pc.utf8_lower(values)
+    values = pc.replace_substring_regex(values, pattern=DIACRITICS_PATTERN, replacement=r"\1")
+    values = pc.replace_substring_regex(values, pattern=r"\s+", replacement=" ")
+    values = pc.utf8_trim_whitespace(values)
+    values = _compose(values)
+    if na_value is not None:
+        values = pc.if_else(
+            pc.equal(values, NA_SENTINEL),
+            pa.scalar(na_value, type=pa.string()),
+            values
+        )
+    return values
+
+
+def normalized_columns(df):
+    """Return the columns of df already marked as normalized."""
+    return list(df.attrs.get(NORMALIZED_ATTR, []))
+
+
+def mark_normalized(df, columns):
+    """Record columns as normalized, keeping only those still present in df."""
+    marked = set(normalized_columns(df)) | set(columns)
+    df.attrs[NORMALIZED_ATTR] = [col for col in df.columns if col in marked]
+    return df
+
+
+def normalize_columns(df, columns=None, na_value=None):
+    """
+    Normalize text columns of a DataFrame exactly once.
+
+    Args:
+        df (pd.DataFrame): Data to normalize (modified in place).
+        columns (list): Columns to normalize. Defaults to every text column.
+        na_value (str): Replacement for the 'n/a' sentinel. None keeps it.
+
+    Returns:
+        pd.DataFrame: The same DataFrame with the columns normalized and marked.
+    """
+    if columns is None:
+        columns = df.select_dtypes(include=["object", "string"]).columns
+    already_normalized = set(normalized_columns(df))
+    pending = [col for col in columns if col not in already_normalized]
+
+    for col in pending:
+        normalized = normalize_text(df[col], na_value=na_value)
+        df[col] = pd.Series(pd.arrays.ArrowStringArray(normalized), index=df.index)
+
+    return mark_normalized(df, pending)
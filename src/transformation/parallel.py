@@ -0,0 +1,237 @@
+"""Partition-parallel execution of per-key transforms.
+
+The input frame is split into shards by a hash of a key column, so all rows
+of a key land in the same shard. Each shard is written once as an Arrow IPC
+stream into a ``multiprocessing.shared_memory`` block, and the worker maps
+that block instead of receiving a pickled copy of the frame. The results come
+back the same way and are concatenated in key order, so the output does not
+depend on the number of workers.
+
+Runs that shard at the same time on one host register in ACTIVE_RUNS_DIR and
+split the CPUs between the runs actually active, so a run alone on the host
+uses every CPU and concurrent runs do not oversubscribe it.
+"""
+
+import os
+import uuid
+import fcntl
+import logging
+import tempfile
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src.transformation.normalize import normalize_text, mark_normalized
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+# Las columnas de texto se leen como string[pyarrow] para evitar copias
+_TYPES_MAPPER = {pa.string(): pd.StringDtype("pyarrow")}.get
+ACTIVE_RUNS_DIR = os.getenv("ETL_ACTIVE_RUNS_DIR", os.path.join(tempfile.gettempdir(), "etl_active_runs"))
+
+
+def _to_shared_memory(df):
+    """Write a DataFrame as an Arrow IPC stream into a new shared memory block."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.MockOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    size = sink.size()
+
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    with pa.ipc.new_stream(pa.FixedSizeBufferWriter(pa.py_buffer(shm.buf)), table.schema) as writer:
+        writer.write_table(table)
+    return shm, size
+
+
+def _read_shared_memory(name, size):
+    """Copy a DataFrame out of a shared memory block."""
+    shm = shared_memory.SharedMemory(name=name)
+    buffer = pa.py_buffer(bytes(shm.buf[:size]))
+    shm.close()
+    table = pa.ipc.open_stream(buffer).read_all()
+    return table.to_pandas(types_mapper=_TYPES_MAPPER)
+
+
+def _run_shard(func, name, size):
+    """Worker entry point: transform one shard and publish the result."""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        # El shard se lee directamente del bloque compartido, sin copias
+        table = pa.ipc.open_stream(pa.py_buffer(shm.buf)[:size]).read_all()
+        shard = table.to_pandas(types_mapper=_TYPES_MAPPER)
+        del table
+        result = func(shard)
+        del shard
+        normalized = list(result.attrs.get("normalized_columns", []))
+        result_shm, result_size = _to_shared_memory(result)
+        result_shm.close()
+        del result
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            # Quedan vistas del bloque vivas; se liberan al terminar el proceso
+            pass
+    return result_shm.name, result_size, normalized
+
+
+@contextmanager
+def active_run(runs_dir=None):
+    """
+    Register the calling process as a run sharding on this host.
+
+    The registration is a file locked by its owner for the duration of the
+    block; the lock is released by the kernel if the process dies, so
+    count_active_runs never counts a crashed run.
+    """
+    runs_dir = runs_dir or ACTIVE_RUNS_DIR
+    os.makedirs(runs_dir, exist_ok=True)
+    path = os.path.join(runs_dir, f"{os.getpid()}-{uuid.uuid4().hex}.lock")
+    with open(f"{path}.tmp", "w") as run_file:
+        fcntl.flock(run_file, fcntl.LOCK_EX)
+        # El archivo solo es visible una vez bloqueado
+        os.replace(f"{path}.tmp", path)
+        try:
+            yield
+        finally:
+            os.remove(path)
+
+
+def count_active_runs(runs_dir=None):
+    """Number of runs registered with active_run on this host, removing those of dead processes."""
+    runs_dir = runs_dir or ACTIVE_RUNS_DIR
+    if not os.path.isdir(runs_dir):
+        return 0
+    active = 0
+    for name in os.listdir(runs_dir):
+        if not name.endswith(".lock"):
+            continue
+        path = os.path.join(runs_dir, name)
+        try:
+            run_file = open(path)
+        except FileNotFoundError:
+            continue
+        with run_file:
+            try:
+                fcntl.flock(run_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                active += 1
+                continue
+            # Nadie tiene el bloqueo: el proceso terminó sin borrar su registro
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return active
+
+
+def worker_budget(workers, active_runs=1):
+    """
+    Cap the number of worker processes of one run.
+
+    The CPUs of the host are split between the 'active_runs' runs sharding
+    at the same time, so a run alone gets all of them.
+    """
+    return max(1, min(workers, (os.cpu_count() or 1) // max(1, active_runs)))
+
+
+def shard_ids(keys, num_shards, normalize_keys=True):
+    """
+    Assign every row to a shard by hashing its key.
+
+    Args:
+        keys (pd.Series): Key column.
+        num_shards (int): Number of shards.
+        normalize_keys (bool): Hash the normalized key, so keys that only
+            differ in case or accents end up in the same shard.
+
+    Returns:
+        np.ndarray: Shard number of every row.
+    """
+    if normalize_keys:
+        keys = normalize_text(keys).to_numpy(zero_copy_only=False)
+    else:
+        keys = keys.to_numpy()
+    return pd.util.hash_array(keys) % np.uint64(num_shards)
+
+
+def run_sharded(df, func, key, workers):
+    """
+    Apply a per-key transform to hash shards of a DataFrame in parallel.
+
+    'func' must be a module-level function, or a functools.partial of one
+    (so it can be sent to the workers), whose output rows depend only on
+    input rows with the same key, and which returns a frame with one row
+    per normalized key.
+
+    Args:
+        df (pd.DataFrame): Input data.
+        func (callable): Transform applied to every shard.
+        key (str): Column used to shard the data and order the result.
+        workers (int): Maximum number of worker processes and shards; the
+            run gets at most its share of the CPUs (see worker_budget).
+
+    Returns:
+        pd.DataFrame: Concatenated result, sorted by key.
+    """
+    with active_run():
+        workers = worker_budget(workers, count_active_runs())
+        if workers == 1:
+            return func(df)
+        logger.info(f"Usando {workers} procesos de {os.cpu_count()} CPUs")
+        return _run_sharded(df, func, key, workers)
+
+
+def _run_sharded(df, func, key, workers):
+    ids = shard_ids(df[key], workers)
+    input_blocks = []
+    output_names = []
+
+    def record_output(future):
+        # Cada bloque de resultado se anota al terminar su shard, para liberarlo aunque otro falle
+        if not future.cancelled() and future.exception() is None:
+            output_names.append(future.result()[0])
+
+    try:
+        for shard in range(workers):
+            input_blocks.append(_to_shared_memory(df[ids == shard]))
+        logger.info(f"Datos divididos en {workers} particiones por '{key}'")
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_run_shard, func, shm.name, size)
+                for shm, size in input_blocks
+            ]
+            for future in futures:
+                future.add_done_callback(record_output)
+        # Al salir del bloque todos los shards terminaron y sus bloques están anotados
+        outputs = [future.result() for future in futures]
+
+        results = [_read_shared_memory(name, size) for name, size, _ in outputs]
+    finally:
+        for shm, _ in input_blocks:
+            shm.close()
+            shm.unlink()
+        for name in output_names:
+            shm = shared_memory.SharedMemory(name=name)
+            try:
+                shm.unlink()
+            finally:
+                shm.close()
+
+    result = pd.concat(results, ignore_index=True)
+    result = result.sort_values(key, kind="stable").reset_index(drop=True)
+    return mark_normalized(result, outputs[0][2])
@@ -1,21 +1,32 @@
 """
 Transform Spotify dataset.
 This module contains a function to transform the Spotify dataset.
+The transformations can run on several processes over 'track_id' hash shards.
 The function performs the following transformations:
 1. Drops the 'Unnamed: 0' column if it exists.
 2. Removes rows with missing values.
 3. Removes duplicate rows.
-4. Converts all text columns to lowercase.
+4. Normalizes all text columns (case, whitespace, diacritics).
 5. Groups the dataset by 'track_id', combines 'track_genre', and preserves other columns.
 6. Calculates the mean popularity for each 'track_id', categorizes it into levels, and drops the mean.
 7. Merges the transformed data back, ensuring no nulls remain.
-8. Saves the transformed dataset to a temporary CSV file and returns the file path.
+8. Saves the transformed dataset to a temporary Parquet file and returns the file path.
+Every shard also computes the popularity and audio-feature sketches per genre
+and per artist of its raw rows; they are merged once and persisted (see
+src/stats/summary.py).
 """
 
+import os
+import uuid
+import shutil
 import logging
+import functools
 import pandas as pd
-import tempfile
-import os
+from src.transformation.normalize import normalize_columns, mark_normalized, normalized_columns
+from src.transformation.parallel import run_sharded
+from src.scratch.manager import scratch_path, release, frame_size_hint
+from src.stats.summary import SUMMARY_DIR, build_spotify_summary, merge_shard_summaries
+from src.partitioning.partitions import resolve_partition, partition_dir
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -28,25 +39,19 @@ if not logger.hasHandlers():
     handler.setFormatter(formatter)
     logger.addHandler(handler)
 
-def transform_spotify_data(ti):
+def transform_spotify_frame(df_spotify):
     """
-    Transform the Spotify dataset by reading it from a temporary CSV file,
-    applying transformations, and saving the result to a new temporary CSV file.
+    Apply the Spotify transformations (steps 1-8) to an in-memory DataFrame.
+
+    Every output row depends only on the input rows of one 'track_id', so
+    the function can also run on hash shards of the data.
 
     Args:
-        ti: Task instance to pull the file path from XCom.
+        df_spotify (pd.DataFrame): Raw Spotify data.
 
     Returns:
-        str: Path to the temporary CSV file where the transformed DataFrame is saved.
+        pd.DataFrame: Transformed data with one row per 'track_id'.
     """
-    tmp_file_path = ti.xcom_pull(task_ids='read_csv')
-    if not tmp_file_path:
-        raise ValueError("No file path received from read_csv task")
-
-    logger.info(f"Leyendo DataFrame desde archivo temporal: {tmp_file_path}")
-    df_spotify = pd.read_csv(tmp_file_path)
-    logger.info("DataFrame leído exitosamente para transformación.")
-
     # 1. Eliminar la columna 'Unnamed: 0' si existe
     if "Unnamed: 0" in df_spotify.columns:
         df_spotify = df_spotify.drop(columns=["Unnamed: 0"])
@@ -57,14 +62,13 @@ def transform_spotify_data(ti):
     # 3. Eliminar duplicados
     df_spotify = df_spotify.drop_duplicates()
 
-    # 4. Convertir todas las columnas de texto a minúsculas
-    text_columns = df_spotify.select_dtypes(include=['object']).columns
-    for col in text_columns:
-        df_spotify[col] = df_spotify[col].str.lower()
+    # 4. Normalizar todas las columnas de texto (minúsculas, espacios, acentos)
+    df_spotify = normalize_columns(df_spotify)
 
     # 5. Agrupar por 'track_id' y combinar 'track_genre'
     agg_dict = {
-        "track_genre": lambda x: ", ".join(set(x.dropna())),  # Combinar géneros únicos, ignorando nulos
+        # Combinar géneros únicos ordenados, ignorando nulos (orden estable entre ejecuciones)
+        "track_genre": lambda x: ", ".join(sorted(set(x.dropna()))),
     }
     # Preservar otras columnas con 'first'
     for col in df_spotify.columns:
@@ -106,18 +110,63 @@ def transform_spotify_data(ti):
     df_spotify_transformed = df_spotify_transformed.dropna()
     df_spotify_transformed = df_spotify_transformed.drop(columns=["popularity"])
 
-    # 9. Guardar el resultado en un archivo temporal CSV
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as tmp_file:
-        df_spotify_transformed.to_csv(tmp_file.name, index=False)
-        transformed_tmp_file_path = tmp_file.name
-        num_rows = len(df_spotify_transformed)
-        logger.info(f"DataFrame transformado guardado en: {transformed_tmp_file_path} con {num_rows} filas")
+    return mark_normalized(df_spotify_transformed, normalized_columns(df_spotify))
+
+
+def sketch_and_transform_frame(df_spotify, sketch_root):
+    """
+    Shard function of run_sharded: save the sketches of the raw rows, then transform them.
+
+    Each shard saves its sketch set in its own directory under sketch_root,
+    for merge_shard_summaries.
+    """
+    build_spotify_summary(df_spotify, os.path.join(sketch_root, uuid.uuid4().hex))
+    return transform_spotify_frame(df_spotify)
+
+
+def transform_spotify_data(ti, workers=1, params=None):
+    """
+    Transform the Spotify dataset by reading it from a temporary CSV file,
+    applying transformations, and saving the result to a new temporary Parquet file.
+
+    Args:
+        ti: Task instance to pull the file path from XCom.
+        workers (int): Maximum number of processes; above 1 the data is split
+            into 'track_id' hash shards transformed in parallel. The run uses
+            at most its share of the CPUs among the runs sharding on the host.
+        params (dict): DAG run params; the summary sketches are saved for the run's partition.
+
+    Returns:
+        str: Path to the temporary Parquet file where the transformed DataFrame is saved.
+    """
+    tmp_file_path = ti.xcom_pull(task_ids='read_csv')
+    if not tmp_file_path:
+        raise ValueError("No file path received from read_csv task")
+
+    logger.info(f"Leyendo DataFrame desde archivo temporal: {tmp_file_path}")
+    df_spotify = pd.read_csv(tmp_file_path)
+    logger.info("DataFrame leído exitosamente para transformación.")
+
+    # Estadísticas de popularidad y audio por género y artista: cada shard resume sus filas
+    # crudas, antes de descartar la popularidad, y los resúmenes se combinan una sola vez
+    partition = resolve_partition(params)
+    sketch_root = scratch_path(ti.run_id, "spotify_sketches", "")
+    # Resúmenes de un intento anterior de la tarea contarían sus filas dos veces
+    shutil.rmtree(sketch_root, ignore_errors=True)
+    df_spotify_transformed = run_sharded(
+        df_spotify, functools.partial(sketch_and_transform_frame, sketch_root=sketch_root), "track_id", workers
+    )
+    merge_shard_summaries(sketch_root, partition_dir(SUMMARY_DIR, partition), partition["key"])
+
+    # 9. Guardar el resultado en un archivo temporal Parquet
+    transformed_tmp_file_path = scratch_path(
+        ti.run_id, "transform_spotify", ".parquet", size_hint=frame_size_hint(df_spotify_transformed)
+    )
+    df_spotify_transformed.to_parquet(transformed_tmp_file_path, index=False)
+    num_rows = len(df_spotify_transformed)
+    logger.info(f"DataFrame transformado guardado en: {transformed_tmp_file_path} con {num_rows} filas")
 
     # Eliminar el archivo temporal original
-    try:
-        os.remove(tmp_file_path)
-        logger.info(f"Archivo temporal original eliminado: {tmp_file_path}")
-    except Exception as e:
-        logger.warning(f"No se pudo eliminar el archivo temporal {tmp_file_path}: {e}")
+    release(tmp_file_path)
 
     return transformed_tmp_file_path
\ No newline at end of file
@@ -0,0 +1,195 @@
+"""Tests for the change-data-capture delta of the merged dataset."""
+
+import os
+import pandas as pd
+import pytest
+
+from src.merge.cdc import (
+    KEY_COLUMN, HASH_INDEX_FILE,
+    hash_merged_rows, compute_delta, load_hash_index, commit_hash_index, capture_merged_changes,
+)
+
+
+def _merged(rows):
+    return pd.DataFrame(rows, columns=[KEY_COLUMN, "track_name", "popularity", "category"])
+
+
+PREVIOUS = _merged([
+    ("a", "song a", 10, "best rock"),
+    ("b", "song b", 20, "best pop"),
+    ("b", "song b", 20, "best album"),
+    ("c", "song c", 30, None),
+])
+
+CURRENT = _merged([
+    ("a", "song a", 10, "best rock"),
+    ("b", "song b", 20, "best pop"),
+    ("b", "song b", 21, "best album"),
+    ("d", "song d", 40, "best new artist"),
+])
+
+
+class FakeTaskInstance:
+    def __init__(self, merged_file_path, run_id):
+        self.merged_file_path = merged_file_path
+        self.run_id = run_id
+
+    def xcom_pull(self, task_ids):
+        assert task_ids == "merge_spotify_grammy"
+        return self.merged_file_path
+
+
+def test_compute_delta_classifies_inserts_updates_and_deletes():
+    delta = compute_delta(CURRENT, hash_merged_rows(CURRENT), hash_merged_rows(PREVIOUS))
+
+    assert set(delta["insert"][KEY_COLUMN]) == {"d"}
+    assert set(delta["update"][KEY_COLUMN]) == {"b"}
+    assert delta["delete"][KEY_COLUMN].tolist() == ["c"]
+    # Las actualizaciones llevan todas las filas del track, no solo la que cambió
+    pd.testing.assert_frame_equal(delta["update"], CURRENT[CURRENT[KEY_COLUMN] == "b"])
+
+
+def test_unchanged_rerun_produces_empty_delta():
+    # El orden de las filas no cambia el hash de un track
+    shuffled = CURRENT.sample(frac=1, random_state=0)
+    delta = compute_delta(shuffled, hash_merged_rows(shuffled), hash_merged_rows(CURRENT))
+
+    assert all(frame.empty for frame in delta.values())
+
+
+def test_first_run_inserts_everything_and_rerun_after_commit_is_empty(tmp_path, scratch_root):
+    merged_file_path = tmp_path / "merged.csv"
+    CURRENT.to_csv(merged_file_path, index=False)
+    cdc_dir = str(tmp_path / "_cdc")
+
+    delta_dir = capture_merged_changes(FakeTaskInstance(str(merged_file_path), "run_1"), cdc_dir=cdc_dir)
+    inserts = pd.read_parquet(os.path.join(delta_dir, "insert.parquet"))
+    assert len(inserts) == len(CURRENT)
+    assert load_hash_index(cdc_dir) is None
+
+    commit_hash_index(delta_dir, cdc_dir)
+    assert os.path.exists(os.path.join(cdc_dir, HASH_INDEX_FILE))
+
+    delta_dir = capture_merged_changes(FakeTaskInstance(str(merged_file_path), "run_2"), cdc_dir=cdc_dir)
+    for operation in ["insert", "update", "delete"]:
+        assert pd.read_parquet(os.path.join(delta_dir, f"{operation}.parquet")).empty
+
+
+def _write_delta(delta_dir, current, previous):
+    os.makedirs(delta_dir, exist_ok=True)
+    delta = compute_delta(current, hash_merged_rows(current), hash_merged_rows(previous))
+    for operation, frame in delta.items():
+        frame.to_parquet(os.path.join(delta_dir, f"{operation}.parquet"), index=False)
+
+
+def _table_rows(engine, table_name):
+    rows = pd.read_sql(f'SELECT * FROM "{table_name}"', engine)
+    return rows.sort_values(list(rows.columns), ignore_index=True)
+
+
+def test_apply_delta_twice_leaves_table_unchanged(tmp_path, pg_engine, pg_table):
+    pytest.importorskip("dotenv")
+    import pyarrow as pa
+    from src.loading.load import prepare_table, replace_partition, apply_delta, with_partition
+
+    prepare_table(pg_engine, pg_table, PREVIOUS.head(0).assign(partition_key="p"))
+    with pg_engine.begin() as connection:
+        replace_partition(
+            connection, pg_table, "p", with_partition(pa.Table.from_pandas(PREVIOUS, preserve_index=False), "p")
+        )
+        # Las filas de otra partición no se tocan
+        replace_partition(
+            connection, pg_table, "other", with_partition(pa.Table.from_pandas(PREVIOUS, preserve_index=False), "other")
+        )
+
+    delta_dir = str(tmp_path / "delta")
+    _write_delta(delta_dir, CURRENT, PREVIOUS)
+
+    with pg_engine.begin() as connection:
+        apply_delta(connection, pg_table, delta_dir, "p")
+    after_first = _table_rows(pg_engine, pg_table)
+
+    # Un reintento, o una segunda ejecución que calculó el mismo delta
+    with pg_engine.begin() as connection:
+        apply_delta(connection, pg_table, delta_dir, "p")
+    after_second = _table_rows(pg_engine, pg_table)
+
+    pd.testing.assert_frame_equal(after_first, after_second)
+    partition_rows = after_first[after_first["partition_key"] == "p"].drop(columns="partition_key")
+    expected = CURRENT.sort_values(list(CURRENT.columns), ignore_index=True)
+    pd.testing.assert_frame_equal(
+        partition_rows.reset_index(drop=True), expected, check_dtype=False
+    )
+    assert (after_first["partition_key"] == "other").sum() == len(PREVIOUS)
+
+
+def _load_run(engine, table_name, merged_df, delta_dir, cdc_dir):
+    import pyarrow as pa
+    from src.loading.load import load_partition
+
+    load_partition(
+        engine, table_name, "p", pa.Table.from_pandas(merged_df, preserve_index=False),
+        delta_dir=delta_dir, cdc_dir=cdc_dir
+    )
+
+
+def test_delta_of_a_stale_index_replaces_the_partition(tmp_path, scratch_root, pg_engine, pg_table):
+    pytest.importorskip("dotenv")
+    from src.loading.load import prepare_table
+
+    cdc_dir = str(tmp_path / "_cdc")
+    other = CURRENT.assign(popularity=CURRENT["popularity"] + 1).iloc[:2]
+
+    def capture(merged_df, run_id):
+        merged_file_path = tmp_path / f"{run_id}.csv"
+        merged_df.to_csv(merged_file_path, index=False)
+        return capture_merged_changes(FakeTaskInstance(str(merged_file_path), run_id), cdc_dir=cdc_dir)
+
+    prepare_table(pg_engine, pg_table, PREVIOUS.head(0).assign(partition_key="p"))
+    _load_run(pg_engine, pg_table, PREVIOUS, capture(PREVIOUS, "run_0"), cdc_dir)
+
+    # Dos ejecuciones calculan su delta contra el mismo índice confirmado y cargan una tras otra
+    delta_a, delta_b = capture(CURRENT, "run_a"), capture(other, "run_b")
+    _load_run(pg_engine, pg_table, CURRENT, delta_a, cdc_dir)
+    _load_run(pg_engine, pg_table, other, delta_b, cdc_dir)
+
+    expected = other.sort_values(list(other.columns), ignore_index=True)
+    loaded = _table_rows(pg_engine, pg_table).drop(columns="partition_key")
+    pd.testing.assert_frame_equal(loaded, expected, check_dtype=False)
+    # El índice confirmado corresponde a las filas cargadas
+    pd.testing.assert_frame_equal(load_hash_index(cdc_dir), hash_merged_rows(other))
+
+    # Reintentar la carga de run_b tras confirmar su índice deja la tabla igual
+    _load_run(pg_engine, pg_table, other, delta_b, cdc_dir)
+    pd.testing.assert_frame_equal(
+        _table_rows(pg_engine, pg_table).drop(columns="partition_key"), expected, check_dtype=False
+    )
+
+
+def test_load_waits_for_the_partition_lock_before_committing(tmp_path, scratch_root, pg_engine, pg_table):
+    pytest.importorskip("dotenv")
+    import threading
+    from sqlalchemy import text
+    from src.loading.load import prepare_table
+
+    cdc_dir = str(tmp_path / "_cdc")
+    merged_file_path = tmp_path / "merged.csv"
+    CURRENT.to_csv(merged_file_path, index=False)
+    delta_dir = capture_merged_changes(FakeTaskInstance(str(merged_file_path), "run_1"), cdc_dir=cdc_dir)
+    prepare_table(pg_engine, pg_table, CURRENT.head(0).assign(partition_key="p"))
+
+    lock_params = {"table_name": pg_table, "partition_key": "p"}
+    with pg_engine.connect() as other_run:
+        other_run.execute(text("SELECT pg_advisory_lock(hashtext(:table_name), hashtext(:partition_key))"), lock_params)
+        load = threading.Thread(target=_load_run, args=(pg_engine, pg_table, CURRENT, delta_dir, cdc_dir))
+        load.start()
+        load.join(0.5)
+        # Mientras otra ejecución tiene la partición, ni la tabla ni el índice cambian
+        assert load.is_alive()
+        assert load_hash_index(cdc_dir) is None
+        other_run.execute(text("SELECT pg_advisory_unlock(hashtext(:table_name), hashtext(:partition_key))"), lock_params)
+    load.join(10)
+
+    assert not load.is_alive()
+    assert len(_table_rows(pg_engine, pg_table)) == len(CURRENT)
+    pd.testing.assert_frame_equal(load_hash_index(cdc_dir), hash_merged_rows(CURRENT))
@@ -0,0 +1,99 @@
+"""Tests for the run state of the Airflow DAG.
+
+The DAG runs in a subprocess with dag.test(), so Airflow reads its
+configuration (AIRFLOW_HOME, metadata database) from an isolated
+environment. Every task except cleanup_scratch is replaced by a stub that
+writes a scratch file, or fails.
+"""
+
+import os
+import sys
+import json
+import subprocess
+import pytest
+
+pytest.importorskip("airflow")
+pytest.importorskip("pydrive2")
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+RUN_DAG = """
+import os, sys, json, importlib.util
+from airflow.utils import db
+from src.scratch.manager import scratch_path
+
+db.initdb()
+spec = importlib.util.spec_from_file_location("etl_dag", os.path.join("dags", "dag.py"))
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+
+def stub(task_id, fail):
+    def run(run_id):
+        if fail:
+            raise RuntimeError(f"{task_id} roto")
+        with open(scratch_path(run_id, task_id, ".txt"), "w") as output:
+            output.write(task_id)
+    return run
+
+for task in module.dag.tasks:
+    task.retries = 0
+    if task.task_id != "cleanup_scratch":
+        task.python_callable = stub(task.task_id, task.task_id == sys.argv[1])
+        task.op_kwargs = {}
+
+dag_run = module.dag.test()
+print(json.dumps({
+    "state": dag_run.state,
+    "tasks": {ti.task_id: ti.state for ti in dag_run.get_task_instances()},
+    "scratch": os.listdir(os.environ["ETL_SCRATCH_DIR"]),
+    "pools": {task.task_id: task.pool for task in module.dag.tasks},
+}))
+"""
+
+
+@pytest.fixture(scope="module")
+def run_dag(tmp_path_factory):
+    """Run the DAG making the task given fail; return the run and task states."""
+    home = tmp_path_factory.mktemp("airflow")
+    env = dict(
+        os.environ,
+        AIRFLOW_HOME=str(home),
+        AIRFLOW__CORE__LOAD_EXAMPLES="False",
+        ETL_SCRATCH_DIR=str(home / "scratch"),
+        ETL_RAM_SCRATCH_DIR=str(home / "ram" / "etl_scratch"),
+        # store.py exige la configuración de Google Drive al importarse
+        CONFIG_DIR=str(home), CLIENT_SECRETS_FILE="client_secrets.json",
+        SETTINGS_FILE="settings.yaml", CREDENTIALS_FILE="credentials.json", FOLDER_ID="test",
+    )
+    os.makedirs(env["ETL_SCRATCH_DIR"])
+
+    def run(failing_task):
+        completed = subprocess.run(
+            [sys.executable, "-c", RUN_DAG, failing_task],
+            cwd=BASE_DIR, env=env, capture_output=True, text=True, timeout=300,
+        )
+        assert completed.returncode == 0, completed.stderr[-3000:]
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    return run
+
+
+def test_successful_run_cleans_its_scratch(run_dag):
+    result = run_dag("")
+
+    assert result["state"] == "success"
+    assert set(result["tasks"].values()) == {"success"}
+    assert result["scratch"] == []
+    # Una sola extracción de MusicBrainz a la vez entre todas las ejecuciones
+    assert result["pools"]["extract_api_artists"] == "musicbrainz_api"
+
+
+@pytest.mark.parametrize("failing_task", ["load_to_db", "read_csv", "transform_grammy"])
+def test_failed_task_fails_the_run_and_still_cleans_up(run_dag, failing_task):
+    result = run_dag(failing_task)
+
+    assert result["state"] == "failed"
+    assert result["tasks"][failing_task] == "failed"
+    assert result["tasks"]["store_to_drive"] == "upstream_failed"
+    assert result["tasks"]["cleanup_scratch"] == "success"
+    assert result["scratch"] == []
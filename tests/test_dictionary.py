@@ -0,0 +1,69 @@
+"""Tests for the persistent dictionary encoding."""
+
+import multiprocessing
+import numpy as np
+import pandas as pd
+
+from src.transformation.dictionary import NULL_CODE, encode, load_dictionary, to_categorical
+
+
+def test_round_trip_with_nulls_and_stable_ids(tmp_path):
+    dictionary_dir = str(tmp_path)
+    first = pd.Series(["queen", None, "drake", "queen"])
+    (codes,), dictionary = encode("artist", first, dictionary_dir=dictionary_dir)
+
+    assert codes.tolist() == [0, NULL_CODE, 1, 0]
+    assert dictionary.take(codes[codes != NULL_CODE]).tolist() == ["queen", "drake", "queen"]
+
+    # Una ejecución posterior conserva los IDs y añade los valores nuevos al final
+    second = pd.Series(["adele", "drake"])
+    (codes,), dictionary = encode("artist", second, dictionary_dir=dictionary_dir)
+    assert codes.tolist() == [2, 1]
+    assert load_dictionary("artist", dictionary_dir).tolist() == ["queen", "drake", "adele"]
+
+
+def test_columns_of_one_domain_share_the_dictionary(tmp_path):
+    artists = pd.Series(["queen", "adele"])
+    nominees = pd.Series(["adele", np.nan, "drake"])
+    (artist_codes, nominee_codes), dictionary = encode("artist", artists, nominees, dictionary_dir=str(tmp_path))
+
+    assert artist_codes[1] == nominee_codes[0]
+    assert nominee_codes[1] == NULL_CODE
+    assert len(dictionary) == 3
+
+
+def test_to_categorical_keeps_values_and_index(tmp_path):
+    column = pd.Series(["rock", None, "pop"], index=[10, 11, 12], name="genre")
+    encoded = to_categorical("genre", column, dictionary_dir=str(tmp_path))
+
+    assert encoded.index.tolist() == [10, 11, 12]
+    assert encoded.name == "genre"
+    assert encoded.astype(object).where(encoded.notna(), None).tolist() == ["rock", None, "pop"]
+
+
+def _encode_rounds(args):
+    dictionary_dir, writer, rounds = args
+    rng = np.random.default_rng(writer)
+    results = []
+    for _ in range(rounds):
+        # Valores compartidos con los demás escritores y valores propios
+        values = [f"shared {i}" for i in rng.integers(0, 50, 20)] + [f"writer {writer} {i}" for i in rng.integers(0, 30, 5)]
+        (codes,), _ = encode("artist", pd.Series(values), dictionary_dir=dictionary_dir)
+        results.append((values, codes.tolist()))
+    return results
+
+
+def test_concurrent_writers_never_reassign_ids(tmp_path):
+    dictionary_dir = str(tmp_path)
+    context = multiprocessing.get_context("fork")
+    with context.Pool(4) as pool:
+        outputs = pool.map(_encode_rounds, [(dictionary_dir, writer, 15) for writer in range(8)])
+
+    dictionary = load_dictionary("artist", dictionary_dir)
+    assert dictionary.is_unique
+    # Los códigos devueltos a cada escritor siguen valiendo con el diccionario final
+    for results in outputs:
+        for values, codes in results:
+            assert dictionary.take(codes).tolist() == values
+    expected = {value for results in outputs for values, _ in results for value in values}
+    assert set(dictionary) == expected
@@ -0,0 +1,157 @@
+"""Tests for the targeted MusicBrainz extraction, against a fake search endpoint."""
+
+import os
+import re
+import json
+import pandas as pd
+import pytest
+
+from src.extraction import extract_api
+from src.extraction.extract_api import MUSICBRAINZ_URL, UNRESOLVED_FILE, extract_musicbrainz_artists_targeted
+
+
+class TaskKilled(Exception):
+    """The worker running the task died in the middle of the extraction."""
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+
+    def json(self):
+        return self.payload
+
+
+class FakeMusicBrainz:
+    """Search and lookup endpoints over a fixed catalog of artists."""
+
+    def __init__(self, catalog, kill_on_search=None):
+        self.catalog = catalog
+        self.kill_on_search = kill_on_search
+        self.searches = []
+
+    def get(self, url, params=None, headers=None):
+        if url != MUSICBRAINZ_URL:
+            artist_id = url.rsplit("/", 1)[1]
+            return FakeResponse(next(a for a in self.catalog if a["id"] == artist_id))
+        names = [name.replace('\\"', '"') for name in re.findall(r'artist:"((?:[^"\\]|\\.)*)"', params["query"])]
+        self.searches.append(names)
+        if len(self.searches) == self.kill_on_search:
+            raise TaskKilled()
+        artists = self.matches(names)
+        return FakeResponse({"count": len(artists), "offset": 0, "artists": artists[:params["limit"]]})
+
+    def matches(self, names):
+        return [artist for artist in self.catalog if artist["name"] in names]
+
+    def searched_names(self):
+        return {name for names in self.searches for name in names}
+
+
+class FakeTaskInstance:
+    def __init__(self, spotify_path, grammy_path):
+        self.paths = {"transform_spotify": spotify_path, "transform_grammy": grammy_path}
+
+    def xcom_pull(self, task_ids):
+        return self.paths[task_ids]
+
+
+def _artist(name):
+    return {"id": f"mbid-{name}", "name": name, "genres": [{"name": "rock"}], "release-groups": []}
+
+
+ARTIST_NAMES = [f"artist {i:02d}" for i in range(45)]
+
+
+@pytest.fixture
+def extraction(tmp_path, scratch_root, monkeypatch):
+    """Run the targeted extraction over the Spotify artist names given, in tmp_path."""
+    spotify_path, grammy_path = str(tmp_path / "spotify.parquet"), str(tmp_path / "grammy.parquet")
+    pd.DataFrame({"artist": pd.Series([], dtype=object)}).to_parquet(grammy_path)
+    monkeypatch.setattr(extract_api.time, "sleep", lambda seconds: None)
+    output_dir = str(tmp_path / "interm")
+    os.makedirs(output_dir)
+
+    def run(musicbrainz, names=ARTIST_NAMES):
+        pd.DataFrame({"artists": names}).to_parquet(spotify_path)
+        monkeypatch.setattr(extract_api.requests, "get", musicbrainz.get)
+        return extract_musicbrainz_artists_targeted(
+            FakeTaskInstance(spotify_path, grammy_path), output_dir=output_dir, run_id="run_1",
+            checkpoint_dir=str(tmp_path / "checkpoints")
+        )
+
+    run.output_dir = output_dir
+    return run
+
+
+def _unresolved(output_dir):
+    with open(os.path.join(output_dir, UNRESOLVED_FILE)) as cache:
+        return set(json.load(cache))
+
+
+def test_resume_searches_the_planned_batches_after_shared_files_change(extraction):
+    missing = {"artist 05", "artist 30"}
+    catalog = [_artist(name) for name in ARTIST_NAMES if name not in missing]
+
+    # Muere durante el segundo lote, con el primero ya completado
+    with pytest.raises(TaskKilled):
+        extraction(FakeMusicBrainz(catalog, kill_on_search=2))
+
+    # Otra ejecución añade artistas al archivo compartido antes del reintento
+    known_file = os.path.join(extraction.output_dir, "musicbrainz_artists.csv")
+    pd.DataFrame([
+        extract_api._parse_artist_detail(_artist(name)) for name in ["artist 01", "artist 02"]
+    ]).to_csv(known_file, index=False)
+
+    retry = FakeMusicBrainz(catalog)
+    temp_file = extraction(retry)
+
+    # Solo los nombres realmente buscados sin coincidencia van a la caché negativa
+    assert _unresolved(extraction.output_dir) == missing
+    assert retry.searched_names() == set(ARTIST_NAMES[20:])
+    extracted = pd.read_csv(temp_file)
+    assert set(extracted["name"]) == set(ARTIST_NAMES) - missing
+    assert extracted["artist_id"].is_unique
+
+
+class PartialMatchMusicBrainz(FakeMusicBrainz):
+    """
+    Search that also returns partial matches, in catalog order.
+
+    With several OR'ed names the scores of different names are not
+    comparable, so partial matches of one name can outrank the exact match
+    of another; a search of a single name ranks its exact match first.
+    """
+
+    def matches(self, names):
+        hits = [artist for artist in self.catalog if any(name in artist["name"] for name in names)]
+        if len(names) == 1:
+            hits.sort(key=lambda artist: artist["name"] != names[0])
+        return hits
+
+
+def test_misses_are_only_cached_when_the_search_returned_every_hit(extraction):
+    names = ["drake", "queen", "the band", "artist 05", "artist 06"]
+    catalog = (
+        [_artist(f"drake tribute {i}") for i in range(60)]
+        + [_artist(f"queen cover {i}") for i in range(60)]
+        # Ninguna coincidencia exacta de 'the band' y más parciales que el límite
+        + [_artist(f"the band tribute {i}") for i in range(120)]
+        + [_artist(name) for name in ["drake", "queen", "artist 06"]]
+    )
+    musicbrainz = PartialMatchMusicBrainz(catalog)
+    temp_file = extraction(musicbrainz, names)
+
+    extracted = pd.read_csv(temp_file)
+    assert set(extracted["name"]) == {"drake", "queen", "artist 06"}
+    # 'the band' nunca tuvo una búsqueda completa: se reintentará en la próxima ejecución
+    assert _unresolved(extraction.output_dir) == {"artist 05"}
+    # Un lote truncado, y una búsqueda individual por cada nombre que quedó sin resolver
+    assert len(musicbrainz.searches[0]) == len(names)
+    assert musicbrainz.searches[1:] == [[name] for name in sorted(names)]
+
+
+def test_checkpoint_dir_is_anchored_to_the_repository():
+    assert os.path.isabs(extract_api.CHECKPOINT_DIR)
+    assert extract_api.CHECKPOINT_DIR.startswith(extract_api.BASE_DIR)
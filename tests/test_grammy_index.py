@@ -0,0 +1,90 @@
+"""Tests for the memory-mapped Grammy lookup index."""
+
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.transformation.grammy_index import GrammyIndex, build_grammy_index
+
+ARTISTS = ["queen", "drake", "beyonce", "がらくた", "방탄소년단", "sigur ros", "ab", "abc", "", None]
+CATEGORIES = ["best rock album", "best new artist", "record of the year", "best k-pop 🎵"]
+
+
+def random_grammy(seed, num_rows=400):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "year": rng.integers(1958, 2020, num_rows),
+        "category": rng.choice(CATEGORIES, num_rows),
+        "nominee": rng.choice(np.array(ARTISTS, dtype=object), num_rows),
+        "artist": rng.choice(np.array(ARTISTS, dtype=object), num_rows),
+        "winner": rng.random(num_rows) < 0.3,
+    })
+
+
+def reference_nominations(df, name, by, year_from=None, year_to=None):
+    rows = df[df[by].fillna("") == name]
+    if year_from is not None:
+        rows = rows[rows["year"] >= year_from]
+    if year_to is not None:
+        rows = rows[rows["year"] <= year_to]
+    rows = rows.sort_values("year", kind="stable")
+    return [
+        {"year": int(r.year), "category": r.category, "nominee": r.nominee or "", "artist": r.artist or "",
+         "winner": bool(r.winner)}
+        for r in rows.itertuples()
+    ]
+
+
+@pytest.fixture
+def grammy(tmp_path):
+    df = random_grammy(1)
+    index_dir = build_grammy_index(df, str(tmp_path / "grammy_index"))
+    return df, GrammyIndex(index_dir), index_dir
+
+
+@pytest.mark.parametrize("by", ["artist", "nominee"])
+@pytest.mark.parametrize("name", ["queen", "がらくた", "방탄소년단", "ab", "abc", "", "unknown"])
+def test_lookups_match_a_scan_of_the_frame(grammy, name, by):
+    df, index, _ = grammy
+
+    assert index.nominations(name, by=by) == reference_nominations(df, name, by)
+    assert index.nominations(name, 1970, 1990, by=by) == reference_nominations(df, name, by, 1970, 1990)
+    expected_by_year = df[df[by].fillna("") == name]["year"].value_counts().sort_index()
+    assert index.nominations_by_year(name, by=by) == expected_by_year.to_dict()
+
+
+def test_won_by_category(grammy):
+    df, index, _ = grammy
+    winners = df[df["winner"]]
+
+    for name in ["queen", "방탄소년단", "unknown"]:
+        assert index.won(name) == (winners["artist"] == name).any()
+        for category in CATEGORIES:
+            expected = ((winners["artist"] == name) & (winners["category"] == category)).any()
+            assert index.won(name, category) == expected
+    # Los nombres se normalizan antes de buscarlos
+    assert index.won("  QUEEN ") == index.won("queen")
+
+
+def test_text_is_stored_as_utf8_bytes(grammy):
+    df, index, index_dir = grammy
+    arrays = {name: np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r") for name in index.meta["arrays"]}
+
+    assert not any(values.dtype.kind == "U" for values in arrays.values())
+    artist_keys = sorted(set(df["artist"].fillna("")))
+    assert arrays["artist_keys.utf8"].nbytes == sum(len(key.encode("utf-8")) for key in artist_keys)
+    assert len(arrays["artist_keys.offsets"]) == len(artist_keys) + 1
+
+
+def test_rebuild_replaces_the_previous_index(grammy, tmp_path):
+    _, _, index_dir = grammy
+    smaller = random_grammy(2, num_rows=20)
+    smaller["artist"] = "adele"
+    build_grammy_index(smaller, index_dir)
+
+    index = GrammyIndex(index_dir)
+    assert index.meta["num_rows"] == 20
+    assert index.nominations("queen") == []
+    assert len(index.nominations("adele")) == 20
+    assert sorted(os.listdir(tmp_path)) == ["grammy_index", "grammy_index.lock"]
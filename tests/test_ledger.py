@@ -0,0 +1,60 @@
+"""Tests for the run ledger."""
+
+import os
+import time
+import numpy as np
+
+from src.ledger.ledger import connect_ledger, describe_output, track_stage
+
+
+def _write(path, data):
+    with open(path, "wb") as output:
+        output.write(data)
+    return str(path)
+
+
+def test_fingerprint_covers_the_whole_content(tmp_path):
+    data = bytearray(os.urandom(5 * 1024 * 1024))
+    path = _write(tmp_path / "output.bin", data)
+    fingerprint = describe_output(path)["fingerprint"]
+
+    # Reescribir los mismos bytes no cambia la huella
+    os.utime(path, (0, 0))
+    assert describe_output(path)["fingerprint"] == fingerprint
+
+    # Un byte distinto en mitad del archivo, con el mismo tamaño, sí la cambia
+    data[len(data) // 2] ^= 0xFF
+    _write(path, data)
+    assert describe_output(path)["fingerprint"] != fingerprint
+
+
+def test_directory_fingerprint_includes_file_names(tmp_path):
+    first, second = tmp_path / "first", tmp_path / "second"
+    for directory, name in [(first, "a.parquet"), (second, "b.parquet")]:
+        directory.mkdir()
+        _write(directory / name, b"same bytes")
+
+    described = describe_output(str(first))
+    assert described["bytes"] == len(b"same bytes")
+    assert described["fingerprint"] != describe_output(str(second))["fingerprint"]
+
+
+def _allocate_stage():
+    block = np.ones(256 * 1024 * 1024 // 8)
+    time.sleep(0.3)
+    return float(block[-1])
+
+
+def _small_stage():
+    time.sleep(0.1)
+
+
+def test_peak_memory_is_measured_per_stage(tmp_path):
+    ledger_path = str(tmp_path / "ledger.sqlite")
+    track_stage("allocate", _allocate_stage, ledger_path)(run_id="run_1")
+    track_stage("small", _small_stage, ledger_path)(run_id="run_1")
+
+    connection = connect_ledger(ledger_path)
+    peaks = {row["stage"]: row["max_rss_mb"] for row in connection.execute("SELECT * FROM stage_runs")}
+    connection.close()
+    assert peaks["allocate"] - peaks["small"] > 200
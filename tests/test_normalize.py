@@ -0,0 +1,62 @@
+"""Tests for the shared text normalization."""
+
+import unicodedata
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from src.transformation.normalize import normalize_text, normalize_columns, normalized_columns
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("Beyoncé", "beyonce"),
+    ("  Mötley   Crüe\t", "motley crue"),
+    ("Sigur Rós", "sigur ros"),
+    ("İstanbul", "istanbul"),
+    ("Ἀθήνα", "αθηνα"),
+    ("Дельфин", "дельфин"),
+    ("ﬁre ＡＢＣ", "fire abc"),
+])
+def test_latin_greek_and_cyrillic_lose_diacritics(raw, expected):
+    assert normalize_text(pa.array([raw]))[0].as_py() == expected
+
+
+@pytest.mark.parametrize("raw", [
+    # El dakuten distingue palabras: 'がらくた' no es 'からくた'
+    "がらくた",
+    "ポルノグラフィティ",
+    # El virama forma el conjunto consonántico
+    "हिन्दी",
+    "ਪੰਜਾਬੀ",
+    "방탄소년단",
+    "周杰倫",
+    "فيروز",
+])
+def test_other_scripts_are_kept_and_composed(raw):
+    normalized = normalize_text(pa.array([raw]))[0].as_py()
+
+    assert normalized == unicodedata.normalize("NFC", raw)
+    assert unicodedata.is_normalized("NFC", normalized)
+
+
+def test_hangul_is_not_left_as_jamo():
+    normalized = normalize_text(pa.array(["방탄소년단"]))[0].as_py()
+
+    assert len(normalized) == 5
+
+
+def test_mixed_scripts_and_nulls():
+    values = pd.Series(["BTS (방탄소년단)", None, "Café がらくた", "N/A"])
+
+    assert normalize_text(values, na_value="").to_pylist() == ["bts (방탄소년단)", None, "cafe がらくた", ""]
+
+
+def test_normalize_columns_runs_once_per_column():
+    df = pd.DataFrame({"artists": ["Beyoncé"], "track_name": ["がらくた"], "popularity": [1]})
+    df = normalize_columns(df)
+
+    assert normalized_columns(df) == ["artists", "track_name"]
+    assert df["track_name"].tolist() == ["がらくた"]
+    # Una columna ya marcada no se vuelve a normalizar
+    df.loc[0, "artists"] = "Beyoncé"
+    assert normalize_columns(df)["artists"].tolist() == ["Beyoncé"]
@@ -0,0 +1,97 @@
+"""Tests for the partition-parallel execution of per-key transforms."""
+
+import os
+import fcntl
+import multiprocessing
+import pandas as pd
+import pytest
+
+from src.transformation import parallel
+from src.transformation.parallel import active_run, count_active_runs, run_sharded, worker_budget
+
+FRAME = pd.DataFrame({
+    "track_id": [f"t{i % 40}" for i in range(200)],
+    "popularity": range(200),
+})
+
+
+def _total_popularity(df):
+    return df.groupby("track_id", as_index=False)["popularity"].sum()
+
+
+def _fail_on_one_shard(df):
+    if (df["track_id"] == "t7").any():
+        raise ValueError("shard roto")
+    return _total_popularity(df)
+
+
+def _shared_memory_blocks():
+    return {name for name in os.listdir("/dev/shm") if name.startswith("psm_")}
+
+
+@pytest.fixture
+def four_cpus(tmp_path, monkeypatch):
+    """Pretend the host has 4 CPUs and isolate the registry of active runs."""
+    monkeypatch.setattr(parallel.os, "cpu_count", lambda: 4)
+    monkeypatch.setattr(parallel, "ACTIVE_RUNS_DIR", str(tmp_path / "active_runs"))
+    return str(tmp_path / "active_runs")
+
+
+def test_sharded_result_matches_single_process(four_cpus):
+    expected = _total_popularity(FRAME).sort_values("track_id", kind="stable").reset_index(drop=True)
+    # Los shards devuelven el texto como string[pyarrow]
+    expected["track_id"] = expected["track_id"].astype("string[pyarrow]")
+
+    pd.testing.assert_frame_equal(run_sharded(FRAME, _total_popularity, "track_id", 4), expected)
+
+
+@pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="needs /dev/shm")
+def test_failed_shard_does_not_leak_shared_memory(four_cpus):
+    before = _shared_memory_blocks()
+
+    with pytest.raises(ValueError, match="shard roto"):
+        run_sharded(FRAME, _fail_on_one_shard, "track_id", 4)
+
+    assert _shared_memory_blocks() - before == set()
+    assert count_active_runs(four_cpus) == 0
+
+
+def _hold_run(runs_dir, ready, done):
+    with active_run(runs_dir):
+        ready.set()
+        done.wait(10)
+
+
+def test_budget_follows_the_runs_actually_active(four_cpus):
+    assert worker_budget(16, count_active_runs(four_cpus) + 1) == 4
+
+    context = multiprocessing.get_context("fork")
+    ready, done = context.Event(), context.Event()
+    other_run = context.Process(target=_hold_run, args=(four_cpus, ready, done))
+    other_run.start()
+    try:
+        assert ready.wait(10)
+        with active_run(four_cpus):
+            assert count_active_runs(four_cpus) == 2
+            assert worker_budget(16, count_active_runs(four_cpus)) == 2
+    finally:
+        done.set()
+        other_run.join()
+
+    # Al terminar la otra ejecución, una ejecución sola vuelve a usar todas las CPUs
+    with active_run(four_cpus):
+        assert worker_budget(16, count_active_runs(four_cpus)) == 4
+
+
+def test_runs_of_dead_processes_are_not_counted(four_cpus):
+    os.makedirs(four_cpus)
+    # Registro sin bloqueo: su proceso murió sin borrarlo
+    open(os.path.join(four_cpus, "12345-dead.lock"), "w").close()
+    held = open(os.path.join(four_cpus, "67890-alive.lock"), "w")
+    fcntl.flock(held, fcntl.LOCK_EX)
+    try:
+        # Otro descriptor del mismo archivo no consigue el bloqueo, como otro proceso
+        assert count_active_runs(four_cpus) == 1
+        assert os.listdir(four_cpus) == ["67890-alive.lock"]
+    finally:
+        held.close()
@@ -0,0 +1,101 @@
+"""Tests for run partitions and the directory swap of partition outputs."""
+
+import os
+import multiprocessing
+import pytest
+
+from src.partitioning import partitions
+from src.partitioning.partitions import replace_directory
+
+
+def _write_tree(path, files):
+    os.makedirs(path, exist_ok=True)
+    for name, content in files.items():
+        with open(os.path.join(path, name), "w") as f:
+            f.write(content)
+
+
+def _read_tree(path):
+    contents = {}
+    for name in sorted(os.listdir(path)):
+        with open(os.path.join(path, name)) as f:
+            contents[name] = f.read()
+    return contents
+
+
+def test_replace_directory_swaps_in_the_staged_tree(tmp_path):
+    target_dir = str(tmp_path / "dataset")
+    staging_dir = str(tmp_path / "dataset.staging")
+    _write_tree(target_dir, {"old.parquet": "old"})
+    _write_tree(staging_dir, {"new.parquet": "new"})
+
+    replace_directory(staging_dir, target_dir)
+
+    assert _read_tree(target_dir) == {"new.parquet": "new"}
+    assert not os.path.exists(staging_dir)
+    assert not os.path.exists(f"{target_dir}.previous")
+
+
+def test_replace_directory_creates_missing_target_and_clears_stale_backup(tmp_path):
+    target_dir = str(tmp_path / "dataset")
+    staging_dir = str(tmp_path / "dataset.staging")
+    # Copia de un intercambio interrumpido
+    _write_tree(f"{target_dir}.previous", {"stale.parquet": "stale"})
+    _write_tree(staging_dir, {"new.parquet": "new"})
+
+    replace_directory(staging_dir, target_dir)
+
+    assert _read_tree(target_dir) == {"new.parquet": "new"}
+    assert not os.path.exists(f"{target_dir}.previous")
+
+
+def test_replace_directory_never_deletes_the_live_tree(tmp_path, monkeypatch):
+    target_dir = str(tmp_path / "dataset")
+    staging_dir = str(tmp_path / "dataset.staging")
+    _write_tree(target_dir, {"old.parquet": "old"})
+    _write_tree(staging_dir, {"new.parquet": "new"})
+    removed = []
+    rmtree = partitions.shutil.rmtree
+
+    def checked_rmtree(path, *args, **kwargs):
+        # Lo que se borra nunca es el directorio que ven los lectores
+        assert os.path.normpath(path) != os.path.normpath(target_dir)
+        assert os.path.isdir(target_dir) or not removed
+        removed.append(path)
+        rmtree(path, *args, **kwargs)
+
+    monkeypatch.setattr(partitions.shutil, "rmtree", checked_rmtree)
+    replace_directory(staging_dir, target_dir)
+
+    assert _read_tree(target_dir) == {"new.parquet": "new"}
+    assert removed
+
+
+def _swap_repeatedly(args):
+    target_dir, writer, rounds = args
+    for i in range(rounds):
+        staging_dir = f"{target_dir}.staging-{writer}"
+        _write_tree(staging_dir, {f"part-{n}.parquet": f"{writer}:{i}" for n in range(3)})
+        replace_directory(staging_dir, target_dir)
+    return writer
+
+
+def test_concurrent_swaps_are_serialized(tmp_path):
+    target_dir = str(tmp_path / "dataset")
+    context = multiprocessing.get_context("fork")
+    with context.Pool(4) as pool:
+        # Sin el bloqueo, un os.replace fallaría al encontrar la copia de otro intercambio
+        assert sorted(pool.map(_swap_repeatedly, [(target_dir, writer, 30) for writer in range(4)])) == [0, 1, 2, 3]
+
+    # El árbol final es entero de un solo escritor y no quedan restos de los intercambios
+    contents = set(_read_tree(target_dir).values())
+    assert len(contents) == 1
+    assert sorted(os.listdir(tmp_path)) == ["dataset", "dataset.lock"]
+
+
+@pytest.mark.parametrize("params, key", [
+    (None, "all"),
+    ({"spotify_snapshot": "2024", "grammy_year_from": 1990}, "spotify=2024__grammy=1990-max"),
+])
+def test_resolve_partition_key(params, key):
+    assert partitions.resolve_partition(params)["key"] == key
@@ -0,0 +1,208 @@
+"""Tests for the PostgreSQL binary COPY encoder."""
+
+import struct
+import datetime
+import tracemalloc
+import numpy as np
+import pyarrow as pa
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql import sqltypes
+
+from src.loading import pgcopy
+from src.loading.pgcopy import encode_copy_binary, conform_table, copy_table, _arrow_type
+
+POSTGRES_EPOCH = datetime.datetime(2000, 1, 1)
+
+# Tipo de Arrow -> codificación de referencia con struct, según la documentación de PostgreSQL
+REFERENCE_ENCODERS = {
+    pa.bool_(): lambda value: struct.pack("!?", value),
+    pa.int16(): lambda value: struct.pack("!h", value),
+    pa.int32(): lambda value: struct.pack("!i", value),
+    pa.int64(): lambda value: struct.pack("!q", value),
+    pa.float32(): lambda value: struct.pack("!f", value),
+    pa.float64(): lambda value: struct.pack("!d", value),
+    pa.timestamp("us"): lambda value: struct.pack(
+        "!q", (value - POSTGRES_EPOCH) // datetime.timedelta(microseconds=1)
+    ),
+    pa.date32(): lambda value: struct.pack("!i", (value - POSTGRES_EPOCH.date()).days),
+    pa.string(): lambda value: value.encode("utf-8"),
+    pa.large_string(): lambda value: value.encode("utf-8"),
+}
+
+
+def reference_copy(table):
+    """Encode a table row by row with struct, the slow and obvious way."""
+    payload = bytearray(b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0))
+    columns = [(field.type, table.column(field.name).to_pylist()) for field in table.schema]
+    for row in range(table.num_rows):
+        payload += struct.pack("!h", len(columns))
+        for arrow_type, values in columns:
+            if values[row] is None:
+                payload += struct.pack("!i", -1)
+                continue
+            field = REFERENCE_ENCODERS[arrow_type](values[row])
+            payload += struct.pack("!i", len(field)) + field
+    payload += struct.pack("!h", -1)
+    return bytes(payload)
+
+
+def _masked(rng, values, arrow_type, null_rate=0.25):
+    mask = rng.random(len(values)) < null_rate
+    return pa.array([None if null else value for value, null in zip(values, mask)], type=arrow_type)
+
+
+def every_type_table(num_rows, seed=0):
+    """One column per encodable type, each with NULLs."""
+    rng = np.random.default_rng(seed)
+    timestamps = [
+        datetime.datetime(1950, 1, 1) + datetime.timedelta(microseconds=int(offset))
+        for offset in rng.integers(0, 80 * 365 * 86400 * 10**6, num_rows)
+    ]
+    dates = [datetime.date(1950, 1, 1) + datetime.timedelta(days=int(d)) for d in rng.integers(0, 30000, num_rows)]
+    strings = [
+        "" if i % 7 == 0 else f"ñandú {'ß' * int(rng.integers(0, 5))} {i} 🎵"
+        for i in range(num_rows)
+    ]
+    return pa.table({
+        "flag": _masked(rng, (rng.random(num_rows) < 0.5).tolist(), pa.bool_()),
+        "small": _masked(rng, rng.integers(-2**15, 2**15, num_rows).tolist(), pa.int16()),
+        "medium": _masked(rng, rng.integers(-2**31, 2**31, num_rows).tolist(), pa.int32()),
+        "big": _masked(rng, rng.integers(-2**63, 2**63 - 1, num_rows).tolist(), pa.int64()),
+        "real": _masked(rng, rng.normal(size=num_rows).tolist(), pa.float32()),
+        "double": _masked(rng, (rng.normal(size=num_rows) * 1e12).tolist(), pa.float64()),
+        "moment": _masked(rng, timestamps, pa.timestamp("us")),
+        "day": _masked(rng, dates, pa.date32()),
+        "label": _masked(rng, strings, pa.string()),
+        "long_label": _masked(rng, strings[::-1], pa.large_string()),
+    })
+
+
+@pytest.mark.parametrize("num_rows, batch_rows", [(0, 64), (1, 64), (257, 64), (1000, 1000)])
+def test_encoding_matches_reference_for_every_type(num_rows, batch_rows):
+    table = every_type_table(num_rows)
+
+    assert encode_copy_binary(table, batch_rows=batch_rows).tobytes() == reference_copy(table)
+
+
+def test_encoding_of_sliced_and_all_null_columns():
+    table = every_type_table(300, seed=1).slice(37, 200)
+    table = table.append_column("nothing", pa.nulls(table.num_rows, pa.string()))
+
+    assert encode_copy_binary(table, batch_rows=50).tobytes() == reference_copy(table)
+
+
+def long_strings_table(num_rows, max_length, seed=0):
+    """Strings of very different lengths, including a few far longer than a batch."""
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(0, max_length, num_rows)
+    lengths[::500] = 40 * max_length
+    return pa.table({
+        "id": pa.array(np.arange(num_rows), pa.int64()),
+        "text": _masked(rng, ["ñ" * int(length) for length in lengths], pa.string(), null_rate=0.1),
+    })
+
+
+def test_batches_are_bounded_by_encoded_bytes(monkeypatch):
+    table = long_strings_table(2000, 3000)
+    batch_bytes = 64 * 1024
+    batches = []
+    encode_batch = pgcopy._encode_batch
+
+    def recording_encode_batch(batch):
+        encoded = encode_batch(batch)
+        batches.append((batch.num_rows, len(encoded)))
+        return encoded
+
+    monkeypatch.setattr(pgcopy, "_encode_batch", recording_encode_batch)
+    payload = encode_copy_binary(table, batch_bytes=batch_bytes)
+
+    assert payload.tobytes() == reference_copy(table)
+    assert sum(rows for rows, _ in batches) == table.num_rows
+    # Solo una fila que por sí sola supera el límite forma un lote más grande
+    assert all(size <= batch_bytes or rows == 1 for rows, size in batches)
+    assert any(size > batch_bytes for _, size in batches)
+
+
+def test_encoding_memory_is_bounded_by_the_batch_size():
+    table = long_strings_table(8000, 2000, seed=1)
+    batch_bytes = 256 * 1024
+
+    tracemalloc.start()
+    try:
+        payload = encode_copy_binary(table, batch_bytes=batch_bytes)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # Los lotes codificados y su concatenación, más los índices temporales de un solo lote
+    # (la fila más larga, 80000 caracteres, va sola en su lote)
+    largest_batch = max(batch_bytes, 2 + 4 + 8 + 4 + 2 * 40 * 2000)
+    assert peak <= 2 * payload.nbytes + 40 * largest_batch
+
+
+def test_unsupported_type_raises_type_error():
+    with pytest.raises(TypeError):
+        encode_copy_binary(pa.table({"values": pa.array([[1, 2]])}))
+
+
+def test_conform_table_casts_to_target_types_and_order():
+    table = pa.table({
+        "year": pa.array([2000.0, None, 1999.0]),
+        "label": pa.array(["a", None, "c"]),
+        "extra": pa.array([1, 2, 3]),
+    })
+    conformed = conform_table(table, {"label": pa.string(), "year": pa.int64(), "missing": pa.int32()})
+
+    assert conformed.column_names == ["label", "year"]
+    assert conformed.column("year").to_pylist() == [2000, None, 1999]
+    with pytest.raises(TypeError):
+        conform_table(pa.table({"year": [1999.5]}), {"year": pa.int64()})
+
+
+@pytest.mark.parametrize("column_type, arrow_type", [
+    (sqltypes.Boolean(), pa.bool_()),
+    (sqltypes.SmallInteger(), pa.int16()),
+    (sqltypes.Integer(), pa.int32()),
+    (sqltypes.BigInteger(), pa.int64()),
+    (postgresql.REAL(), pa.float32()),
+    (postgresql.DOUBLE_PRECISION(precision=53), pa.float64()),
+    (postgresql.TIMESTAMP(), pa.timestamp("us")),
+    (sqltypes.Date(), pa.date32()),
+    (sqltypes.Text(), pa.string()),
+    (sqltypes.VARCHAR(20), pa.string()),
+    (sqltypes.Numeric(), None),
+])
+def test_reflected_types_map_to_arrow(column_type, arrow_type):
+    assert _arrow_type(column_type) == arrow_type
+
+
+def test_copy_table_round_trip(pg_engine, pg_table):
+    table = every_type_table(500, seed=2)
+    with pg_engine.begin() as connection:
+        connection.execute(text(
+            f'CREATE TABLE "{pg_table}" (flag BOOLEAN, small SMALLINT, medium INTEGER, big BIGINT, '
+            f'"real" REAL, double DOUBLE PRECISION, moment TIMESTAMP, day DATE, label TEXT, '
+            f'long_label VARCHAR(100), not_loaded TEXT)'
+        ))
+        stats = copy_table(connection, pg_table, table)
+
+    assert stats["rows"] == table.num_rows
+    with pg_engine.connect() as connection:
+        rows = connection.execute(text(
+            f'SELECT flag, small, medium, big, "real", double, moment, day, label, long_label, not_loaded '
+            f'FROM "{pg_table}"'
+        )).fetchall()
+    # psycopg2 devuelve REAL con la precisión de float4 en texto; se compara como float32
+    as_float32 = lambda value: None if value is None else np.float32(value)
+    expected = [
+        row[:4] + (as_float32(row[4]),) + row[5:]
+        for row in zip(*(table.column(name).to_pylist() for name in table.column_names))
+    ]
+    loaded = [row[:4] + (as_float32(row[4]),) + row[5:-1] for row in map(tuple, rows)]
+    assert loaded == expected
+    assert all(row[-1] is None for row in rows)
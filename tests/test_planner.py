@@ -0,0 +1,166 @@
+"""Tests for the merge planner: planning the merge must not change its output."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.merge.planner import plan_merge
+from src.merge.merge import merge_frames, restrict_to_nominated
+
+
+def build_then_drop(spotify_df, spotify_keys, grammy_df, grammy_artist_keys, grammy_nominee_keys,
+                    musicbrainz_df, musicbrainz_keys):
+    """The merge as it was before the planner: join everything, then drop sparse columns."""
+    spotify_df = spotify_df.assign(_artist_key=spotify_keys)
+    merge_by_artist = pd.merge(
+        spotify_df, grammy_df.assign(_key=grammy_artist_keys),
+        how='left', left_on=['_artist_key'], right_on=['_key'], suffixes=('', '_artist')
+    )
+    merge_by_artist = merge_by_artist.drop(columns=['artist', '_key'], errors='ignore')
+
+    merge_by_nominee = pd.merge(
+        merge_by_artist, grammy_df.assign(_key=grammy_nominee_keys),
+        how='left', left_on=['_artist_key'], right_on=['_key'], suffixes=('', '_nominee')
+    )
+    merge_by_nominee = merge_by_nominee.drop(columns=['nominee', '_key'], errors='ignore')
+
+    for col in grammy_df.columns:
+        if col in ['artist', 'nominee']:
+            continue
+        col_nominee = f"{col}_nominee"
+        if col_nominee in merge_by_nominee.columns:
+            if col not in merge_by_nominee.columns:
+                merge_by_nominee[col] = merge_by_nominee[col_nominee]
+            else:
+                merge_by_nominee[col] = merge_by_nominee[col].fillna(merge_by_nominee[col_nominee])
+            merge_by_nominee = merge_by_nominee.drop(columns=[col_nominee])
+
+    final_merged_df = pd.merge(
+        merge_by_nominee, musicbrainz_df.assign(_key=musicbrainz_keys),
+        how='left', left_on=['_artist_key'], right_on=['_key']
+    )
+    final_merged_df = final_merged_df.drop(columns=['name', '_key', '_artist_key'], errors='ignore')
+    final_merged_df['winner'] = final_merged_df['winner'].fillna(False)
+
+    null_counts = final_merged_df.isnull().sum()
+    columns_to_drop = [col for col in final_merged_df.columns
+                       if null_counts[col] / len(final_merged_df) >= 0.85 and col not in ['country', 'type']]
+    final_merged_df = final_merged_df.drop(columns=columns_to_drop)
+    final_merged_df['country'] = final_merged_df['country'].fillna('N/A')
+    final_merged_df['type'] = final_merged_df['type'].fillna('N/A')
+    return final_merged_df
+
+
+def _with_nulls(rng, values, null_rate):
+    values = pd.Series(values, dtype=object)
+    return values.mask(rng.random(len(values)) < null_rate)
+
+
+def random_inputs(seed, num_artists=60):
+    """Random merge inputs with varied key coverage, null keys, null rates and all-null columns."""
+    rng = np.random.default_rng(seed)
+    # Código -1: artista nulo
+    keys = lambda size, coverage: np.where(
+        rng.random(size) < 0.05, -1, rng.integers(0, int(num_artists * coverage), size)
+    ).astype("int32")
+
+    num_tracks, num_grammys, num_musicbrainz = 300, 120, 40
+    spotify_keys = keys(num_tracks, 1.0)
+    spotify_df = pd.DataFrame({
+        "track_id": [f"t{i}" for i in range(num_tracks)],
+        "artists": [f"artist {key}" for key in spotify_keys],
+        "track_genre": pd.Categorical(rng.choice(["rock", "pop", "jazz"], num_tracks)),
+        "danceability": rng.random(num_tracks),
+        "explicit": rng.random(num_tracks) < 0.3,
+        "sparse_feature": np.where(rng.random(num_tracks) < 0.9, np.nan, rng.random(num_tracks)),
+        "empty_feature": np.full(num_tracks, np.nan),
+    })
+
+    grammy_artist_keys = keys(num_grammys, rng.choice([0.2, 0.5, 1.0]))
+    grammy_nominee_keys = keys(num_grammys, rng.choice([0.2, 0.5, 1.0]))
+    grammy_df = pd.DataFrame({
+        "year": rng.integers(1958, 2020, num_grammys),
+        "title": pd.Series([None] * num_grammys, dtype=object),
+        "category": pd.Categorical(_with_nulls(rng, rng.choice(["best rock", "best pop"], num_grammys), 0.1)),
+        "nominee": [f"artist {key}" for key in grammy_nominee_keys],
+        "artist": [f"artist {key}" for key in grammy_artist_keys],
+        "winner": rng.random(num_grammys) < 0.4,
+    })
+
+    musicbrainz_keys = keys(num_musicbrainz, rng.choice([0.3, 1.0]))
+    musicbrainz_df = pd.DataFrame({
+        "artist_id": [f"mb{i}" for i in range(num_musicbrainz)],
+        "name": [f"artist {key}" for key in musicbrainz_keys],
+        "type": _with_nulls(rng, rng.choice(["person", "group"], num_musicbrainz), rng.random()),
+        "country": _with_nulls(rng, rng.choice(["us", "gb"], num_musicbrainz), rng.choice([0.2, 1.0])),
+        "begin_area": pd.Series([None] * num_musicbrainz, dtype=object),
+        "genres": _with_nulls(rng, rng.choice(["rock", "pop"], num_musicbrainz), rng.random()),
+    })
+    return (spotify_df, spotify_keys, grammy_df, grammy_artist_keys, grammy_nominee_keys,
+            musicbrainz_df, musicbrainz_keys)
+
+
+@pytest.mark.parametrize("seed", range(1, 9))
+def test_plan_then_build_matches_build_then_drop(seed):
+    inputs = random_inputs(seed)
+    expected = build_then_drop(*inputs)
+
+    pd.testing.assert_frame_equal(merge_frames(*inputs), expected)
+
+
+def test_plan_predicts_row_count_and_null_counts():
+    inputs = random_inputs(3)
+    plan = plan_merge(*inputs)
+    expected = build_then_drop(*inputs)
+
+    assert plan["num_rows"] == len(expected)
+    # Las columnas enteramente nulas se descartan sin construirse
+    assert {"empty_feature", "title", "begin_area"} <= set(plan["dropped"])
+    assert "empty_feature" not in plan["spotify_columns"]
+    assert "title" not in plan["grammy_columns"]
+    assert "begin_area" not in plan["musicbrainz_columns"]
+
+
+def test_country_and_type_are_kept_when_entirely_null():
+    spotify_df, spotify_keys, grammy_df, artist_keys, nominee_keys, musicbrainz_df, musicbrainz_keys = random_inputs(5)
+    musicbrainz_df = musicbrainz_df.assign(country=None, type=None)
+    inputs = (spotify_df, spotify_keys, grammy_df, artist_keys, nominee_keys, musicbrainz_df, musicbrainz_keys)
+
+    merged = merge_frames(*inputs)
+    pd.testing.assert_frame_equal(merged, build_then_drop(*inputs))
+    assert (merged["country"] == "N/A").all() and (merged["type"] == "N/A").all()
+
+
+def _merge_window(inputs, year_from, year_to):
+    """Merge as a partition with a Grammy year window: Grammy rows limited to the window."""
+    spotify_df, spotify_keys, grammy_df, artist_keys, nominee_keys, musicbrainz_df, musicbrainz_keys = inputs
+    in_window = grammy_df["year"].between(year_from, year_to).values
+    artist_keys, nominee_keys = artist_keys[in_window], nominee_keys[in_window]
+    spotify_df, spotify_keys = restrict_to_nominated(spotify_df, spotify_keys, artist_keys, nominee_keys)
+    return merge_frames(
+        spotify_df, spotify_keys, grammy_df[in_window].reset_index(drop=True), artist_keys, nominee_keys,
+        musicbrainz_df, musicbrainz_keys
+    )
+
+
+def test_grammy_windows_only_hold_the_tracks_nominated_in_them():
+    inputs = random_inputs(4)
+    spotify_df, spotify_keys, grammy_df, artist_keys, nominee_keys, _, _ = inputs
+    windows = [(1958, 1979), (1980, 1999), (2000, 2019)]
+
+    windowed_tracks = set()
+    for year_from, year_to in windows:
+        merged = _merge_window(inputs, year_from, year_to)
+        # Las filas de cada ventana solo llevan nominaciones de sus años: las ventanas no se solapan
+        assert merged["year"].between(year_from, year_to).all()
+
+        in_window = grammy_df["year"].between(year_from, year_to).values
+        nominated = np.union1d(artist_keys[in_window], nominee_keys[in_window])
+        expected_tracks = set(spotify_df.loc[np.isin(spotify_keys, nominated[nominated != -1]), "track_id"])
+        assert set(merged["track_id"]) == expected_tracks
+        windowed_tracks |= expected_tracks
+
+    # Los tracks sin nominaciones (o de artista nulo) no están en ninguna ventana
+    nominated = np.union1d(artist_keys, nominee_keys)
+    never_nominated = set(spotify_df.loc[~np.isin(spotify_keys, nominated[nominated != -1]), "track_id"])
+    assert never_nominated and not never_nominated & windowed_tracks
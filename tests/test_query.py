@@ -0,0 +1,66 @@
+"""Tests for the DuckDB query engine over the pipeline outputs."""
+
+import os
+import pandas as pd
+import pytest
+
+pytest.importorskip("duckdb")
+
+from src.query import catalog
+from src.query.engine import connect, list_views, query
+from src.loading.dataset import write_partitioned_dataset
+
+SPOTIFY = pd.DataFrame({
+    "track_id": ["t1", "t2", "t3"],
+    "artists": ["queen", "drake", "queen"],
+    "popularity": [80, 90, 70],
+})
+
+MERGED = pd.DataFrame({
+    "track_id": ["t1", "t2", "t3", "t3"],
+    "track_genre": ["rock", "hip-hop, rap", "pop, rock", "pop, rock"],
+    "category": ["best rock", None, "best pop", "best album"],
+    "winner": [True, False, False, True],
+})
+
+
+@pytest.fixture
+def outputs(tmp_path, monkeypatch):
+    """Catalog pointed at tmp_path, with the Spotify view and the merged dataset written."""
+    sources = {
+        view_name: (os.path.join(tmp_path, os.path.relpath(path, catalog.BASE_DIR)), source_format)
+        for view_name, (path, source_format) in catalog.VIEW_SOURCES.items()
+    }
+    monkeypatch.setattr(catalog, "VIEW_SOURCES", sources)
+    catalog.save_intermediate(SPOTIFY, "spotify")
+    write_partitioned_dataset(MERGED, dataset_dir=sources["merged"][0])
+    return sources
+
+
+def test_only_existing_outputs_are_registered(outputs):
+    con = connect(sources=catalog.view_sources())
+
+    assert list_views(con) == ["merged", "spotify"]
+
+
+def test_query_reads_parquet_and_partitioned_dataset(outputs):
+    con = connect(sources=catalog.view_sources())
+
+    popularity = query("SELECT artists, SUM(popularity) AS total FROM spotify GROUP BY 1 ORDER BY 1", con=con)
+    assert popularity.to_dict("records") == [
+        {"artists": "drake", "total": 90}, {"artists": "queen", "total": 150}
+    ]
+    # La columna de partición se lee de los directorios Hive
+    by_genre = query(
+        "SELECT primary_genre, COUNT(*) AS n FROM merged WHERE winner = ? GROUP BY 1 ORDER BY 1",
+        params=[True], con=con
+    )
+    assert by_genre.to_dict("records") == [{"primary_genre": "pop", "n": 1}, {"primary_genre": "rock", "n": 1}]
+
+
+def test_partition_views_are_isolated(outputs):
+    partition = "spotify=2024__grammy=1990-1999"
+    catalog.save_intermediate(SPOTIFY.head(1), "spotify", partition)
+
+    assert len(query("SELECT * FROM spotify", con=connect(sources=catalog.view_sources(partition)))) == 1
+    assert len(query("SELECT * FROM spotify", con=connect(sources=catalog.view_sources()))) == 3
@@ -0,0 +1,75 @@
+"""Tests for the run-scoped scratch space."""
+
+import os
+import time
+import errno
+import pytest
+
+from src.scratch import manager
+from src.scratch.manager import cleanup_run, cleanup_scratch, release, run_usage, scratch_path
+
+
+def _write(path, size):
+    with open(path, "wb") as output:
+        output.write(b"x" * size)
+    return path
+
+
+@pytest.fixture
+def ram_disk(scratch_root):
+    """Make the RAM disk of scratch_root available."""
+    os.makedirs(os.path.dirname(manager.RAM_DISK_ROOT))
+    return scratch_root
+
+
+def test_runs_get_separate_directories(scratch_root):
+    first = scratch_path("manual__2024-01-01T00:00:00", "read_csv", ".parquet")
+    second = scratch_path("manual__2024-01-02T00:00:00", "read_csv", ".parquet")
+
+    assert first != second
+    assert os.path.dirname(first) == os.path.join(manager.SCRATCH_ROOT, "manual__2024-01-01T00_00_00")
+
+
+def test_quota_counts_every_directory_of_the_run(ram_disk, monkeypatch):
+    monkeypatch.setattr(manager, "SCRATCH_QUOTA_BYTES", 1000)
+    _write(scratch_path("run_1", "read_csv", ".csv", size_hint=600), 600)
+    _write(scratch_path("run_1", "read_grammy", ".csv", size_hint=300), 300)
+    assert run_usage("run_1") == 900
+
+    with pytest.raises(OSError) as error:
+        scratch_path("run_1", "merge", ".csv", size_hint=200)
+    assert error.value.errno == errno.EDQUOT
+    # Otra ejecución tiene su propia cuota, y liberar un archivo devuelve espacio
+    scratch_path("run_2", "merge", ".csv", size_hint=200)
+    release(os.path.join(manager.RAM_DISK_ROOT, "run_1", "read_csv.csv"))
+    scratch_path("run_1", "merge", ".csv", size_hint=200)
+
+
+def test_small_outputs_go_to_the_ram_disk(ram_disk):
+    small = scratch_path("run_1", "transform_api", ".csv", size_hint=1024)
+    large = scratch_path("run_1", "transform_spotify", ".csv", size_hint=manager.RAM_DISK_MAX_BYTES + 1)
+    unknown = scratch_path("run_1", "read_csv", ".csv")
+
+    assert small.startswith(manager.RAM_DISK_ROOT)
+    assert large.startswith(manager.SCRATCH_ROOT)
+    assert unknown.startswith(manager.SCRATCH_ROOT)
+
+
+def test_cleanup_removes_the_run_and_stale_directories_only(ram_disk):
+    _write(scratch_path("run_1", "read_csv", ".csv"), 10)
+    _write(scratch_path("run_1", "transform_api", ".csv", size_hint=10), 10)
+    other = _write(scratch_path("run_2", "read_csv", ".csv"), 10)
+    crashed = os.path.dirname(_write(scratch_path("crashed", "read_csv", ".csv"), 10))
+    two_days_ago = time.time() - 2 * manager.STALE_AFTER_SECONDS
+    os.utime(crashed, (two_days_ago, two_days_ago))
+
+    cleanup_scratch("run_1")
+
+    assert run_usage("run_1") == 0
+    assert not os.path.exists(os.path.join(manager.RAM_DISK_ROOT, "run_1"))
+    assert not os.path.exists(crashed)
+    assert os.path.exists(other)
+    # Limpiar de nuevo, o liberar un archivo ya borrado, no falla
+    cleanup_run("run_1")
+    release(other)
+    release(other)
@@ -0,0 +1,150 @@
+"""Tests for the Spotify summary sketches: error bounds, merges and shards."""
+
+import os
+import functools
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.stats.summary import (
+    METRICS, QUANTILES,
+    summarize_spotify, sketch_rows, _prepare_rows, merge_sketches, merge_sketch_tree,
+    merge_shard_summaries, load_summary, summary_table,
+)
+from src.stats.sketches import hll_estimate
+from src.transformation import parallel
+from src.transformation.spotify import sketch_and_transform_frame
+
+
+def random_spotify(seed, num_tracks=30_000):
+    """Raw Spotify rows: genres of very different sizes, repeated tracks and multi-artist credits."""
+    rng = np.random.default_rng(seed)
+    genres = rng.choice(["pop", "rock", "jazz", "k-pop", "tango"], num_tracks, p=[0.5, 0.3, 0.15, 0.045, 0.005])
+    df = pd.DataFrame({
+        "track_id": [f"t{i}" for i in range(num_tracks)],
+        "artists": [f"Artist {a}" if a % 7 else f"Artist {a};Artist {a + 1}" for a in rng.integers(0, 2000, num_tracks)],
+        "album_name": [f"Album {a}" for a in rng.integers(0, 8000, num_tracks)],
+        "track_genre": genres,
+        **{metric: rng.gamma(2.0, 10.0, num_tracks) for metric in METRICS},
+    })
+    # Algunos tracks aparecen en varios géneros
+    repeated = df.sample(frac=0.1, random_state=seed).assign(track_genre="acoustic")
+    return pd.concat([df, repeated], ignore_index=True)
+
+
+@pytest.fixture(scope="module")
+def spotify():
+    df = random_spotify(7)
+    return df, summarize_spotify(df, chunk_rows=4000)
+
+
+def _split(df, num_chunks):
+    return [df.iloc[positions] for positions in np.array_split(np.arange(len(df)), num_chunks)]
+
+
+def _exact_genre_values(df, metric):
+    rows = _prepare_rows(df)
+    return rows.groupby(["genre", "track_id"])[metric].mean().groupby(level="genre")
+
+
+def test_quantile_rank_error_is_bounded(spotify):
+    df, sketches = spotify
+    table = summary_table(sketches, "genre", "popularity").set_index("group")
+
+    for genre, values in _exact_genre_values(df, "popularity"):
+        values = np.sort(values.to_numpy())
+        for quantile in QUANTILES:
+            estimate = table.loc[genre, f"p{round(quantile * 100):g}"]
+            rank = np.searchsorted(values, estimate) / len(values)
+            # Error de rango de un t-digest con compresión 200, con margen
+            assert abs(rank - quantile) <= max(0.01, 2 / len(values)), (genre, quantile)
+
+
+def test_moments_are_exact(spotify):
+    df, sketches = spotify
+    table = summary_table(sketches, "genre", "energy").set_index("group")
+
+    for genre, values in _exact_genre_values(df, "energy"):
+        assert table.loc[genre, "count"] == len(values)
+        assert table.loc[genre, "mean"] == pytest.approx(values.mean(), rel=1e-9)
+        assert table.loc[genre, "std"] == pytest.approx(values.std(), rel=1e-9)
+        assert table.loc[genre, "min"] == values.min() and table.loc[genre, "max"] == values.max()
+
+
+def test_distinct_count_error_is_bounded(spotify):
+    df, sketches = spotify
+    table = summary_table(sketches, "genre", "popularity").set_index("group")
+    rows = _prepare_rows(df)
+
+    for column in ["track_id", "album_name", "artist"]:
+        exact = rows.groupby("genre")[column].nunique()
+        # Error estándar de HyperLogLog con 4096 registros: 1.6%
+        relative_error = (table[f"distinct_{column}"] - exact).abs() / exact
+        assert (relative_error <= 0.05).all(), column
+
+
+def _quantiles(sketches):
+    return summary_table(sketches, "artist", "valence")[["group", "p5", "p50", "p95"]].set_index("group")
+
+
+def test_merge_is_associative():
+    df = random_spotify(3, num_tracks=6000)
+    chunks = _split(df.sort_values("track_id", ignore_index=True), 3)
+    a, b, c = (sketch_rows(_prepare_rows(chunk)) for chunk in chunks)
+
+    left = merge_sketches([merge_sketches([a, b]), c])
+    right = merge_sketches([a, merge_sketches([b, c])])
+    flat = merge_sketches([a, b, c])
+
+    keys = ["dimension", "group", "metric"]
+    for other in [right, flat]:
+        pd.testing.assert_frame_equal(
+            left["moments"].sort_values(keys, ignore_index=True),
+            other["moments"].sort_values(keys, ignore_index=True),
+            check_exact=False, rtol=1e-9,
+        )
+        keys_hll = ["dimension", "group", "column", "register"]
+        pd.testing.assert_frame_equal(
+            left["hll"].sort_values(keys_hll, ignore_index=True), other["hll"].sort_values(keys_hll, ignore_index=True)
+        )
+        # Los t-digests solo coinciden dentro de su error: comparar cuantiles
+        spread = (_quantiles(left) - _quantiles(other)).abs()
+        assert (spread.to_numpy() <= 0.05 * _quantiles(left).abs().to_numpy() + 1.0).all()
+
+
+def test_tree_merge_matches_a_single_merge():
+    sketch_sets = [
+        sketch_rows(_prepare_rows(chunk))
+        for chunk in _split(random_spotify(5, num_tracks=3000), 20)
+    ]
+    tree = merge_sketch_tree(iter(sketch_sets), fan_in=3)
+    flat = merge_sketches(sketch_sets)
+
+    keys = ["dimension", "group", "column"]
+    pd.testing.assert_frame_equal(
+        hll_estimate(tree["hll"], keys).sort_values(keys, ignore_index=True),
+        hll_estimate(flat["hll"], keys).sort_values(keys, ignore_index=True),
+    )
+    assert tree["moments"]["count"].sum() == flat["moments"]["count"].sum()
+
+
+def test_sharded_sketches_match_a_single_pass(tmp_path, monkeypatch):
+    monkeypatch.setattr(parallel.os, "cpu_count", lambda: 4)
+    monkeypatch.setattr(parallel, "ACTIVE_RUNS_DIR", str(tmp_path / "active_runs"))
+    df = random_spotify(11, num_tracks=5000)
+    sketch_root = str(tmp_path / "sketches")
+
+    parallel.run_sharded(df, functools.partial(sketch_and_transform_frame, sketch_root=sketch_root), "track_id", 4)
+    assert len(os.listdir(sketch_root)) >= 4
+    summary_dir = merge_shard_summaries(sketch_root, str(tmp_path / "statistics"), "all")
+
+    sketches, meta = load_summary(summary_dir)
+    assert not os.path.exists(sketch_root)
+    assert meta["rows_scanned"] == len(df) and meta["partitions"] == ["all"]
+    expected = summarize_spotify(df)
+    for dimension in ["genre", "artist"]:
+        pd.testing.assert_frame_equal(
+            summary_table(sketches, dimension).drop(columns=["p5", "p25", "p50", "p75", "p95"]),
+            summary_table(expected, dimension).drop(columns=["p5", "p25", "p50", "p75", "p95"]),
+            check_exact=False, rtol=1e-9,
+        )